@@ -0,0 +1,279 @@
+# benchmark.py
+# -------------------------------------------------
+# БЕНЧМАРКИ: скорость step() / _impedance_step() и вычисления профиля.
+# Результаты пишутся в JSON; при заданном baseline проверяется регрессия.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --baseline bench.json --threshold 0.25   # код выхода 1 при замедлении
+#   python benchmark.py --integrators                             # точность/стоимость интеграторов
+# -------------------------------------------------
+import argparse
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from core import HapticSimulation, PiecewiseProfile, constant, trapezoid, semicircle, sine_wave_sum
+from headless import simulate
+
+PROFILE_SIZES = (1, 10, 100, 1000, 10000)
+QUICK_PROFILE_SIZES = (1, 10, 100)
+
+# Комбинации режимов управления: (impedance, target, speed)
+MODES = list(itertools.product((False, True), repeat=3))
+
+
+def make_benchmark_profile(n_elements, track_length=10000.0):
+    """
+    Профиль из n_elements примитивов, равномерно расставленных по дорожке [0, track_length]:
+    трапеции с зонами трения, полуокружности и участки постоянного трения.
+    """
+    profile = PiecewiseProfile()
+    spacing = track_length / n_elements
+    for i in range(n_elements):
+        x0 = (i + 0.5) * spacing
+        kind = i % 3
+        if kind == 0:
+            profile.add_function(trapezoid, x0=x0, height=20.0, base_a=spacing * 0.3, base_b=spacing * 0.4,
+                                 f_stat=2.0, f_din=1.5, f_stat_base=5.0, f_din_base=4.0)
+        elif kind == 1:
+            profile.add_function(semicircle, x0=x0, radius=spacing * 0.4, is_pit=True)
+        else:
+            profile.add_function(constant, b=0.0, x_start=x0 - spacing * 0.4, x_end=x0 + spacing * 0.4,
+                                 f_stat=3.0, f_din=2.0)
+    return profile
+
+
+def make_benchmark_simulation(profile, impedance=False, target=False, speed=False, track_length=10000.0):
+    sim = HapticSimulation(x_min=0.0, x_max=track_length, mass=5.0, damping=2.0)
+    sim.set_friction_forces(7, 5)
+    sim.set_profile(profile)
+    sim.state.x = track_length / 2
+    sim.use_impedance_control = impedance
+    sim.use_target_control = target
+    sim.use_speed_control = speed
+    sim.set_target_position(track_length * 0.25)
+    sim.set_target_position_speed_control(track_length * 0.75)
+    # Пользователь тянет объект - так объект постоянно проходит через элементы профиля
+    sim.state.dragging = True
+    sim.cursor_x = track_length * 0.9
+    return sim
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def bench_steps(sim, budget, min_steps=20):
+    """Шаги в течение budget секунд: steps/s и перцентили времени одного шага (мкс)"""
+    clock = time.perf_counter_ns
+    step = sim.step
+    latencies = []
+    deadline = time.perf_counter() + budget
+    while len(latencies) < min_steps or time.perf_counter() < deadline:
+        t0 = clock()
+        step()
+        latencies.append(clock() - t0)
+    total = sum(latencies) / 1e9
+    latencies.sort()
+    return {
+        'steps': len(latencies),
+        'steps_per_sec': len(latencies) / total if total else float('inf'),
+        'p50_us': percentile(latencies, 50) / 1e3,
+        'p90_us': percentile(latencies, 90) / 1e3,
+        'p99_us': percentile(latencies, 99) / 1e3,
+        'max_us': latencies[-1] / 1e3,
+    }
+
+
+def bench_calls(func, xs, budget, min_calls=100):
+    """Пропускная способность func(x) на наборе точек xs (вызовов в секунду)"""
+    calls = 0
+    elapsed = 0.0
+    while calls < min_calls or elapsed < budget:
+        t0 = time.perf_counter()
+        for x in xs:
+            func(x)
+        elapsed += time.perf_counter() - t0
+        calls += len(xs)
+    return {'calls': calls, 'calls_per_sec': calls / elapsed if elapsed else float('inf')}
+
+
+def run_benchmarks(sizes=PROFILE_SIZES, budget=0.2, seed=0):
+    rng = random.Random(seed)
+    results = {}
+    for n in sizes:
+        profile = make_benchmark_profile(n)
+        xs = [rng.uniform(0.0, 10000.0) for _ in range(200)]
+        results[f'profile/potential/n={n}'] = bench_calls(profile.potential, xs, budget)
+        results[f'profile/force/n={n}'] = bench_calls(profile.force, xs, budget)
+        results[f'profile/get_local_friction/n={n}'] = bench_calls(profile.get_local_friction, xs, budget)
+        results[f'profile/codegen_force_and_friction/n={n}'] = bench_calls(profile.codegen().force_and_friction,
+                                                                           xs, budget)
+
+        for impedance, target, speed in MODES:
+            sim = make_benchmark_simulation(profile, impedance, target, speed)
+            name = 'impedance_step' if impedance else 'step'
+            results[f'{name}/target={int(target)}/speed={int(speed)}/n={n}'] = bench_steps(sim, budget)
+    return results
+
+
+# --- Точность и стоимость интеграторов на гладком сценарии ---
+# Шаги dt делят SAMPLE_PERIOD: траектории сравниваются в общих моментах времени
+INTEGRATOR_DTS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+SAMPLE_PERIOD = 0.05
+REFERENCE_DT = 0.0001
+
+
+def make_integrator_simulation():
+    """
+    Гладкий сценарий для сравнения интеграторов: объект с начальной скоростью катится по
+    синусоидальному рельефу без трения, курсора и стенок и за время прогона не останавливается.
+    Трение покоя, стенки и ограничение смены знака скорости - события первого порядка по dt:
+    на эталонной симуляции main.make_simulation() они перекрывают порядок интегратора,
+    и ошибка перестаёт убывать с шагом.
+    """
+    profile = PiecewiseProfile()
+    profile.add_function(sine_wave_sum, components=[{'amplitude': 200.0, 'frequency': 0.05, 'phase': 0.0},
+                                                    {'amplitude': 30.0, 'frequency': 0.13, 'phase': 1.0}])
+    sim = HapticSimulation(x_min=-10000.0, x_max=10000.0, mass=5.0, damping=0.5)
+    sim.set_profile(profile)
+    sim.vx_threshold = 0.0
+    sim.state.x = 0.0
+    sim.state.vx = 80.0
+    return sim
+
+
+def integrator_trajectory(integrator, dt, duration=6.0):
+    """Сценарий make_integrator_simulation(). Возвращает (x в моменты SAMPLE_PERIOD, время счёта, с)"""
+    sim = make_integrator_simulation()
+    sim.integrator = integrator
+    sim.dt = dt
+    n_steps = int(round(duration / dt))
+
+    t0 = time.perf_counter()
+    out = simulate(sim, n_steps)
+    elapsed = time.perf_counter() - t0
+    every = int(round(SAMPLE_PERIOD / dt))
+    return out['x'][every - 1::every], elapsed
+
+
+def run_integrator_report(dts=INTEGRATOR_DTS, duration=6.0, reference_dt=REFERENCE_DT):
+    """
+    Для каждого интегратора и шага dt: ошибка положения относительно RK4 с шагом reference_dt
+    (максимальная и среднеквадратичная), наблюдаемый порядок по предыдущему dt,
+    вычисления сил профиля и время счёта на секунду модели.
+    """
+    reference, _ = integrator_trajectory('rk4', reference_dt, duration)
+    rows = []
+    for integrator, evals in HapticSimulation.INTEGRATORS.items():
+        previous = None
+        for dt in dts:
+            x, elapsed = integrator_trajectory(integrator, dt, duration)
+            error = np.abs(x - reference)
+            max_error = float(error.max())
+            order = None
+            if previous is not None and previous[1] > 0 and max_error > 0:
+                order = float(np.log(max_error / previous[1]) / np.log(dt / previous[0]))
+            previous = (dt, max_error)
+            rows.append({
+                'integrator': integrator,
+                'dt': dt,
+                'max_error': max_error,
+                'rms_error': float(np.sqrt(np.mean(error ** 2))),
+                'order': order,
+                'force_evals_per_sim_s': evals / dt,
+                'wall_s_per_sim_s': elapsed / duration,
+            })
+    return rows
+
+
+def print_integrator_report(rows):
+    print(f"{'integrator':<14} {'dt':>7} {'max err':>10} {'rms err':>10} {'order':>6} {'evals/s':>9} {'wall/s':>9}")
+    for row in rows:
+        order = '' if row['order'] is None else f"{row['order']:.2f}"
+        print(f"{row['integrator']:<14} {row['dt']:>7g} {row['max_error']:>10.3g} {row['rms_error']:>10.3g} "
+              f"{order:>6} {row['force_evals_per_sim_s']:>9.0f} {row['wall_s_per_sim_s']:>9.4f}")
+
+
+def throughput(result):
+    return result.get('steps_per_sec', result.get('calls_per_sec'))
+
+
+def compare(results, baseline, threshold):
+    """Список (имя, было, стало) для замеров, упавших более чем на threshold (доля)"""
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        before, after = throughput(base), throughput(current)
+        if before and after < before * (1.0 - threshold):
+            regressions.append((name, before, after))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки HapticSimulation и PiecewiseProfile")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    parser.add_argument('--baseline', help="JSON предыдущего прогона для проверки регрессий")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="допустимое падение пропускной способности (доля, по умолчанию 0.25)")
+    parser.add_argument('--budget', type=float, default=0.2, help="время на один замер, с")
+    parser.add_argument('--sizes', type=int, nargs='+', help="размеры профилей (число примитивов)")
+    parser.add_argument('--quick', action='store_true', help="короткий прогон на малых профилях")
+    parser.add_argument('--integrators', action='store_true',
+                        help="отчёт точность/стоимость интеграторов на гладком сценарии вместо бенчмарков")
+    args = parser.parse_args(argv)
+
+    if args.integrators:
+        rows = run_integrator_report()
+        print_integrator_report(rows)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'integrators': rows}, f, indent=2)
+        return 0
+
+    sizes = args.sizes or (QUICK_PROFILE_SIZES if args.quick else PROFILE_SIZES)
+    budget = min(args.budget, 0.05) if args.quick else args.budget
+    results = run_benchmarks(sizes, budget)
+
+    report = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'budget_s': budget,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+    for name, result in results.items():
+        line = f"{name:<50} {throughput(result):>14.0f}/s"
+        if 'p99_us' in result:
+            line += f"  p50={result['p50_us']:.1f}us p99={result['p99_us']:.1f}us"
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"РЕГРЕССИЯ {name}: {before:.0f}/s -> {after:.0f}/s")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,7 +2,13 @@
 # -------------------------------------------------
 # ЧИСТАЯ МОДЕЛЬ: никаких импортов GUI, только логика
 # -------------------------------------------------
+import abc
+import bisect
+import heapq
 import math
+import time
+
+import numpy as np
 
 
 class HapticObjectState:
@@ -77,12 +83,16 @@ def semicircle(x, x0=0.0, radius=5.0, is_pit=False, f_stat=0.0, f_din=0.0):
     return -y if is_pit else y
 
 # sine_wave_sum также можно обновить, если планируется использовать её с трением
-def sine_wave_sum(x, components=None, x_start=float('-inf'), x_end=float('inf'), f_stat=0.0, f_din=0.0): 
+def sine_wave_sum(x, components=None, x_start=float('-inf'), x_end=float('inf'), f_stat=0.0, f_din=0.0,
+                  amplitudes=None, frequencies=None, phases=None):
     """
     components: список словарей с ключами: 'amplitude', 'frequency', 'phase'
     Пример: [{'amplitude': 1.0, 'frequency': 0.1, 'phase': 0}, ...]
+    Вместо components можно передать упакованные массивы amplitudes, frequencies, phases.
     f_stat, f_din - силы трения для области, где действует функция (требуется указать x_start, x_end)
     """
+    if amplitudes is not None or frequencies is not None or phases is not None:
+        return SineWaveSumElement(amplitudes=amplitudes, frequencies=frequencies, phases=phases).value(x)
     if components is None:
         components = []
     # Используем только логику цикла, без дублирования
@@ -95,131 +105,1680 @@ def sine_wave_sum(x, components=None, x_start=float('-inf'), x_end=float('inf'),
     return total  # Возвращаем накопленное значение
 
 
+# --- Вспомогательные функции сглаживания (векторизованные и производные) ---
+def smoothstep_array(a, b, xs):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (xs - a) / (b - a)
+    t = t * t * (3 - 2 * t)
+    return np.where(xs <= a, 0.0, np.where(xs >= b, 1.0, t))
+
+def smoothstep_derivative(a, b, x):
+    if x <= a or x >= b:
+        return 0.0
+    t = (x - a) / (b - a)
+    return 6 * t * (1 - t) / (b - a)
+
+def smoothstep_derivative_array(a, b, xs):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (xs - a) / (b - a)
+        dt = 6 * t * (1 - t) / (b - a)
+    return np.where((xs <= a) | (xs >= b), 0.0, dt)
+
+
+INF = float('inf')
+
+
+# --- Элементы профиля ---
+class ProfileElement(abc.ABC):
+    """
+    Элемент профиля с объявленными свойствами:
+      support()          - носитель [x_start, x_end]: вне него U и dU/dx равны 0;
+      value(x)           - U(x), derivative(x) - dU/dx (если analytic, иначе сила считается численно);
+      value_array(xs), derivative_array(xs) - векторизованные версии;
+      friction_zones()   - зоны трения (x_start, x_end, f_stat, f_din), более поздняя - с большим приоритетом;
+      source_lines(derivative) - код для PiecewiseProfile.codegen() (None - вызывать value() как есть).
+    override - элемент перекрывает все прочие там, где его значение не равно 0.
+    value() и derivative() абстрактные: элемент без них не создаётся.
+    Элементы считаются неизменяемыми: после изменения полей вызывайте profile.invalidate().
+    """
+    __slots__ = ('override',)
+    analytic = True
+
+    def support(self):
+        return -INF, INF
+
+    @abc.abstractmethod
+    def value(self, x):
+        """U(x)"""
+
+    @abc.abstractmethod
+    def derivative(self, x):
+        """dU/dx"""
+
+    def value_array(self, xs):
+        values = np.fromiter(map(self.value, xs.ravel().tolist()), dtype=float, count=xs.size)
+        return values.reshape(xs.shape)
+
+    def derivative_array(self, xs):
+        values = np.fromiter(map(self.derivative, xs.ravel().tolist()), dtype=float, count=xs.size)
+        return values.reshape(xs.shape)
+
+    def friction_zones(self):
+        return []
+
+    def source_lines(self, derivative):
+        return None
+
+    def polynomial_pieces(self):
+        """
+        Элемент как кусочный полином: список (x_start, x_end, origin, coeffs), где на (x_start, x_end)
+        U = sum(coeffs[k] * (x - origin) ** k), а вне кусков U = 0. None - элемент не полиномиальный.
+        """
+        return None
+
+    def _slot_names(self):
+        return [name for cls in type(self).__mro__ for name in getattr(cls, '__slots__', ())]
+
+    def copy(self):
+        other = object.__new__(type(self))
+        for name in self._slot_names():
+            setattr(other, name, getattr(self, name))
+        return other
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in reversed(self._slot_names()))
+        return f"{type(self).__name__}({fields})"
+
+
+def _zone(x_start, x_end, f_stat, f_din):
+    """Зона трения [x_start, x_end] - если хотя бы одна из сил трения задана"""
+    if f_stat > 0 or f_din > 0:
+        return [(x_start, x_end, f_stat, f_din)]
+    return []
+
+
+class ConstantElement(ProfileElement):
+    """U = b на [x_start, x_end]; трение f_stat, f_din на том же отрезке"""
+    __slots__ = ('b', 'x_start', 'x_end', 'f_stat', 'f_din')
+
+    def __init__(self, b=0.0, x_start=-INF, x_end=INF, f_stat=0.0, f_din=0.0, override=False):
+        self.b = b
+        self.x_start = x_start
+        self.x_end = x_end
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.override = override
+
+    def support(self):
+        return self.x_start, self.x_end
+
+    def value(self, x):
+        if x < self.x_start or x > self.x_end:
+            return 0.0
+        return self.b
+
+    def derivative(self, x):
+        return 0.0
+
+    def value_array(self, xs):
+        inside = (xs >= self.x_start) & (xs <= self.x_end)
+        return np.where(inside, float(self.b), 0.0)
+
+    def derivative_array(self, xs):
+        return np.zeros_like(xs)
+
+    def friction_zones(self):
+        return _zone(self.x_start, self.x_end, self.f_stat, self.f_din)
+
+    def polynomial_pieces(self):
+        return [(self.x_start, self.x_end, 0.0, (self.b,))]
+
+    def source_lines(self, derivative):
+        if derivative:
+            return ["v = 0.0"]
+        outside = _gen_range_check(self.x_start, self.x_end)
+        if outside is None:
+            return [f"v = {_literal(self.b)}"]
+        return [f"v = 0.0 if {outside} else {_literal(self.b)}"]
+
+
+class LinearElement(ProfileElement):
+    """U = a * x + b на [x_start, x_end]; трение f_stat, f_din на том же отрезке"""
+    __slots__ = ('a', 'b', 'x_start', 'x_end', 'f_stat', 'f_din')
+
+    def __init__(self, a=0.0, b=0.0, x_start=-INF, x_end=INF, f_stat=0.0, f_din=0.0, override=False):
+        self.a = a
+        self.b = b
+        self.x_start = x_start
+        self.x_end = x_end
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.override = override
+
+    def support(self):
+        return self.x_start, self.x_end
+
+    def value(self, x):
+        if x < self.x_start or x > self.x_end:
+            return 0.0
+        return self.a * x + self.b
+
+    def derivative(self, x):
+        if x < self.x_start or x > self.x_end:
+            return 0.0
+        return self.a
+
+    def value_array(self, xs):
+        inside = (xs >= self.x_start) & (xs <= self.x_end)
+        return np.where(inside, self.a * xs + self.b, 0.0)
+
+    def derivative_array(self, xs):
+        inside = (xs >= self.x_start) & (xs <= self.x_end)
+        return np.where(inside, float(self.a), 0.0)
+
+    def friction_zones(self):
+        return _zone(self.x_start, self.x_end, self.f_stat, self.f_din)
+
+    def polynomial_pieces(self):
+        return [(self.x_start, self.x_end, 0.0, (self.b, self.a))]
+
+    def source_lines(self, derivative):
+        inside = _literal(self.a) if derivative else f"{_literal(self.a)} * x + {_literal(self.b)}"
+        outside = _gen_range_check(self.x_start, self.x_end)
+        if outside is None:
+            return [f"v = {inside}"]
+        return [f"v = 0.0 if {outside} else {inside}"]
+
+
+class TrapezoidElement(ProfileElement):
+    """
+    Трапеция (или яма, is_pit) с центром x0, высотой height, плоской частью base_a
+    и сглаженными склонами суммарной длины base_b.
+    Трение: f_stat, f_din - на всей трапеции (или на склонах, если заданы *_base),
+    f_stat_base, f_din_base - на плоской части.
+    """
+    __slots__ = ('x0', 'height', 'base_a', 'base_b', 'is_pit', 'f_stat', 'f_din', 'f_stat_base', 'f_din_base',
+                 'start_slope', 'start_flat', 'end_flat', 'end_slope')
+
+    def __init__(self, x0=0.0, height=1.0, base_a=10.0, base_b=2.0, is_pit=False,
+                 f_stat=0.0, f_din=0.0, f_stat_base=None, f_din_base=None, override=False):
+        self.x0 = x0
+        self.height = height
+        self.base_a = base_a
+        self.base_b = base_b
+        self.is_pit = is_pit
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.f_stat_base = f_stat_base
+        self.f_din_base = f_din_base
+        self.override = override
+        half_a = base_a / 2
+        half_b = base_b / 2
+        self.start_slope = x0 - half_a - half_b
+        self.start_flat = x0 - half_a
+        self.end_flat = x0 + half_a
+        self.end_slope = x0 + half_a + half_b
+
+    def support(self):
+        return self.start_slope, self.end_slope
+
+    def value(self, x):
+        if x < self.start_slope or x > self.end_slope:
+            return 0.0
+        left_ramp = smoothstep(self.start_slope, self.start_flat, x)
+        right_ramp = 1.0 - smoothstep(self.end_flat, self.end_slope, x)
+        u_val = self.height * min(left_ramp, right_ramp)
+        return -u_val if self.is_pit else u_val
+
+    def derivative(self, x):
+        if x < self.start_slope or x > self.end_slope:
+            return 0.0
+        # Производная min(left, right) - производная меньшего из склонов
+        left_ramp = smoothstep(self.start_slope, self.start_flat, x)
+        right_ramp = 1.0 - smoothstep(self.end_flat, self.end_slope, x)
+        if left_ramp <= right_ramp:
+            du = self.height * smoothstep_derivative(self.start_slope, self.start_flat, x)
+        else:
+            du = -self.height * smoothstep_derivative(self.end_flat, self.end_slope, x)
+        return -du if self.is_pit else du
+
+    def value_array(self, xs):
+        left_ramp = smoothstep_array(self.start_slope, self.start_flat, xs)
+        right_ramp = 1.0 - smoothstep_array(self.end_flat, self.end_slope, xs)
+        u_val = self.height * np.minimum(left_ramp, right_ramp)
+        inside = (xs >= self.start_slope) & (xs <= self.end_slope)
+        u_val = np.where(inside, u_val, 0.0)
+        return -u_val if self.is_pit else u_val
+
+    def derivative_array(self, xs):
+        left_ramp = smoothstep_array(self.start_slope, self.start_flat, xs)
+        right_ramp = 1.0 - smoothstep_array(self.end_flat, self.end_slope, xs)
+        du = np.where(left_ramp <= right_ramp,
+                      self.height * smoothstep_derivative_array(self.start_slope, self.start_flat, xs),
+                      -self.height * smoothstep_derivative_array(self.end_flat, self.end_slope, xs))
+        inside = (xs >= self.start_slope) & (xs <= self.end_slope)
+        du = np.where(inside, du, 0.0)
+        return -du if self.is_pit else du
+
+    def friction_zones(self):
+        if not (self.f_stat > 0 or self.f_din > 0):
+            return []
+        # Склоны: f_stat, f_din; плоская часть: f_stat_base, f_din_base (если заданы)
+        return [
+            (self.start_slope, self.end_slope, self.f_stat, self.f_din),
+            (self.start_flat, self.end_flat,
+             self.f_stat if self.f_stat_base is None else self.f_stat_base,
+             self.f_din if self.f_din_base is None else self.f_din_base),
+        ]
+
+    def polynomial_pieces(self):
+        if self.base_a < 0 or self.base_b < 0:
+            return None  # склоны перекрываются - min() склонов уже не полином
+        h = -self.height if self.is_pit else self.height
+        pieces = []
+        # smoothstep(t) = 3t² - 2t³, t = (x - начало склона) / длина склона
+        w = self.start_flat - self.start_slope
+        if w > 0:
+            pieces.append((self.start_slope, self.start_flat, self.start_slope, (0.0, 0.0, 3 * h / w ** 2, -2 * h / w ** 3)))
+        if self.end_flat > self.start_flat:
+            pieces.append((self.start_flat, self.end_flat, 0.0, (h,)))
+        w = self.end_slope - self.end_flat
+        if w > 0:
+            pieces.append((self.end_flat, self.end_slope, self.end_flat, (h, 0.0, -3 * h / w ** 2, 2 * h / w ** 3)))
+        return pieces
+
+    def source_lines(self, derivative):
+        sign = '-' if self.is_pit else ''
+        height = _literal(self.height)
+        body = (_gen_smoothstep('l', self.start_slope, self.start_flat)
+                + _gen_smoothstep('r', self.end_flat, self.end_slope))
+        body.append("r = 1.0 - r")
+        if derivative:
+            body.append("if l <= r:")
+            body += ['    ' + line for line in _gen_smoothstep('v', self.start_slope, self.start_flat, True)]
+            body.append(f"    v = {sign}({height} * v)")
+            body.append("else:")
+            body += ['    ' + line for line in _gen_smoothstep('v', self.end_flat, self.end_slope, True)]
+            body.append(f"    v = {sign}(-{height} * v)")
+        else:
+            body.append(f"v = {sign}({height} * min(l, r))")
+        return ([f"if x < {_literal(self.start_slope)} or x > {_literal(self.end_slope)}:", "    v = 0.0", "else:"]
+                + ['    ' + line for line in body])
+
+
+class SemicircleElement(ProfileElement):
+    """Полуокружность (или яма, is_pit) с центром x0 и радиусом radius; трение f_stat, f_din на ней"""
+    __slots__ = ('x0', 'radius', 'is_pit', 'f_stat', 'f_din', 'radius_sq')
+
+    def __init__(self, x0=0.0, radius=5.0, is_pit=False, f_stat=0.0, f_din=0.0, override=False):
+        self.x0 = x0
+        self.radius = radius
+        self.is_pit = is_pit
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.override = override
+        self.radius_sq = radius ** 2
+
+    def support(self):
+        # value() сравнивает |x - x0| с radius, а не x с x0 ± radius: запас на округление
+        pad = 2 * math.ulp(abs(self.x0) + self.radius)
+        return self.x0 - self.radius - pad, self.x0 + self.radius + pad
+
+    def value(self, x):
+        d = x - self.x0
+        if abs(d) > self.radius:
+            return 0.0
+        y = math.sqrt(self.radius_sq - d * d)
+        return -y if self.is_pit else y
+
+    def derivative(self, x):
+        # На самих краях производная бесконечна - считаем её равной 0, как и вне полукруга
+        d = x - self.x0
+        if abs(d) >= self.radius:
+            return 0.0
+        du = -d / math.sqrt(self.radius_sq - d * d)
+        return -du if self.is_pit else du
+
+    def value_array(self, xs):
+        d = xs - self.x0
+        y = np.where(np.abs(d) > self.radius, 0.0, np.sqrt(np.maximum(self.radius_sq - d * d, 0.0)))
+        return -y if self.is_pit else y
+
+    def derivative_array(self, xs):
+        d = xs - self.x0
+        inside = np.abs(d) < self.radius
+        du = np.where(inside, -d / np.sqrt(np.where(inside, self.radius_sq - d * d, 1.0)), 0.0)
+        return -du if self.is_pit else du
+
+    def friction_zones(self):
+        return _zone(self.x0 - self.radius, self.x0 + self.radius, self.f_stat, self.f_din)
+
+    def source_lines(self, derivative):
+        sign = '-' if self.is_pit else ''
+        radius, radius_sq = _literal(self.radius), _literal(self.radius_sq)
+        if derivative:
+            return [f"d = x - {_literal(self.x0)}",
+                    f"if abs(d) >= {radius}:", "    v = 0.0", "else:",
+                    f"    v = {sign}(-d / _sqrt({radius_sq} - d * d))"]
+        return [f"d = x - {_literal(self.x0)}",
+                f"if abs(d) > {radius}:", "    v = 0.0", "else:",
+                f"    v = {sign}_sqrt({radius_sq} - d * d)"]
+
+
+class SineWaveSumElement(ProfileElement):
+    """
+    Сумма синусоид amplitude * sin(frequency * x + phase) на всей прямой.
+    components - последовательность словарей с ключами 'amplitude', 'frequency', 'phase';
+    либо сразу упакованные массивы amplitudes, frequencies, phases (процедурные текстуры из сотен гармоник).
+    Трение f_stat, f_din действует на [x_start, x_end].
+
+    Компоненты хранятся массивами numpy; при VECTOR_MIN_COMPONENTS и больше value()/derivative()
+    считаются одним векторным np.sin/np.cos и скалярным произведением, при меньшем числе -
+    циклом по кортежам (накладные расходы numpy на вызов больше, чем несколько math.sin).
+    """
+    __slots__ = ('amplitudes', 'frequencies', 'phases', 'slopes', '_terms',
+                 'x_start', 'x_end', 'f_stat', 'f_din')
+
+    # Порог перехода на векторное вычисление
+    VECTOR_MIN_COMPONENTS = 32
+    # Больше компонент codegen() не разворачивает в выражение, а вызывает value()/derivative()
+    SOURCE_MAX_COMPONENTS = 16
+
+    def __init__(self, components=None, x_start=-INF, x_end=INF, f_stat=0.0, f_din=0.0, override=False,
+                 amplitudes=None, frequencies=None, phases=None):
+        if amplitudes is not None or frequencies is not None or phases is not None:
+            if components:
+                raise ValueError("Задайте либо components, либо amplitudes/frequencies/phases")
+            amplitudes = np.atleast_1d(np.asarray(amplitudes if amplitudes is not None else 0.0, dtype=float))
+            frequencies = np.atleast_1d(np.asarray(frequencies if frequencies is not None else 0.0, dtype=float))
+            phases = np.atleast_1d(np.asarray(phases if phases is not None else 0.0, dtype=float))
+            try:
+                amplitudes, frequencies, phases = np.broadcast_arrays(amplitudes, frequencies, phases)
+            except ValueError:
+                raise ValueError("amplitudes, frequencies, phases должны быть одной длины") from None
+        else:
+            packed = np.array([(comp.get('amplitude', 0.0), comp.get('frequency', 0.0), comp.get('phase', 0.0))
+                               for comp in components or ()], dtype=float).reshape(-1, 3)
+            amplitudes, frequencies, phases = packed.T
+        self.amplitudes = np.ascontiguousarray(amplitudes)
+        self.frequencies = np.ascontiguousarray(frequencies)
+        self.phases = np.ascontiguousarray(phases)
+        # amplitude * frequency - коэффициенты производной
+        self.slopes = self.amplitudes * self.frequencies
+        self._terms = tuple(zip(self.amplitudes.tolist(), self.frequencies.tolist(), self.phases.tolist(),
+                                self.slopes.tolist()))
+        self.x_start = x_start
+        self.x_end = x_end
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.override = override
+
+    @property
+    def components(self):
+        """Компоненты кортежами (amplitude, frequency, phase)"""
+        return tuple(term[:3] for term in self._terms)
+
+    def value(self, x):
+        if len(self._terms) >= self.VECTOR_MIN_COMPONENTS:
+            return float(np.dot(self.amplitudes, np.sin(self.frequencies * x + self.phases)))
+        total = 0.0
+        for amp, freq, phase, _ in self._terms:
+            total += amp * math.sin(freq * x + phase)
+        return total
+
+    def derivative(self, x):
+        if len(self._terms) >= self.VECTOR_MIN_COMPONENTS:
+            return float(np.dot(self.slopes, np.cos(self.frequencies * x + self.phases)))
+        total = 0.0
+        for _, freq, phase, slope in self._terms:
+            total += slope * math.cos(freq * x + phase)
+        return total
+
+    def value_array(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        flat = xs.reshape(-1)
+        total = np.zeros(flat.shape)
+        # Блоками, чтобы матрица фаз (точки x компоненты) не разрасталась
+        block = max(1, (1 << 16) // max(1, len(self._terms)))
+        for i in range(0, flat.size, block):
+            total[i:i + block] = np.sin(np.multiply.outer(flat[i:i + block], self.frequencies) + self.phases) @ self.amplitudes
+        return total.reshape(xs.shape)
+
+    def derivative_array(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        flat = xs.reshape(-1)
+        total = np.zeros(flat.shape)
+        block = max(1, (1 << 16) // max(1, len(self._terms)))
+        for i in range(0, flat.size, block):
+            total[i:i + block] = np.cos(np.multiply.outer(flat[i:i + block], self.frequencies) + self.phases) @ self.slopes
+        return total.reshape(xs.shape)
+
+    def friction_zones(self):
+        return _zone(self.x_start, self.x_end, self.f_stat, self.f_din)
+
+    def source_lines(self, derivative):
+        if len(self._terms) > self.SOURCE_MAX_COMPONENTS:
+            return None
+        terms = ['0.0']
+        for amp, freq, phase, _ in self._terms:
+            if derivative:
+                terms.append(f"{_literal(amp)} * {_literal(freq)} * _cos({_literal(freq)} * x + {_literal(phase)})")
+            else:
+                terms.append(f"{_literal(amp)} * _sin({_literal(freq)} * x + {_literal(phase)})")
+        return ["v = " + ' + '.join(terms)]
+
+
+def _hermite_slopes(xs, ys, method):
+    """
+    Наклоны в узлах для кубической эрмитовой интерполяции (векторизованно, без списков Python).
+    'cubic' - центральные разности (сплайн Катмулла-Рома для равномерной сетки),
+    'monotone' - Фрич-Карлсон (PCHIP): интерполянт не выходит за пределы соседних отсчётов.
+    """
+    h = np.diff(xs)
+    d = np.diff(ys) / h
+    m = np.empty(len(ys))
+    if len(d) == 1:
+        m[:] = d[0]
+        return m
+    # Концы - односторонняя трёхточечная формула (второй порядок, как и внутри)
+    m[0] = ((2 * h[0] + h[1]) * d[0] - h[0] * d[1]) / (h[0] + h[1])
+    m[-1] = ((2 * h[-1] + h[-2]) * d[-1] - h[-1] * d[-2]) / (h[-1] + h[-2])
+    if method == 'cubic':
+        m[1:-1] = (ys[2:] - ys[:-2]) / (xs[2:] - xs[:-2])
+    elif method == 'monotone':
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        same_sign = d[:-1] * d[1:] > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            harmonic = (w1 + w2) / (w1 / d[:-1] + w2 / d[1:])
+        m[1:-1] = np.where(same_sign, harmonic, 0.0)
+        # На концах наклон не должен менять знак и превышать утроенную секущую
+        for end, secant, neighbour in ((0, d[0], d[1]), (-1, d[-1], d[-2])):
+            if m[end] * secant <= 0:
+                m[end] = 0.0
+            elif secant * neighbour <= 0 and abs(m[end]) > 3 * abs(secant):
+                m[end] = 3 * secant
+    else:
+        raise ValueError(f"Неизвестный метод интерполяции: {method!r} (ожидается 'cubic' или 'monotone')")
+    return m
+
+
+def _strictly_increasing(xs, chunk_size=1 << 20):
+    """Строго ли возрастают xs (NaN - нет); memmap проверяется блоками, не читаясь в память целиком"""
+    for start in range(0, len(xs) - 1, chunk_size):
+        block = np.asarray(xs[start:start + chunk_size + 1], dtype=float)
+        if not np.all(np.diff(block) > 0):
+            return False
+    return True
+
+
+class SampledElement(ProfileElement):
+    """
+    Профиль по отсчётам (например, измеренным на устройстве): values - U или F (quantity='force')
+    в узлах xs либо на равномерной сетке x0 + i * dx. Массивы используются как есть, в том числе
+    np.memmap - отсчёты не копируются в списки Python; дополнительно хранится только массив наклонов
+    (и для F - накопленный интеграл, чтобы получить U).
+    Интерполяция - кубическая эрмитова: method='cubic' (центральные разности) или 'monotone' (PCHIP).
+    Поиск узла: O(1) на равномерной сетке, O(log n) (np.searchsorted) на неравномерной.
+    Носитель - [xs[0], xs[-1]]: вне его U и F равны 0; трение f_stat, f_din - на всём носителе.
+    """
+    __slots__ = ('xs', 'values', 'quantity', 'method', 'x0', 'dx', 'n', 'x_end',
+                 'slopes', 'integral', 'f_stat', 'f_din')
+
+    def __init__(self, values, xs=None, x0=0.0, dx=1.0, quantity='potential', method='cubic',
+                 f_stat=0.0, f_din=0.0, override=False):
+        if quantity not in ('potential', 'force'):
+            raise ValueError("quantity должна быть 'potential' или 'force'")
+        if len(values) < 2:
+            raise ValueError("Нужно хотя бы два отсчёта")
+        self.values = values
+        self.n = len(values)
+        if xs is not None:
+            if len(xs) != self.n:
+                raise ValueError("xs и values должны быть одной длины")
+            if not _strictly_increasing(xs):
+                raise ValueError("xs должны строго возрастать")
+            self.xs = xs
+            self.x0 = float(xs[0])
+            self.x_end = float(xs[-1])
+            self.dx = None
+            grid = np.asarray(xs, dtype=float)
+        else:
+            if not dx > 0:
+                raise ValueError("dx должен быть положительным")
+            self.xs = None
+            self.x0 = float(x0)
+            self.dx = float(dx)
+            self.x_end = self.x0 + (self.n - 1) * self.dx
+            grid = self.x0 + self.dx * np.arange(self.n)
+        ys = np.asarray(values, dtype=float)
+        self.quantity = quantity
+        self.method = method
+        self.slopes = _hermite_slopes(grid, ys, method)
+        self.integral = None
+        if quantity == 'force':
+            # U(x) = -∫F: точный интеграл эрмитова куска h * (y0 + y1) / 2 + h² * (m0 - m1) / 12
+            h = np.diff(grid)
+            pieces = h * (ys[:-1] + ys[1:]) / 2 + h * h * (self.slopes[:-1] - self.slopes[1:]) / 12
+            self.integral = np.concatenate(([0.0], np.cumsum(pieces)))
+        self.f_stat = f_stat
+        self.f_din = f_din
+        self.override = override
+
+    @classmethod
+    def load(cls, values_path, xs_path=None, **kwargs):
+        """Отсчёты из файлов .npy, открытых через memory-map (без чтения в память)"""
+        values = np.load(values_path, mmap_mode='r')
+        xs = np.load(xs_path, mmap_mode='r') if xs_path is not None else None
+        return cls(values, xs, **kwargs)
+
+    def support(self):
+        return self.x0, self.x_end
+
+    def friction_zones(self):
+        return _zone(self.x0, self.x_end, self.f_stat, self.f_din)
+
+    def _locate(self, x):
+        """(номер отрезка i, левый узел, длина отрезка)"""
+        if self.dx is not None:
+            i = int((x - self.x0) / self.dx)
+            if i >= self.n - 1:
+                i = self.n - 2
+            return i, self.x0 + i * self.dx, self.dx
+        i = int(np.searchsorted(self.xs, x, side='right')) - 1
+        if i >= self.n - 1:
+            i = self.n - 2
+        x_left = float(self.xs[i])
+        return i, x_left, float(self.xs[i + 1]) - x_left
+
+    def _interpolate(self, x, derivative):
+        """Эрмитов интерполянт отсчётов (или его производная) в x внутри носителя"""
+        i, x_left, h = self._locate(x)
+        y0, y1 = float(self.values[i]), float(self.values[i + 1])
+        m0, m1 = float(self.slopes[i]), float(self.slopes[i + 1])
+        s = (x - x_left) / h
+        s2 = s * s
+        if derivative:
+            return (6 * s2 - 6 * s) * (y0 - y1) / h + (3 * s2 - 4 * s + 1) * m0 + (3 * s2 - 2 * s) * m1
+        s3 = s2 * s
+        return ((2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * h * m0
+                + (3 * s2 - 2 * s3) * y1 + (s3 - s2) * h * m1)
+
+    def _integrate(self, x):
+        """∫ от x0 до x эрмитова интерполянта F"""
+        i, x_left, h = self._locate(x)
+        y0, y1 = float(self.values[i]), float(self.values[i + 1])
+        m0, m1 = float(self.slopes[i]), float(self.slopes[i + 1])
+        s = (x - x_left) / h
+        s2 = s * s
+        s3 = s2 * s
+        s4 = s3 * s
+        # Первообразные базисных функций Эрмита по s, умноженные на h
+        return float(self.integral[i]) + h * ((s4 / 2 - s3 + s) * y0 + (s4 / 4 - 2 * s3 / 3 + s2 / 2) * h * m0
+                                       + (s3 - s4 / 2) * y1 + (s4 / 4 - s3 / 3) * h * m1)
+
+    def value(self, x):
+        if x < self.x0 or x > self.x_end:
+            return 0.0
+        if self.integral is not None:
+            return -self._integrate(x)
+        return self._interpolate(x, False)
+
+    def derivative(self, x):
+        if x < self.x0 or x > self.x_end:
+            return 0.0
+        if self.integral is not None:
+            return -self._interpolate(x, False)
+        return self._interpolate(x, True)
+
+    def _locate_array(self, xs):
+        if self.dx is not None:
+            i = np.clip(((xs - self.x0) / self.dx).astype(np.int64), 0, self.n - 2)
+            x_left = self.x0 + i * self.dx
+            return i, x_left, np.full(xs.shape, self.dx)
+        i = np.clip(np.searchsorted(self.xs, xs, side='right') - 1, 0, self.n - 2)
+        x_left = np.asarray(self.xs[i], dtype=float)
+        return i, x_left, np.asarray(self.xs[i + 1], dtype=float) - x_left
+
+    def _evaluate_array(self, xs, derivative):
+        xs = np.asarray(xs, dtype=float)
+        inside = (xs >= self.x0) & (xs <= self.x_end)
+        i, x_left, h = self._locate_array(np.where(inside, xs, self.x0))
+        y0 = np.asarray(self.values[i], dtype=float)
+        y1 = np.asarray(self.values[i + 1], dtype=float)
+        m0, m1 = self.slopes[i], self.slopes[i + 1]
+        s = (np.where(inside, xs, self.x0) - x_left) / h
+        s2 = s * s
+        s3 = s2 * s
+        if self.integral is None and derivative:
+            out = (6 * s2 - 6 * s) * (y0 - y1) / h + (3 * s2 - 4 * s + 1) * m0 + (3 * s2 - 2 * s) * m1
+        elif self.integral is None or derivative:
+            out = (2 * s3 - 3 * s2 + 1) * y0 + (s3 - 2 * s2 + s) * h * m0 + (3 * s2 - 2 * s3) * y1 + (s3 - s2) * h * m1
+            if derivative:
+                out = -out
+        else:
+            s4 = s3 * s
+            out = -(self.integral[i] + h * ((s4 / 2 - s3 + s) * y0 + (s4 / 4 - 2 * s3 / 3 + s2 / 2) * h * m0
+                                            + (s3 - s4 / 2) * y1 + (s4 / 4 - s3 / 3) * h * m1))
+        return np.where(inside, out, 0.0)
+
+    def value_array(self, xs):
+        return self._evaluate_array(xs, False)
+
+    def derivative_array(self, xs):
+        return self._evaluate_array(xs, True)
+
+
+class FunctionElement(ProfileElement):
+    """
+    Пользовательская функция U = func(x, **params). Носитель - вся прямая, аналитической
+    производной нет (сила считается центральной разностью). Если в params заданы f_stat/f_din,
+    трение действует на [x_start, x_end] из params (по умолчанию - на всей прямой).
+    """
+    __slots__ = ('func', 'params')
+    analytic = False
+
+    def __init__(self, func, params=None, override=False):
+        self.func = func
+        self.params = dict(params or {})
+        self.override = override
+
+    def value(self, x):
+        return self.func(x, **self.params)
+
+    def derivative(self, x, dx=1e-3):
+        return (self.func(x + dx, **self.params) - self.func(x - dx, **self.params)) / (2 * dx)
+
+    def friction_zones(self):
+        params = self.params
+        return _zone(params.get('x_start', -INF), params.get('x_end', INF),
+                     params.get('f_stat', 0.0), params.get('f_din', 0.0))
+
+    def copy(self):
+        return FunctionElement(self.func, self.params, self.override)
+
+
+# Встроенные функции профиля и их элементы: add_function(trapezoid, ...) создаёт TrapezoidElement(...)
+ELEMENT_TYPES = {
+    constant: ConstantElement,
+    linear: LinearElement,
+    trapezoid: TrapezoidElement,
+    semicircle: SemicircleElement,
+    sine_wave_sum: SineWaveSumElement,
+}
+
+
+def make_element(func, override=False, **params):
+    """Элемент профиля для функции func с параметрами params"""
+    element_type = ELEMENT_TYPES.get(func)
+    if element_type is None:
+        return FunctionElement(func, params, override)
+    return element_type(override=override, **params)
+
+
+def _as_element(item):
+    """Элемент профиля или словарь прежнего формата {'func', 'params', 'override'}"""
+    if isinstance(item, ProfileElement):
+        return item
+    if isinstance(item, dict) and 'func' in item:
+        return make_element(item['func'], item.get('override', False), **item.get('params', {}))
+    raise TypeError(f"Ожидается ProfileElement или словарь {{'func', 'params', 'override'}}, получено {item!r}")
+
+
+def _element_method(func, method, name):
+    """Функция name(x, **params) = method элемента ELEMENT_TYPES[func](**params)"""
+    element_type = ELEMENT_TYPES[func]
+    array = method.endswith('_array')
+
+    def wrapper(x, **params):
+        element = element_type(**params)
+        return getattr(element, method)(np.asarray(x, dtype=float) if array else x)
+    wrapper.__name__ = wrapper.__qualname__ = name
+    wrapper.__doc__ = f"{func.__name__}: {element_type.__name__}.{method}"
+    return wrapper
+
+
+constant_array = _element_method(constant, 'value_array', 'constant_array')
+linear_array = _element_method(linear, 'value_array', 'linear_array')
+trapezoid_array = _element_method(trapezoid, 'value_array', 'trapezoid_array')
+semicircle_array = _element_method(semicircle, 'value_array', 'semicircle_array')
+sine_wave_sum_array = _element_method(sine_wave_sum, 'value_array', 'sine_wave_sum_array')
+
+constant_derivative = _element_method(constant, 'derivative', 'constant_derivative')
+linear_derivative = _element_method(linear, 'derivative', 'linear_derivative')
+trapezoid_derivative = _element_method(trapezoid, 'derivative', 'trapezoid_derivative')
+semicircle_derivative = _element_method(semicircle, 'derivative', 'semicircle_derivative')
+sine_wave_sum_derivative = _element_method(sine_wave_sum, 'derivative', 'sine_wave_sum_derivative')
+
+constant_derivative_array = _element_method(constant, 'derivative_array', 'constant_derivative_array')
+linear_derivative_array = _element_method(linear, 'derivative_array', 'linear_derivative_array')
+trapezoid_derivative_array = _element_method(trapezoid, 'derivative_array', 'trapezoid_derivative_array')
+semicircle_derivative_array = _element_method(semicircle, 'derivative_array', 'semicircle_derivative_array')
+sine_wave_sum_derivative_array = _element_method(sine_wave_sum, 'derivative_array', 'sine_wave_sum_derivative_array')
+
+# Соответствие скалярной функции и её векторизованной версии и производных
+# (тонкие обёртки над элементами профиля)
+ARRAY_FUNCTIONS = {
+    constant: constant_array,
+    linear: linear_array,
+    trapezoid: trapezoid_array,
+    semicircle: semicircle_array,
+    sine_wave_sum: sine_wave_sum_array,
+}
+
+DERIVATIVES = {
+    constant: constant_derivative,
+    linear: linear_derivative,
+    trapezoid: trapezoid_derivative,
+    semicircle: semicircle_derivative,
+    sine_wave_sum: sine_wave_sum_derivative,
+}
+
+ARRAY_DERIVATIVES = {
+    constant: constant_derivative_array,
+    linear: linear_derivative_array,
+    trapezoid: trapezoid_derivative_array,
+    semicircle: semicircle_derivative_array,
+    sine_wave_sum: sine_wave_sum_derivative_array,
+}
+
+
+class _SegmentIndex:
+    """
+    Отсортированные точки разбиения _coords; для каждой заранее найдено значение в самой точке
+    (_point_values) и на открытом интервале до следующей точки (_open_values).
+    Поиск — бинарный, O(log n); левее всех точек - _default.
+    """
+    _default = None
+
+    def __len__(self):
+        return len(self._coords)
+
+    def lookup(self, x):
+        i = bisect.bisect_right(self._coords, x) - 1
+        if i < 0:
+            return self._default
+        if self._coords[i] == x:
+            return self._point_values[i]
+        return self._open_values[i]
+
+
+class SupportIndex(_SegmentIndex):
+    """
+    Индекс носителей элементов профиля: для каждой точки разбиения и открытого интервала -
+    кортеж элементов, чьи носители его покрывают, в исходном порядке (порядок важен для override
+    и для порядка суммирования). lookup(x) возвращает только элементы, которые могут быть
+    ненулевыми в x: O(log n + k) вместо n. Неограниченные элементы попадают во все интервалы.
+    """
+    _default = ()
+
+    def __init__(self, elements):
+        spans = sorted(((lo, hi, order) for order, (lo, hi) in enumerate(e.support() for e in elements) if lo <= hi))
+        coords = sorted({lo for lo, _, _ in spans} | {hi for _, hi, _ in spans})
+
+        point_values = []
+        open_values = []
+        active = {}  # порядковый номер -> x_end
+        j = 0
+        for c in coords:
+            while j < len(spans) and spans[j][0] <= c:
+                active[spans[j][2]] = spans[j][1]
+                j += 1
+            for order in [o for o, hi in active.items() if hi < c]:
+                del active[order]
+            point_values.append(tuple(elements[o] for o in sorted(active)))
+            for order in [o for o, hi in active.items() if hi <= c]:
+                del active[order]
+            open_values.append(tuple(elements[o] for o in sorted(active)))
+
+        self._coords = coords
+        self._point_values = point_values
+        self._open_values = open_values
+
+
+class FrictionIndex(_SegmentIndex):
+    """
+    Индекс зон трения: отсортированные непересекающиеся отрезки, для каждого из которых
+    заранее выбрана зона с наибольшим приоритетом. Поиск — бинарный, O(log n).
+    zones - последовательность (x_start, x_end, f_stat, f_din) в порядке возрастания приоритета.
+    """
+    _NONE = (None, None)
+    _default = _NONE
+
+    def __init__(self, zones):
+        zones = [(a, b, (fs, fd), priority) for priority, (a, b, fs, fd) in enumerate(zones) if a <= b]
+        coords = sorted({a for a, _, _, _ in zones} | {b for _, b, _, _ in zones})
+        zones.sort(key=lambda z: z[0])
+
+        # Для каждой точки разбиения храним значение в самой точке (зоны замкнутые)
+        # и на открытом интервале до следующей точки
+        point_values = []
+        open_values = []
+        heap = []  # (-priority, x_end, value)
+        j = 0
+        for c in coords:
+            while j < len(zones) and zones[j][0] <= c:
+                a, b, value, priority = zones[j]
+                heapq.heappush(heap, (-priority, b, value))
+                j += 1
+            while heap and heap[0][1] < c:
+                heapq.heappop(heap)
+            point_values.append(heap[0][2] if heap else self._NONE)
+            while heap and heap[0][1] <= c:
+                heapq.heappop(heap)
+            open_values.append(heap[0][2] if heap else self._NONE)
+
+        self._coords = coords
+        self._point_values = point_values
+        self._open_values = open_values
+        self._arrays = None
+        # Границы - точки, где трение действительно меняется (слева, в точке или справа)
+        self.boundaries = [
+            c for i, c in enumerate(coords)
+            if point_values[i] != open_values[i] or point_values[i] != (open_values[i - 1] if i else self._NONE)
+        ]
+
+    def next_boundary(self, x0, x1):
+        """Первая граница зон трения строго между x0 и x1 по ходу движения от x0 к x1 или None"""
+        b = self.boundaries
+        if x1 > x0:
+            i = bisect.bisect_right(b, x0)
+            if i < len(b) and b[i] < x1:
+                return b[i]
+        elif x1 < x0:
+            i = bisect.bisect_left(b, x0) - 1
+            if i >= 0 and b[i] > x1:
+                return b[i]
+        return None
+
+    def lookup_array(self, xs):
+        """
+        Векторизованный lookup: возвращает массивы (f_stat, f_din); вне зон — NaN.
+        """
+        xs = np.asarray(xs, dtype=float)
+        if self._arrays is None:
+            none = (np.nan, np.nan)
+            point = np.array([none if v[0] is None else v for v in self._point_values], dtype=float).reshape(-1, 2)
+            open_ = np.array([none if v[0] is None else v for v in self._open_values], dtype=float).reshape(-1, 2)
+            # Индекс 0 зарезервирован под область левее всех зон
+            self._arrays = (np.asarray(self._coords, dtype=float),
+                            np.vstack((np.array([none]), point)),
+                            np.vstack((np.array([none]), open_)))
+        coords, point, open_ = self._arrays
+        i = np.searchsorted(coords, xs, side='right')
+        on_point = (i > 0) & (coords[np.maximum(i - 1, 0)] == xs) if coords.size else np.zeros(xs.shape, dtype=bool)
+        values = np.where(on_point[..., None], point[i], open_[i])
+        return values[..., 0], values[..., 1]
+
+
 class PiecewiseProfile: 
     """
     Профиль, состоящий из комбинации базовых функций.
-    Содержит список словарей: {'func': func, 'params': {...}, 'override': bool}
-    Если override=True и функция активна (func != 0), то её значение заменяет собой сумму остальных.
+    Содержит список элементов (ProfileElement) в порядке добавления.
+    Если override=True и элемент активен (значение != 0), то его значение заменяет собой сумму остальных.
     """
-    def __init__(self, functions=None):
-        self.functions = functions or []
+    # С какого числа элементов potential()/force() отбирают элементы по индексу носителей:
+    # для пары элементов поиск по индексу дороже, чем их вычисление
+    CULLING_MIN_ELEMENTS = 4
+
+    def __init__(self, elements=None, functions=None):
+        # functions - прежнее имя: список словарей {'func', 'params', 'override'} или элементов
+        items = list(elements or []) + list(functions or [])
+        self.elements = [_as_element(item) for item in items]
+        self._version = 0
+        self._friction_index = None
+        self._support_index = None
+
+    @property
+    def functions(self):
+        """
+        Прежнее имя списка elements - только для чтения: изменение списка в обход профиля
+        не сбросило бы его кэши. Добавляйте элементы через add_function()/add_element().
+        """
+        return tuple(self.elements)
 
     def add_function(self, func, override=False, **params):
-        self.functions.append({'func': func, 'params': params, 'override': override})
+        """Добавляет встроенную функцию (constant, linear, ...) или пользовательскую func(x, **params)"""
+        self.add_element(make_element(func, override, **params))
+
+    def add_element(self, element):
+        self.elements.append(element)
+        self.invalidate()
+
+    def elements_at(self, x):
+        """
+        Элементы, носитель которых содержит x (в исходном порядке), по индексу SupportIndex.
+        Остальные элементы в x равны нулю, и potential()/force() их не вычисляют.
+        """
+        index = self._support_index
+        if index is None:
+            index = self._support_index = SupportIndex(self.elements)
+        return index.lookup(x)
 
     def potential(self, x):
-        override_val = None
         total = 0.0
-        for f in self.functions:
-            val = f['func'](x, **f['params'])
-            if f['override'] and val != 0:
-                # Если функция с override и она активна (val != 0), возвращаем только её
-                return val
-            elif not f['override']:
+        elements = self.elements
+        if len(elements) >= self.CULLING_MIN_ELEMENTS:
+            elements = self.elements_at(x)
+        for e in elements:
+            val = e.value(x)
+            if e.override:
+                if val != 0:
+                    # Если элемент с override и он активен (val != 0), возвращаем только его
+                    return val
+            else:
                 total += val
 
         # Если не было override-функций, возвращаем сумму
         return total
 
     def force(self, x, dx=1e-3):
+        """
+        F = -dU/dx. Используются аналитические производные элементов; если у активного
+        элемента производной нет (пользовательская функция), считаем центральной разностью.
+        """
+        dU = 0.0
+        numeric = False
+        elements = self.elements
+        if len(elements) >= self.CULLING_MIN_ELEMENTS:
+            elements = self.elements_at(x)
+        for e in elements:
+            if e.override:
+                # Override-элемент определяет силу, только если он активен
+                if e.value(x) != 0:
+                    if not e.analytic:
+                        return self._numeric_force(x, dx)
+                    return -e.derivative(x)
+            elif not e.analytic:
+                numeric = True
+            elif not numeric:
+                dU += e.derivative(x)
+        if numeric:
+            return self._numeric_force(x, dx)
+        return -dU
+
+    def _numeric_force(self, x, dx=1e-3):
         dU = (self.potential(x + dx) - self.potential(x - dx)) / (2 * dx)
         return -dU
+
+    def potential_array(self, xs):
+        """
+        Векторизованный potential: вычисляет U на всём массиве xs за один проход
+        по элементам. Семантика override совпадает с potential().
+        """
+        xs = np.asarray(xs, dtype=float)
+        total = np.zeros_like(xs)
+        override_val = np.zeros_like(xs)
+        overridden = np.zeros(xs.shape, dtype=bool)
+        for e in self.elements:
+            val = e.value_array(xs)
+            if e.override:
+                # Побеждает первая по порядку активная override-функция
+                hit = (val != 0) & ~overridden
+                override_val[hit] = val[hit]
+                overridden |= hit
+            else:
+                total += val
+        return np.where(overridden, override_val, total)
+
+    def force_array(self, xs, dx=1e-3):
+        """Векторизованный force, та же логика выбора производной, что и в force()"""
+        xs = np.asarray(xs, dtype=float)
+        dU = np.zeros_like(xs)
+        override_dU = np.zeros_like(xs)
+        overridden = np.zeros(xs.shape, dtype=bool)
+        numeric = np.zeros(xs.shape, dtype=bool)
+        base_numeric = False
+        for e in self.elements:
+            if e.override:
+                val = e.value_array(xs)
+                hit = (val != 0) & ~overridden
+                if not e.analytic:
+                    numeric |= hit
+                else:
+                    override_dU[hit] = e.derivative_array(xs)[hit]
+                overridden |= hit
+            elif not e.analytic:
+                base_numeric = True
+            else:
+                dU += e.derivative_array(xs)
+
+        F = -np.where(overridden, override_dU, dU)
+        if base_numeric:
+            numeric |= ~overridden
+        if numeric.any():
+            xn = xs[numeric]
+            F[numeric] = -(self.potential_array(xn + dx) - self.potential_array(xn - dx)) / (2 * dx)
+        return F
     
+    def invalidate(self):
+        """
+        Сбрасывает кэши, построенные по профилю (индекс трения и т.п.).
+        add_function() вызывает его сам; вызывайте вручную, если меняете elements или их поля напрямую.
+        """
+        self._version += 1
+        self._friction_index = None
+        self._support_index = None
+
+    @property
+    def version(self):
+        """Счётчик изменений профиля — по нему потребители проверяют актуальность своих кэшей"""
+        return self._version
+
     def get_local_friction(self, x):
         """
         Возвращает локальные параметры трения (static, kinetic) для позиции x.
         Если x не попадает ни в один элемент с трением, возвращает (None, None).
+        При пересечении зон приоритет у последней добавленной функции.
+        Поиск идёт по индексу зон (FrictionIndex), который строится один раз после изменения профиля.
         """
-        # Проходим по функциям в обратном порядке, чтобы при пересечении
-        # приоритет отдавался последней добавленной (если так задумано)
-        for f in reversed(self.functions):
-            func = f['func']
-            params = f['params']
-
-            # Проверяем, активен ли элемент и есть ли у него параметры трения
-            friction_static = params.get('f_stat', 0.0)
-            friction_kinetic = params.get('f_din', 0.0)
-
-            # Проверяем, находится ли x внутри "активной" зоны функции
-            is_inside = False
-            # --- Проверка для constant ---
-            if func.__name__ == 'constant':
-                x_start = params.get('x_start', float('-inf'))
-                x_end = params.get('x_end', float('inf'))
-                if x_start <= x <= x_end and (friction_static > 0 or friction_kinetic > 0):
-                    is_inside = True
-
-            # --- Проверка для linear ---
-            elif func.__name__ == 'linear':
-                x_start = params.get('x_start', float('-inf'))
-                x_end = params.get('x_end', float('inf'))
-                if x_start <= x <= x_end and (friction_static > 0 or friction_kinetic > 0):
-                    is_inside = True
-
-            # --- Проверка для trapezoid ---
-            elif func.__name__ == 'trapezoid' and (friction_static > 0 or friction_kinetic > 0):
-                x0 = params['x0']
-                base_a = params.get('base_a', 10.0)
-                base_b = params.get('base_b', 2.0)
-                half_a = base_a / 2
-                half_b = base_b / 2
-                start_slope = x0 - half_a - half_b
-                end_slope = x0 + half_a + half_b
-                # Проверяем, внутри ли x области трапеции
-                if start_slope <= x <= end_slope:
-                    # Тогда возвращаем либо f_stat, f_din (для плоской части и склонов),
-                    # либо f_stat_base, f_din_base (только для плоской части).
-                    # f_stat_base, f_din_base - для плоской части (base_a).
-                    # f_stat, f_din - для "всего" элемента трапеции.
-                    # Проверим, на плоской ли части мы:
-                    start_flat = x0 - half_a
-                    end_flat = x0 + half_a
-                    if start_flat <= x <= end_flat:
-                        # Используем f_stat_base, f_din_base, если они заданы, иначе f_stat, f_din
-                        fs = params.get('f_stat_base', friction_static)
-                        fd = params.get('f_din_base', friction_kinetic)
-                    else:
-                        # Используем f_stat, f_din для склонов
-                        fs = friction_static
-                        fd = friction_kinetic
-                    return fs, fd # НАХОДИТСЯ ВНУТРИ БЛОКА elif func.__name__ == 'trapezoid'
-                # Если x не внутри трапеции, is_inside останется False для этой функции
-
-            # --- Проверка для semicircle ---
-            elif func.__name__ == 'semicircle' and (friction_static > 0 or friction_kinetic > 0):
-                x0 = params['x0']
-                radius = params['radius']
-                # Проверяем, внутри ли x области полукруга
-                if abs(x - x0) <= radius:
-                    is_inside = True
-
-            # --- Проверка для sine_wave_sum ---
-            # elif func.__name__ == 'sine_wave_sum' and (friction_static > 0 or friction_kinetic > 0):
-                # Предположим, что sine_wave_sum имеет трение везде, где определена (или задайте диапазон)
-                # Для простоты, считаем, что если f_stat или f_din заданы, она "активна" везде
-                # Или добавьте x_start, x_end в sine_wave_sum
-                # Пока просто проверим, есть ли трение
-                # Чтобы было точно, лучше добавить x_start, x_end к sine_wave_sum
-                # x_start_sine = params.get('x_start', float('-inf'))
-                # x_end_sine = params.get('x_end', float('inf'))
-                # if x_start_sine <= x <= x_end_sine and (friction_static > 0 or friction_kinetic > 0):
-                #    is_inside = True
-                # Пока примем, что если трение задано, но диапазон не указан, оно не применяется
-                # или применяется "везде", что может быть нежелательно.
-                # Лучше добавить x_start, x_end к sine_wave_sum в её определении.
-                # Пока оставим как есть, если не задан диапазон, трение не применяется.
-                # Пока не реализуем, если нет явного диапазона.
-
-            if is_inside and (friction_static > 0 or friction_kinetic > 0):
-                return friction_static, friction_kinetic
-
-        # Если не попал ни в один элемент с трением, возвращаем глобальные значения или (0, 0)
-        # Возвращаем (None, None), чтобы вызывающий код мог понять, что нужно использовать глобальные.
-        return None, None
+        index = self._friction_index
+        if index is None:
+            index = self._friction_index = self.build_friction_index()
+        return index.lookup(x)
+
+    def get_local_friction_array(self, xs):
+        """Векторизованный get_local_friction: массивы (f_stat, f_din), NaN там, где зон нет"""
+        index = self._friction_index
+        if index is None:
+            index = self._friction_index = self.build_friction_index()
+        return index.lookup_array(xs)
+
+    def next_friction_boundary(self, x0, x1):
+        """Первая точка смены трения строго между x0 и x1 (по ходу движения) или None"""
+        index = self._friction_index
+        if index is None:
+            index = self._friction_index = self.build_friction_index()
+        return index.next_boundary(x0, x1)
+
+    def build_friction_index(self):
+        zones = []
+        for e in self.elements:
+            zones.extend(e.friction_zones())
+        return FrictionIndex(zones)
+
+    def force_and_friction(self, x):
+        """(force(x), get_local_friction(x)) одним вызовом"""
+        return self.force(x), self.get_local_friction(x)
+
+    def codegen(self):
+        """Генерирует специализированный код для текущего набора элементов (см. GeneratedProfile)"""
+        return GeneratedProfile(self)
+
+    def compile_polynomial(self):
+        """Компилирует профиль в кусочно-полиномиальный (см. PolynomialProfile)"""
+        return PolynomialProfile(self)
+
+    def compile(self, x_min, x_max, resolution=10000):
+        """
+        Компилирует профиль в таблицу на отрезке [x_min, x_max] (см. CompiledProfile).
+        resolution - число интервалов сетки.
+        """
+        return CompiledProfile(self, x_min, x_max, resolution)
+
+
+class CompiledProfile:
+    """
+    Замороженный табличный профиль: U(x), F(x) и трение предвычислены на равномерной
+    сетке, поэтому potential/force/get_local_friction работают за O(1) независимо
+    от числа элементов исходного профиля.
+
+    Точность: U и F интерполируются линейно, ошибка не превышает h**2 / 8 * max|U''|
+    (для F - h**2 / 8 * max|F''|), где h = (x_max - x_min) / resolution.
+    Наибольшая наблюдаемая ошибка в серединах ячеек хранится в midpoint_potential_error
+    и midpoint_force_error. Это замер, а не гарантированная граница: между серединами
+    (например, у изломов и особенностей профиля) ошибка может быть больше.
+    Трение берётся из ближайшего узла, т.е. границы зон трения смещаются не более чем на h / 2.
+    Вне [x_min, x_max] вычисления делегируются копии исходного профиля.
+    """
+    def __init__(self, profile, x_min, x_max, resolution=10000):
+        resolution = int(resolution)
+        if resolution < 1 or not x_max > x_min:
+            raise ValueError("Требуется x_max > x_min и resolution >= 1")
+
+        # Копируем элементы, чтобы последующие add_function() не меняли таблицу
+        self.source = PiecewiseProfile([e.copy() for e in profile.elements])
+        self.x_min = float(x_min)
+        self.x_max = float(x_max)
+        self.resolution = resolution
+        self.h = (self.x_max - self.x_min) / resolution
+        self._inv_h = 1.0 / self.h
+
+        xs = np.linspace(self.x_min, self.x_max, resolution + 1)
+        us = self.source.potential_array(xs)
+        fs = self.source.force_array(xs)
+        self._xs = xs
+        self._us = us
+        self._fs = fs
+        friction = [self.source.get_local_friction(x) for x in xs]
+
+        # Списки Python быстрее скалярной индексации numpy в горячем цикле
+        self._u = tuple(us.tolist())
+        self._du = tuple(np.diff(us).tolist())
+        self._f = tuple(fs.tolist())
+        self._df = tuple(np.diff(fs).tolist())
+        self._friction = tuple(friction)
+
+        # Наибольшая наблюдаемая ошибка в серединах ячеек
+        mids = xs[:-1] + self.h / 2
+        self.midpoint_potential_error = float(np.max(np.abs(self.potential_array(mids) - self.source.potential_array(mids))))
+        self.midpoint_force_error = float(np.max(np.abs(self.force_array(mids) - self.source.force_array(mids))))
+
+    def _cell(self, x):
+        t = (x - self.x_min) * self._inv_h
+        i = int(t)
+        if i >= self.resolution:
+            i = self.resolution - 1
+        return i, t - i
+
+    def potential(self, x):
+        if x < self.x_min or x > self.x_max:
+            return self.source.potential(x)
+        i, frac = self._cell(x)
+        return self._u[i] + self._du[i] * frac
+
+    def force(self, x):
+        if x < self.x_min or x > self.x_max:
+            return self.source.force(x)
+        i, frac = self._cell(x)
+        return self._f[i] + self._df[i] * frac
+
+    def _interp_array(self, xs, table, fallback):
+        xs = np.asarray(xs, dtype=float)
+        out = np.interp(xs, self._xs, table)
+        outside = (xs < self.x_min) | (xs > self.x_max)
+        if outside.any():
+            out[outside] = fallback(xs[outside])
+        return out
+
+    def potential_array(self, xs):
+        return self._interp_array(xs, self._us, self.source.potential_array)
+
+    def force_array(self, xs):
+        return self._interp_array(xs, self._fs, self.source.force_array)
+
+    def get_local_friction(self, x):
+        if x < self.x_min or x > self.x_max:
+            return self.source.get_local_friction(x)
+        return self._friction[int((x - self.x_min) * self._inv_h + 0.5)]
+
+    def force_and_friction(self, x):
+        """(force(x), get_local_friction(x)) с одним вычислением ячейки"""
+        if x < self.x_min or x > self.x_max:
+            return self.source.force_and_friction(x)
+        t = (x - self.x_min) * self._inv_h
+        i = int(t)
+        friction = self._friction[int(t + 0.5)]
+        if i >= self.resolution:
+            i = self.resolution - 1
+        return self._f[i] + self._df[i] * (t - i), friction
+
+    def get_local_friction_array(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        inside = (xs >= self.x_min) & (xs <= self.x_max)
+        # Как и в скалярном варианте - значение в ближайшем узле сетки
+        k = np.clip(np.rint((xs - self.x_min) * self._inv_h), 0, self.resolution).astype(int)
+        return self.source.get_local_friction_array(np.where(inside, self._xs[k], xs))
+
+    def next_friction_boundary(self, x0, x1):
+        """Границы зон исходного профиля (табличное трение отличается от них не более чем на h / 2)"""
+        return self.source.next_friction_boundary(x0, x1)
+
+
+# --- Генерация специализированного кода профиля ---
+def _literal(value):
+    """Запись числа в сгенерированном коде (repr float восстанавливает значение точно)"""
+    value = float(value)
+    if value == math.inf:
+        return '_INF'
+    if value == -math.inf:
+        return '(-_INF)'
+    return repr(value)
+
+
+def _gen_range_check(x_start, x_end):
+    """Условие «x вне [x_start, x_end]» или None, если отрезок - вся прямая"""
+    checks = []
+    if x_start != -math.inf:
+        checks.append(f"x < {_literal(x_start)}")
+    if x_end != math.inf:
+        checks.append(f"x > {_literal(x_end)}")
+    return ' or '.join(checks) or None
+
+
+def _gen_smoothstep(var, a, b, derivative=False):
+    """Строки, вычисляющие smoothstep(a, b, x) (или его производную) в переменную var"""
+    w = _literal(b - a)
+    if derivative:
+        return [f"if x <= {_literal(a)} or x >= {_literal(b)}:",
+                f"    {var} = 0.0",
+                "else:",
+                f"    t = (x - {_literal(a)}) / {w}",
+                f"    {var} = 6 * t * (1 - t) / {w}"]
+    return [f"if x <= {_literal(a)}:",
+            f"    {var} = 0.0",
+            f"elif x >= {_literal(b)}:",
+            f"    {var} = 1.0",
+            "else:",
+            f"    t = (x - {_literal(a)}) / {w}",
+            f"    {var} = t * t * (3 - 2 * t)"]
+
+
+def _generate_group_source(k, elements, numbers):
+    """
+    Функции _potential{k}(x) и _force{k}(x) для группы элементов (номера numbers в профиле).
+    Порядок элементов и семантика override совпадают с PiecewiseProfile.potential()/force().
+    """
+    potential = [f"def _potential{k}(x):", "    total = 0.0"]
+    force = [f"def _force{k}(x):", "    dU = 0.0"]
+    numeric = False
+
+    def indent(lines, n=1):
+        return ['    ' * n + line for line in lines]
+
+    for i in numbers:
+        e = elements[i]
+        value = e.source_lines(False) or [f"v = _element{i}.value(x)"]
+        deriv = (e.source_lines(True) or [f"v = _element{i}.derivative(x)"]) if e.analytic else None
+
+        comment = f"    # [{i}] {type(e).__name__}{' (override)' if e.override else ''}"
+        potential += [comment] + indent(value)
+        force.append(comment)
+        if e.override:
+            potential += ["    if v != 0:", "        return v"]
+            force += indent(value)
+            force.append("    if v != 0:")
+            if deriv is None:
+                force.append("        return _numeric_force(x)")
+            else:
+                force += indent(deriv, 2) + ["        return -v"]
+        else:
+            potential.append("    total += v")
+            if deriv is None:
+                numeric = True
+            elif not numeric:
+                force += indent(deriv) + ["    dU += v"]
+    potential.append("    return total")
+    force.append("    return _numeric_force(x)" if numeric else "    return -dU")
+    return potential + [''] + force + ['']
+
+
+# Диспетчер: бинарный поиск интервала и вызов функции его группы элементов.
+# Таблицы _*_point - функции в точках разбиения, _*_open[i] - на интервале левее _coords[i]
+# (последний - правее всех точек)
+_GENERATED_DISPATCH = """
+def potential(x):
+    i = _bisect(_coords, x)
+    if i and _coords[i - 1] == x:
+        return _potential_point[i - 1](x)
+    return _potential_open[i](x)
+
+def force(x):
+    i = _bisect(_coords, x)
+    if i and _coords[i - 1] == x:
+        return _force_point[i - 1](x)
+    return _force_open[i](x)
+
+def force_and_friction(x):
+    i = _bisect(_coords, x)
+    if i and _coords[i - 1] == x:
+        return _force_point[i - 1](x), _friction_point[i - 1]
+    return _force_open[i](x), _friction_open[i]
+"""
+
+
+class GeneratedProfile:
+    """
+    Профиль, скомпилированный в специализированный код Python (см. PiecewiseProfile.codegen()).
+    Прямая разбита точками носителей элементов (как в SupportIndex) и границами зон трения;
+    для каждого набора элементов, действующих на интервале, генерируется своя функция со встроенным
+    кодом элементов и параметрами-константами: без словарей, распаковки аргументов и значений
+    по умолчанию. Вычисление - бинарный поиск интервала и вызов его функции, поэтому стоимость,
+    как и у отбора по носителям, не растёт с числом элементов вне точки x.
+    Порядок override сохраняется, а force_and_friction(x) возвращает силу вместе с локальным
+    трением того же интервала за один поиск. Результаты совпадают с исходным профилем.
+    Функция группы компилируется при первом обращении к ней: codegen() большого профиля
+    не тратит время на компиляцию участков, где объект не бывает.
+    Пользовательские функции вызываются как есть (их сила - центральной разностью,
+    как в PiecewiseProfile.force()).
+    Как и CompiledProfile, это снимок: последующие add_function() исходного профиля на него не влияют.
+    Текст сгенерированного кода - в атрибуте code.
+    """
+    def __init__(self, profile, dx=1e-3):
+        self.source = PiecewiseProfile([e.copy() for e in profile.elements])
+        elements = self.source.elements
+        index = self.source.build_friction_index()
+        self.source._friction_index = index
+        support = SupportIndex(elements)
+        number = {id(e): i for i, e in enumerate(elements)}
+
+        coords = sorted(set(support._coords) | set(index._coords))
+        bounds = [-INF] + coords + [INF]
+        open_points = [_segment_point(bounds[k], bounds[k + 1]) for k in range(len(coords) + 1)]
+
+        groups = {}  # кортеж номеров элементов -> номер функции
+
+        def group_of(x):
+            numbers = tuple(number[id(e)] for e in support.lookup(x))
+            return groups.setdefault(numbers, len(groups))
+
+        point_groups = [group_of(c) for c in coords]
+        open_groups = [group_of(x) for x in open_points]
+        sources = ['\n'.join(_generate_group_source(k, elements, numbers)) for k, numbers in enumerate(groups)]
+        self.code = '\n'.join(sources) + _GENERATED_DISPATCH
+
+        # Места группы в таблицах: после компиляции её функции подставляются туда напрямую
+        point_places = [[] for _ in sources]
+        open_places = [[] for _ in sources]
+        for i, k in enumerate(point_groups):
+            point_places[k].append(i)
+        for i, k in enumerate(open_groups):
+            open_places[k].append(i)
+        tables = {kind: ([None] * len(point_groups), [None] * len(open_groups)) for kind in ('potential', 'force')}
+
+        namespace = {
+            '_INF': math.inf, '_sqrt': math.sqrt, '_sin': math.sin, '_cos': math.cos,
+            '_bisect': bisect.bisect_right, '_coords': tuple(coords),
+            '_potential_point': tables['potential'][0], '_potential_open': tables['potential'][1],
+            '_force_point': tables['force'][0], '_force_open': tables['force'][1],
+            '_friction_point': tuple(index.lookup(c) for c in coords),
+            '_friction_open': tuple(index.lookup(x) for x in open_points),
+        }
+        for i, e in enumerate(elements):
+            namespace[f'_element{i}'] = e
+
+        def place(k, functions):
+            for kind, (point_table, open_table) in tables.items():
+                for i in point_places[k]:
+                    point_table[i] = functions[kind]
+                for i in open_places[k]:
+                    open_table[i] = functions[kind]
+
+        def lazy(k):
+            def compile_group(kind, x):
+                exec(compile(sources[k], f'<generated profile, group {k}>', 'exec'), namespace)
+                place(k, {'potential': namespace[f'_potential{k}'], 'force': namespace[f'_force{k}']})
+                return namespace[f'_{kind}{k}'](x)
+            return {'potential': lambda x: compile_group('potential', x),
+                    'force': lambda x: compile_group('force', x)}
+
+        for k in range(len(sources)):
+            place(k, lazy(k))
+        exec(compile(_GENERATED_DISPATCH, '<generated profile>', 'exec'), namespace)
+
+        potential = namespace['potential']
+
+        def numeric_force(x):
+            return -((potential(x + dx) - potential(x - dx)) / (2 * dx))
+        namespace['_numeric_force'] = numeric_force
+
+        self.potential = potential
+        self.force = namespace['force']
+        self.force_and_friction = namespace['force_and_friction']
+        self.get_local_friction = index.lookup
+
+    def potential_array(self, xs):
+        return self.source.potential_array(xs)
+
+    def force_array(self, xs):
+        return self.source.force_array(xs)
+
+    def get_local_friction_array(self, xs):
+        return self.source.get_local_friction_array(xs)
+
+    def next_friction_boundary(self, x0, x1):
+        return self.source.next_friction_boundary(x0, x1)
+
+
+# --- Кусочно-полиномиальная компиляция профиля ---
+def _segment_point(lo, hi):
+    """Точка внутри открытого интервала (lo, hi), в том числе неограниченного"""
+    if lo == -INF and hi == INF:
+        return 0.0
+    if lo == -INF:
+        return hi - 1.0
+    if hi == INF:
+        return lo + 1.0
+    return lo + (hi - lo) / 2
+
+
+class PolynomialProfile:
+    """
+    Профиль, разбитый на непересекающиеся отрезки (см. PiecewiseProfile.compile_polynomial()).
+    На каждом открытом отрезке заранее выбрано, какие элементы действуют (override уже разрешён,
+    элементы вне отрезка отброшены по SupportIndex), и найдено трение по индексу зон.
+    Полиномиальные элементы (constant, linear, склоны и плоская часть trapezoid) хранятся как
+    коэффициенты своего куска относительно его собственного начала и вычисляются схемой Горнера;
+    сила - точная производная того же полинома. Слагаемые суммируются в порядке элементов профиля,
+    как в PiecewiseProfile.potential()/force(), поэтому constant, linear и плоская часть trapezoid
+    дают тот же результат бит в бит, а склоны trapezoid (smoothstep в полиномиальной записи) -
+    с точностью до округления. Значения в самих точках разбиения берутся из исходного профиля.
+
+    Неполиномиальные элементы (semicircle, sine_wave_sum, пользовательские), действующие на отрезке,
+    вычисляются на месте своей очереди - без таблиц и ошибки дискретизации. Если среди них есть
+    пользовательская функция, сила отрезка, как и в исходном профиле, - центральная разность.
+    Только отрезки, где активен неполиномиальный override-элемент, вычисляются по исходному профилю.
+    """
+    _POLY, _SOURCE = 0, 1
+
+    def __init__(self, profile):
+        self.source = PiecewiseProfile([e.copy() for e in profile.elements])
+        elements = self.source.elements
+        index = self.source.build_friction_index()
+        self.source._friction_index = index
+        support = SupportIndex(elements)
+
+        pieces = {}
+        coords = set(index._coords) | set(support._coords)
+        for e in elements:
+            element_pieces = pieces[id(e)] = e.polynomial_pieces()
+            for lo, hi, origin, coeffs in element_pieces or ():
+                coords.update((lo, hi))
+                if e.override and len(coeffs) == 2 and coeffs[1] != 0:
+                    # Нуль линейного override-элемента: в нём элемент неактивен
+                    coords.add(origin - coeffs[0] / coeffs[1])
+        coords = sorted(c for c in coords if math.isfinite(c))
+
+        self._coords = coords
+        self._points = [(self.source.potential(c), self.source.force(c), index.lookup(c)) for c in coords]
+        bounds = [-INF] + coords + [INF]
+        self._segments = [self._build_segment(bounds[k], bounds[k + 1], support, pieces, index)
+                          for k in range(len(coords) + 1)]
+        self.source_segments = sum(1 for s in self._segments if s[0] == self._SOURCE)
+
+    def _build_segment(self, lo, hi, support, pieces, index):
+        """
+        (_POLY, слагаемые, сила численно?, трение) или (_SOURCE, трение), если на отрезке активен
+        неполиномиальный override-элемент. Слагаемое - (origin, коэффициенты U, коэффициенты dU/dx,
+        None) для куска полинома или (None, None, None, элемент) для неполиномиального элемента.
+        """
+        x = _segment_point(lo, hi)
+        friction = index.lookup(x)
+        terms = []
+        numeric = False
+        for e in support.lookup(x):
+            element_pieces = pieces[id(e)]
+            term = None
+            if element_pieces is None:
+                term = (None, None, None, e)
+            else:
+                for p_lo, p_hi, p_origin, p_coeffs in element_pieces:
+                    if p_lo <= lo and hi <= p_hi:
+                        dcoeffs = [k * c for k, c in enumerate(p_coeffs)][1:] or [0.0]
+                        # Для схемы Горнера коэффициенты хранятся от старшей степени к младшей
+                        term = (p_origin, tuple(reversed(p_coeffs)), tuple(reversed(dcoeffs)), None)
+                        break
+            if e.override:
+                if e.value(x) == 0:
+                    continue
+                # Активный override определяет значение на всём отрезке
+                if term[3] is not None:
+                    return (self._SOURCE, friction)
+                return (self._POLY, (term,), False, friction)
+            if term is not None:
+                # Вне кусков (например, яма base_b=0 вне дна) элемент равен нулю и не нужен
+                terms.append(term)
+                numeric = numeric or (term[3] is not None and not e.analytic)
+        return (self._POLY, tuple(terms), numeric, friction)
+
+    def _evaluate(self, x, what):
+        """U (what=0) или F (what=1) в точке x"""
+        k = bisect.bisect_right(self._coords, x)
+        if k and self._coords[k - 1] == x:
+            return self._points[k - 1][what]
+        s = self._segments[k]
+        if s[0] != self._POLY:
+            return self.source.force(x) if what else self.source.potential(x)
+        if what:
+            if s[2]:
+                return self.source._numeric_force(x)
+            return -self._sum_terms(s[1], x, 2)
+        return self._sum_terms(s[1], x, 1)
+
+    @staticmethod
+    def _sum_terms(terms, x, which):
+        """Сумма U (which=1) или dU/dx (which=2) слагаемых отрезка в порядке элементов"""
+        total = 0.0
+        for term in terms:
+            origin = term[0]
+            if origin is None:
+                e = term[3]
+                total += e.derivative(x) if which == 2 else e.value(x)
+            else:
+                u = x - origin
+                v = 0.0
+                for c in term[which]:
+                    v = v * u + c
+                total += v
+        return total
+
+    def potential(self, x):
+        return self._evaluate(x, 0)
+
+    def force(self, x):
+        return self._evaluate(x, 1)
+
+    def get_local_friction(self, x):
+        k = bisect.bisect_right(self._coords, x)
+        if k and self._coords[k - 1] == x:
+            return self._points[k - 1][2]
+        return self._segments[k][-1]
+
+    def force_and_friction(self, x):
+        k = bisect.bisect_right(self._coords, x)
+        if k and self._coords[k - 1] == x:
+            point = self._points[k - 1]
+            return point[1], point[2]
+        s = self._segments[k]
+        if s[0] != self._POLY:
+            return self.source.force(x), s[1]
+        if s[2]:
+            return self.source._numeric_force(x), s[3]
+        return -self._sum_terms(s[1], x, 2), s[3]
+
+    def potential_array(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        return np.fromiter((self._evaluate(x, 0) for x in xs.ravel().tolist()), float, xs.size).reshape(xs.shape)
+
+    def force_array(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        return np.fromiter((self._evaluate(x, 1) for x in xs.ravel().tolist()), float, xs.size).reshape(xs.shape)
+
+    def get_local_friction_array(self, xs):
+        return self.source.get_local_friction_array(xs)
+
+    def next_friction_boundary(self, x0, x1):
+        return self.source.next_friction_boundary(x0, x1)
+
+def _first_root(q, v, d, h):
+    """Наименьший корень q*t² + v*t = d на (0, h] или None"""
+    if q == 0.0:
+        if v == 0.0:
+            return None
+        t = d / v
+        return t if 0.0 < t <= h else None
+    disc = v * v + 4.0 * q * d
+    if disc < 0.0:
+        return None
+    s = math.sqrt(disc)
+    roots = [r for r in ((-v - s) / (2.0 * q), (-v + s) / (2.0 * q)) if 0.0 < r <= h]
+    return min(roots) if roots else None
+
+
+class PhaseTimers:
+    """
+    Накопители времени и числа вызовов по фазам шага симуляции
+    (см. HapticSimulation.enable_instrumentation).
+    """
+    PHASES = ('step', 'profile_force', 'external_force', 'control_forces', 'friction', 'integration', 'clamping')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.time = dict.fromkeys(self.PHASES, 0.0)
+        self.calls = dict.fromkeys(self.PHASES, 0)
+
+    def snapshot(self):
+        """{фаза: {'calls', 'total_s', 'mean_us', 'share'}}; share - доля от полного времени шагов"""
+        step_time = self.time['step']
+        report = {}
+        for phase in self.PHASES:
+            total, calls = self.time[phase], self.calls[phase]
+            report[phase] = {
+                'calls': calls,
+                'total_s': total,
+                'mean_us': total / calls * 1e6 if calls else 0.0,
+                'share': total / step_time if step_time else 0.0,
+            }
+        return report
+
+
+class StepResult:
+    """
+    Разбивка сил одного шага. Создаётся один раз и передаётся в step(result) на каждом шаге,
+    поэтому потребителям (GUI, запись, анализ) не нужно пересчитывать силы.
+    F_static - сила трения покоя (если объект «прилип», stuck=True), F_kinetic - трения скольжения.
+    F_wall - сила упругого контакта со стенками (если задана wall_stiffness).
+    F_total - итоговая сила шага, как её считает step(): движущая сила с трением плюс управляющие силы
+    (в режиме Impedance - и сила импеданса), пересчитанная при ограничении смены знака скорости.
+    """
+    __slots__ = ('F_haptic', 'F_external', 'F_target', 'F_speed',
+                 'F_static', 'F_kinetic', 'F_wall', 'F_total', 'stuck')
+
+    def __init__(self):
+        self.F_haptic = 0.0
+        self.F_external = 0.0
+        self.F_target = 0.0
+        self.F_speed = 0.0
+        self.F_static = 0.0
+        self.F_kinetic = 0.0
+        self.F_wall = 0.0
+        self.F_total = 0.0
+        self.stuck = False
+
+    @property
+    def F_friction(self):
+        return self.F_static + self.F_kinetic
+
+    @property
+    def F_control(self):
+        return self.F_target + self.F_speed
+
+    def copy_to(self, other):
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        return other
 
 
 class HapticSimulation:
     """Главный симулятор — чистая физика, без GUI"""
+    # Интеграторы -> число вычислений сил профиля за шаг: полунеявный Эйлер (по умолчанию;
+    # скорость, затем положение), явный Эйлер, Velocity Verlet, классический Рунге-Кутта 4-го порядка
+    # и линейно-неявный Эйлер (пружины и демпферы - неявно, устойчив при жёстких пружинах)
+    INTEGRATORS = {'semi_implicit': 1, 'euler': 1, 'verlet': 2, 'rk4': 4, 'implicit': 1}
+    SPEED_CONTROL_GAIN = 5.0  # коэффициент усиления управления по скорости (сила на единицу ошибки скорости)
+
     def __init__(self, x_min=-100.0, x_max=100.0, mass=1.0, damping=0.1):
         self.x_min = x_min
         self.x_max = x_max
@@ -266,6 +1825,97 @@ class HapticSimulation:
         self.use_speed_control = False
         # ---------------------------------------------------------
 
+        # --- интегратор: одно из INTEGRATORS (проверяется при присваивании) ---
+        self.integrator = 'semi_implicit'
+
+        # --- разбиение шага по событиям: границы зон трения и остановка (смена знака скорости) ---
+        self.event_splitting = False
+        self.max_events_per_step = 8
+        self._last_acceleration = 0.0  # ускорение последнего интегрирования до ограничения смены знака
+
+        # --- стенки: None - жёсткое ограничение положения в [x_min, x_max],
+        # иначе упругий контакт (пружина с демпфером) при выходе за границы ---
+        self.wall_stiffness = None
+        self.wall_damping = 0.0
+
+        # --- слушатели шага: вызываются как listener(sim, result) после каждого step() ---
+        self.step_listeners = []
+        self._listener_result = StepResult()
+
+        self._timers = None  # PhaseTimers, если включена инструментация
+
+    # --- Встроенная инструментация горячего цикла ---
+    # Фаза -> методы, время которых в неё попадает. Фазы, кроме step, не вкладываются друг в друга:
+    # вызовы изнутри другой фазы (например, силы на стадиях интегратора) засчитываются объемлющей
+    _INSTRUMENTED_METHODS = {
+        'step': ('step',),
+        'profile_force': ('_calculate_profile_force',),
+        'external_force': ('_calculate_external_force',),
+        'control_forces': ('_calculate_target_force', '_calculate_speed_control_force'),
+        'friction': ('_calculate_local_friction', '_calculate_moving_force_with_friction'),
+        'integration': ('_integrate',),
+        'clamping': ('_calculate_wall_force', '_apply_velocity_threshold', '_apply_position_bounds'),
+    }
+
+    def enable_instrumentation(self):
+        """
+        Включает замер времени по фазам шага. Методы фаз оборачиваются таймерами
+        на уровне экземпляра, поэтому, пока инструментация выключена, шаг не платит за неё ничего.
+        Объединённый поиск силы профиля и трения на это время разделяется,
+        чтобы поиск зоны трения попадал в фазу friction.
+        Возвращает PhaseTimers с накопленными данными.
+        """
+        if self._timers is not None:
+            return self._timers
+        timers = self._timers = PhaseTimers()
+        clock = time.perf_counter
+        time_acc = timers.time
+        calls_acc = timers.calls
+        active = [False]  # идёт ли сейчас замер фазы, кроме step
+
+        def timed(phase, method):
+            def wrapper(*args, **kwargs):
+                t0 = clock()
+                value = method(*args, **kwargs)
+                time_acc[phase] += clock() - t0
+                calls_acc[phase] += 1
+                return value
+
+            def exclusive(*args, **kwargs):
+                if active[0]:
+                    return method(*args, **kwargs)
+                active[0] = True
+                try:
+                    return wrapper(*args, **kwargs)
+                finally:
+                    active[0] = False
+            return wrapper if phase == 'step' else exclusive
+
+        for phase, names in self._INSTRUMENTED_METHODS.items():
+            for name in names:
+                setattr(self, name, timed(phase, getattr(self, name)))
+        self._calculate_profile_force_and_friction = (
+            lambda: (self._calculate_profile_force(), self._calculate_local_friction()))
+        return timers
+
+    def disable_instrumentation(self):
+        """Снимает таймеры; накопленные данные остаются доступны через возвращённый PhaseTimers"""
+        if self._timers is None:
+            return
+        for names in self._INSTRUMENTED_METHODS.values():
+            for name in names:
+                self.__dict__.pop(name, None)
+        self.__dict__.pop('_calculate_profile_force_and_friction', None)
+        self._timers = None
+
+    def instrumentation_snapshot(self):
+        """Снимок накопленных таймеров по фазам или None, если инструментация выключена"""
+        return self._timers.snapshot() if self._timers is not None else None
+
+    def reset_instrumentation(self):
+        if self._timers is not None:
+            self._timers.reset()
+
     def set_profile(self, profile):
         #принимает объект PiecewiseProfile
         self.profile = profile
@@ -319,6 +1969,21 @@ class HapticSimulation:
         self.target_max_speed = max_speed
         self.target_zone_width = zone_width
 
+    def _calculate_profile_force(self):
+        """Сила профиля в текущей позиции"""
+        return self.profile.force(self.state.x)
+
+    def _calculate_profile_force_and_friction(self):
+        """
+        Сила профиля и локальное трение (static, kinetic) в текущей позиции одним вызовом
+        profile.force_and_friction() - у GeneratedProfile он объединён в один проход
+        """
+        return self.profile.force_and_friction(self.state.x)
+
+    def _calculate_local_friction(self):
+        """Локальное трение (static, kinetic) в текущей позиции"""
+        return self.profile.get_local_friction(self.state.x)
+
     def _calculate_external_force(self):
         """Вычисляет внешнюю силу от пользователя (мышь/тачпад)"""
         external = 0.0
@@ -373,7 +2038,7 @@ class HapticSimulation:
 
         # Преобразуем ошибку скорости в силу (PID-подобный контроллер, но только P)
         # Коэффициент можно настроить
-        speed_force = speed_error * 5.0  # Коэффициент усиления
+        speed_force = speed_error * self.SPEED_CONTROL_GAIN
 
         # Ограничиваем силу
         speed_force = max(-self.target_max_force, min(self.target_max_force, speed_force))
@@ -414,13 +2079,17 @@ class HapticSimulation:
 
 
     # --- НОВЫЙ МЕТОД: расчёт движущей силы с учётом локального трения ---
-    def _calculate_moving_force_with_friction(self, F_move):
+    def _calculate_moving_force_with_friction(self, F_move, result=None, local_friction=None):
         """
         Принимает движущую силу F_move (F_profile + F_external_user).
         Возвращает результирующую силу после применения локального трения.
+        Если передан result (StepResult), записывает в него силы трения покоя и скольжения.
+        local_friction - уже найденное локальное трение (static, kinetic) в текущей позиции.
         """
         # Получаем локальные параметры трения
-        local_static, local_kinetic = self.profile.get_local_friction(self.state.x)
+        if local_friction is None:
+            local_friction = self.profile.get_local_friction(self.state.x)
+        local_static, local_kinetic = local_friction
         f_static_to_use = local_static if local_static is not None else self.static_friction_force
         f_kinetic_to_use = local_kinetic if local_kinetic is not None else self.kinetic_friction_force
 
@@ -430,35 +2099,39 @@ class HapticSimulation:
             if abs(F_move) < f_static_to_use:
                 # Сила недостаточна для страгивания. Трение компенсирует F_move.
                 # Результирующая сила на движение = 0.
-                F_move_and_frict = 0.0
-            else:
-                # Сила достаточна для страгивания. Применяем кинетическое трение.
-                # Направление кинетического трения против *текущей* скорости (даже если она близка к 0).
-                # Если vx = 0, направление кинетического трения определяется направлением F_move.
-                if self.state.vx > 0:
+                if result is not None:
+                    result.F_static = -F_move
+                    result.F_kinetic = 0.0
+                    result.stuck = True
+                return 0.0
+            # Сила достаточна для страгивания. Применяем кинетическое трение.
+            # Направление кинетического трения против *текущей* скорости (даже если она близка к 0).
+            # Если vx = 0, направление кинетического трения определяется направлением F_move.
+            if self.state.vx > 0:
+                friction_force = -f_kinetic_to_use
+            elif self.state.vx < 0:
+                friction_force = f_kinetic_to_use
+            else: # vx == 0
+                # F_move вызывает движение. Если F_move > 0, кинетическое трение = -f_kinetic_to_use.
+                # Если F_move < 0, кинетическое трение = +f_kinetic_to_use.
+                if F_move > 0:
                     friction_force = -f_kinetic_to_use
-                elif self.state.vx < 0:
+                elif F_move < 0:
                     friction_force = f_kinetic_to_use
-                else: # vx == 0
-                    # Направление кинетического трения, когда vx=0, определяется направлением силы, вызывающей движение.
-                    # F_move вызывает движение. Если F_move > 0, кинетическое трение = -f_kinetic_to_use.
-                    # Если F_move < 0, кинетическое трение = +f_kinetic_to_use.
-                    if F_move > 0:
-                        friction_force = -f_kinetic_to_use
-                    elif F_move < 0:
-                        friction_force = f_kinetic_to_use
-                    else: # F_move == 0, но это не должно было сюда попасть (F_move >= f_static_to_use, f_static > 0)
-                         friction_force = 0.0 # На всякий случай
-                F_move_and_frict = F_move + friction_force
+                else: # F_move == 0, но это не должно было сюда попасть (F_move >= f_static_to_use, f_static > 0)
+                     friction_force = 0.0 # На всякий случай
         else:
             # Объект движется. Кинетическое трение против текущей скорости.
             if self.state.vx > 0:
                 friction_force = -f_kinetic_to_use
             else: # self.state.vx < 0 (так как else от abs(vx) < threshold)
                 friction_force = f_kinetic_to_use
-            F_move_and_frict = F_move + friction_force
         # ---------------------------------------------------------
-        return F_move_and_frict
+        if result is not None:
+            result.F_static = 0.0
+            result.F_kinetic = friction_force
+            result.stuck = False
+        return F_move + friction_force
     # ---------------------------------------------------------
 
 
@@ -466,6 +2139,178 @@ class HapticSimulation:
         """Вычисляет ускорение из суммарной силы"""
         return F_total / self.mass - self.damping * self.state.vx / self.mass
 
+    @property
+    def integrator(self):
+        return self._integrator
+
+    @integrator.setter
+    def integrator(self, name):
+        if name not in self.INTEGRATORS:
+            raise ValueError(f"Неизвестный интегратор: {name!r} (ожидается одно из {', '.join(self.INTEGRATORS)})")
+        self._integrator = name
+
+    def _integrate(self, a, F_move=0.0, F_move_and_frict=0.0, F_speed=0.0):
+        """
+        Обновляет скорость и положение с ускорением a выбранным интегратором (self.integrator).
+        Если за шаг скорость сменила бы знак, ускорение ограничивается так, чтобы объект
+        остановился. Возвращает ускорение остановки, если ограничение сработало, иначе None.
+        F_move и F_move_and_frict - движущая сила шага до и после трения: по ним
+        многостадийные интеграторы фиксируют трение на весь шаг.
+        F_speed - сила управления по скорости, уже вычисленная на шаге (нужна неявному Эйлеру).
+        """
+        integrator = self._integrator
+        if integrator == 'implicit':
+            a = self._implicit_acceleration(a, F_speed)
+        elif integrator != 'semi_implicit':
+            return self._integrate_multistage(a, F_move, F_move_and_frict)
+        self._last_acceleration = a
+
+        vx = self.state.vx
+        # Вычисляем новую скорость
+        new_vx = vx + a * self.dt
+
+        # Если новая скорость имеет противоположный знак, ограничиваем a
+        clamped = None
+        if vx != 0 and (new_vx * vx < 0):
+            # Требуемое ускорение, чтобы остановить за dt
+            required_a_to_stop = -vx / self.dt
+            # Ограничиваем a
+            if a * vx < 0:  # a тормозит
+                if a < required_a_to_stop and vx > 0:
+                    a = clamped = required_a_to_stop
+                elif a > required_a_to_stop and vx < 0:
+                    a = clamped = required_a_to_stop
+
+        self._update_state(a)
+        return clamped
+
+    def _implicit_acceleration(self, a, F_speed=0.0):
+        """
+        Линейно-неявный Эйлер: пружины и демпферы (k, c из _spring_damper_gains) берутся
+        в конце шага. Для v1 = vx + a1 * dt, x1 = x + v1 * dt и F(x1, v1) ≈ F - k * (x1 - x) - c * (v1 - vx):
+            a1 = (m * a - k * dt * vx) / (m + c * dt + k * dt²)
+        При k = c = 0 совпадает с полунеявным Эйлером; устойчив при любых k, c >= 0.
+        """
+        k, c = self._spring_damper_gains(F_speed)
+        if k == 0.0 and c == 0.0:
+            return a
+        dt = self.dt
+        m = self.impedance_mass if self.use_impedance_control else self.mass
+        return (m * a - k * dt * self.state.vx) / (m + c * dt + k * dt * dt)
+
+    def _spring_damper_gains(self, F_speed=0.0):
+        """
+        Жёсткость k = -dF/dx и демпфирование c = -dF/dvx линейных сил в текущем состоянии:
+        вязкое трение или импеданс, пружина перетаскивания, пружина к цели, управление по скорости
+        и упругий контакт со стенкой. Насыщенные (ограниченные по модулю) силы не учитываются.
+        F_speed - сила управления по скорости этого шага (не пересчитывается).
+        """
+        state = self.state
+        x, vx = state.x, state.vx
+        if self.use_impedance_control:
+            # Без цели x_desired следует за объектом, и пружина импеданса от x не зависит
+            k = self.impedance_stiffness if self.target_x is not None else 0.0
+            c = self.impedance_damping
+        else:
+            k, c = 0.0, self.damping
+
+        if state.dragging and self.cursor_x is not None:
+            raw_force = abs(self.drag_spring_k * (self.cursor_x - x))
+            if self.force_threshold <= raw_force <= self.f_max:
+                k += self.drag_spring_k
+
+        if self.use_target_control and self.target_x is not None:
+            raw_force = self.target_spring_k * (self.target_x - x) - self.target_damping * vx
+            if abs(raw_force) <= self.target_max_force:
+                k += self.target_spring_k
+                c += self.target_damping
+
+        if self.use_speed_control and self.target_speed_x is not None:
+            gain = self.SPEED_CONTROL_GAIN
+            if abs(F_speed) < self.target_max_force:
+                c += gain
+                if abs(self.target_speed_x - x) < self.target_zone_width:
+                    k += gain * self.target_max_speed / self.target_zone_width
+
+        if self.wall_stiffness is not None and not (self.x_min <= x <= self.x_max):
+            k += self.wall_stiffness
+            c += self.wall_damping
+        return k, c
+
+    def _integrate_multistage(self, a, F_move, F_move_and_frict):
+        """
+        Явный Эйлер, Velocity Verlet и RK4. Режим трения (покой/скольжение и сила скольжения)
+        определяется в начале шага и не меняется на промежуточных стадиях.
+        При смене знака скорости объект останавливается, как и в полунеявном Эйлере,
+        а положение сдвигается с постоянным торможением до остановки.
+        """
+        state = self.state
+        dt = self.dt
+        x, vx = state.x, state.vx
+        if F_move_and_frict == 0.0 and abs(vx) < self.vx_threshold:
+            friction = None  # удерживает трение покоя
+        else:
+            friction = F_move_and_frict - F_move
+
+        method = self._integrator
+        if method == 'euler':
+            new_x = x + vx * dt
+            new_vx = vx + a * dt
+        elif method == 'verlet':
+            new_x = x + vx * dt + 0.5 * a * dt * dt
+            # Силы зависят от скорости (демпфирование) - в конце шага берём её прогноз
+            a1 = self._stage_acceleration(new_x, vx + a * dt, friction)
+            new_vx = vx + 0.5 * (a + a1) * dt
+        elif method == 'rk4':
+            half = 0.5 * dt
+            v1 = vx + a * half
+            a2 = self._stage_acceleration(x + vx * half, v1, friction)
+            v2 = vx + a2 * half
+            a3 = self._stage_acceleration(x + v1 * half, v2, friction)
+            v3 = vx + a3 * dt
+            a4 = self._stage_acceleration(x + v2 * dt, v3, friction)
+            new_x = x + (vx + 2.0 * v1 + 2.0 * v2 + v3) * dt / 6.0
+            new_vx = vx + (a + 2.0 * a2 + 2.0 * a3 + a4) * dt / 6.0
+
+        self._last_acceleration = (new_vx - vx) / dt
+        clamped = None
+        if vx != 0 and new_vx * vx < 0:
+            # Остановка за шаг: постоянное торможение -vx / dt
+            new_vx = 0.0
+            new_x = x + (vx * dt if method == 'euler' else 0.5 * vx * dt)
+            clamped = -vx / dt
+
+        state.x = new_x
+        state.vx = new_vx
+        return clamped
+
+    def _stage_acceleration(self, x, vx, friction):
+        """
+        Ускорение в промежуточной точке (x, vx) многостадийного интегратора.
+        friction - сила трения скольжения, зафиксированная на шаг, или None,
+        если объект удерживается трением покоя (оно компенсирует движущую силу).
+        """
+        state = self.state
+        x0, vx0 = state.x, state.vx
+        state.x, state.vx = x, vx
+        try:
+            F_move = self._calculate_profile_force() + self._calculate_external_force()
+            F_total = 0.0 if friction is None else F_move + friction
+            if self.use_target_control:
+                F_total += self._calculate_target_force()
+            if self.use_speed_control:
+                F_total += self._calculate_speed_control_force()
+            if self.wall_stiffness is not None:
+                F_total += self._calculate_wall_force()
+            if self.use_impedance_control:
+                # Без цели x_desired следует за объектом (как в _impedance_step) - пружина не действует
+                x_desired = self.target_x if self.target_x is not None else x
+                F_total -= self.impedance_damping * vx + self.impedance_stiffness * (x - x_desired)
+                return F_total / self.impedance_mass
+            return self._calculate_acceleration(F_total)
+        finally:
+            state.x, state.vx = x0, vx0
+
     def _update_state(self, a):
         """Обновляет скорость и положение"""
         self.state.vx += a * self.dt
@@ -476,8 +2321,22 @@ class HapticSimulation:
         if abs(self.state.vx) < self.vx_threshold:
             self.state.vx = 0.0
 
+    def _calculate_wall_force(self):
+        """
+        Упругий контакт со стенкой: пружина wall_stiffness и демпфер wall_damping
+        при выходе за [x_min, x_max]. Стенка только отталкивает и не «притягивает» объект.
+        """
+        x = self.state.x
+        if x > self.x_max:
+            return min(0.0, -self.wall_stiffness * (x - self.x_max) - self.wall_damping * self.state.vx)
+        if x < self.x_min:
+            return max(0.0, self.wall_stiffness * (self.x_min - x) - self.wall_damping * self.state.vx)
+        return 0.0
+
     def _apply_position_bounds(self):
-        """Ограничивает положение в пределах x_min, x_max"""
+        """Ограничивает положение в пределах x_min, x_max (если стенки не упругие)"""
+        if self.wall_stiffness is not None:
+            return
         if self.state.x < self.x_min:
             self.state.x = self.x_min
             self.state.vx = 0.0
@@ -486,10 +2345,10 @@ class HapticSimulation:
             self.state.vx = 0.0
 
     # ---  Impedance Control ---
-    def _impedance_step(self):
+    def _impedance_step(self, result=None):
         x_desired = self.target_x if self.target_x is not None else self.state.x
         
-        F_haptic = self.profile.force(self.state.x)
+        F_haptic, local_friction = self._calculate_profile_force_and_friction()
 
         F_external_user = self._calculate_external_force()
 
@@ -502,7 +2361,7 @@ class HapticSimulation:
         F_control = F_target + F_speed
 
         # --- Применение (локального) трения к движущей силе ---
-        F_move_and_frict = self._calculate_moving_force_with_friction(F_move)
+        F_move_and_frict = self._calculate_moving_force_with_friction(F_move, result, local_friction)
 
         # Полная внешняя сила для Impedance Control
         F_total_applied = F_move_and_frict + F_control
@@ -512,86 +2371,151 @@ class HapticSimulation:
         F_impedance = - self.impedance_damping * self.state.vx - self.impedance_stiffness * (self.state.x - x_desired)
         F_total = F_total_applied + F_impedance
 
-        a = F_total / self.impedance_mass
+        # Упругие стенки
+        F_wall = self._calculate_wall_force() if self.wall_stiffness is not None else 0.0
+        F_total += F_wall
 
-        # проверка, не изменит ли ускорение направление скорости ---
-        # Вычисляем новую скорость
-        new_vx = self.state.vx + a * self.dt
+        a = F_total / self.impedance_mass
 
-        # Если новая скорость имеет противоположный знак, ограничиваем a
-        if self.state.vx != 0 and (new_vx * self.state.vx < 0):
-            # Требуемое ускорение, чтобы остановить за dt
-            required_a_to_stop = -self.state.vx / self.dt
-            # Ограничиваем a
-            if a * self.state.vx < 0:  # a тормозит
-                if a < required_a_to_stop and self.state.vx > 0:
-                    a = required_a_to_stop
-                elif a > required_a_to_stop and self.state.vx < 0:
-                    a = required_a_to_stop
-                # Обновляем F_total, чтобы оно соответствовало новому a
-                F_total = a * self.impedance_mass
-
-        # Обновляем состояние
-        self.state.vx += a * self.dt
-        self.state.x += self.state.vx * self.dt
+        # Интегрирование с ограничением смены знака скорости
+        a_stop = self._integrate(a, F_move, F_move_and_frict, F_speed)
+        if a_stop is not None:
+            # Обновляем F_total, чтобы оно соответствовало ускорению остановки
+            F_total = a_stop * self.impedance_mass
 
         # Применяем ограничения
         self._apply_velocity_threshold()
         self._apply_position_bounds()
 
+        if result is not None:
+            result.F_haptic = F_haptic
+            result.F_external = F_external_user
+            result.F_target = F_target
+            result.F_speed = F_speed
+            result.F_wall = F_wall
+            result.F_total = F_total
+
         # Возвращаем силы для отладки/отображения (F_haptic, F_external_user)
         return F_haptic, F_external_user
     # ---------------------------------
 
-    def step(self):
-        """Один шаг симуляции — всегда работает"""
-        if self.use_impedance_control:
-            return self._impedance_step()
-        else:
-            F_haptic = self.profile.force(self.state.x)
-
-            external = self._calculate_external_force()
-
-            # --- УСЛОВНОЕ ВКЛЮЧЕНИЕ УПРАВЛЕНИЯ ---
-            F_target = self._calculate_target_force() if self.use_target_control else 0.0
-            F_speed = self._calculate_speed_control_force() if self.use_speed_control else 0.0
-            # -------------------------------------
-
-            F_move = F_haptic + external
-            F_control = F_target + F_speed
-
-            # --- Применение (локального) трения к движущей силе ---
-            F_move_and_frict = self._calculate_moving_force_with_friction(F_move)
-            
-            # Суммируем движущую и управляющую силы
-            F_total = F_move_and_frict + F_control
-            
-            a = self._calculate_acceleration(F_total)
-
-            # --- НОВОЕ: проверка, не изменит ли ускорение направление скорости ---
-            # Вычисляем новую скорость
-            new_vx = self.state.vx + a * self.dt
-
-            # Если новая скорость имеет противоположный знак, ограничиваем a
-            if self.state.vx != 0 and (new_vx * self.state.vx < 0):
-                # Требуемое ускорение, чтобы остановить за dt
-                required_a_to_stop = -self.state.vx / self.dt
-                # Ограничиваем a
-                if a * self.state.vx < 0:  # a тормозит
-                    if a < required_a_to_stop and self.state.vx > 0:
-                        a = required_a_to_stop
-                    elif a > required_a_to_stop and self.state.vx < 0:
-                        a = required_a_to_stop
-                    # Обновляем F_total, чтобы оно соответствовало новому a
-                    F_total = a * self.mass  # Используем self.mass, т.к. вызываем _calculate_acceleration
-
-            # Обновляем состояние
-            self.state.vx += a * self.dt
-            self.state.x += self.state.vx * self.dt
-            # ---------------------------------------------------------
-
-            # Применяем ограничения
-            self._apply_velocity_threshold()
-            self._apply_position_bounds()
-
-            return F_haptic, external  # <-- Возвращаем только силу профиля и внешнюю
+    def step(self, result=None):
+        """
+        Один шаг симуляции — всегда работает.
+        Возвращает (F_haptic, F_external). Если передан result (StepResult), в него
+        записывается полная разбивка сил шага — пересчитывать их снаружи не нужно.
+        После шага вызываются слушатели step_listeners(sim, result) (например, запись траектории).
+        """
+        if self.step_listeners:
+            if result is None:
+                result = self._listener_result
+            forces = self._advance(result)
+            for listener in self.step_listeners:
+                listener(self, result)
+            return forces
+        return self._advance(result)
+
+    def _advance(self, result=None):
+        step = self._impedance_step if self.use_impedance_control else self._standard_step
+        if self.event_splitting:
+            return self._event_step(step, result)
+        return step(result)
+
+    def _event_step(self, step, result=None):
+        """
+        Шаг dt, разбитый на подшаги в моменты событий: пересечения границы зоны трения
+        и остановки (скорость проходит через 0). Сначала делается пробный подшаг до конца
+        оставшегося времени; если внутри него есть событие, состояние откатывается,
+        и подшаг повторяется ровно до события: положение ставится на границу зоны,
+        при остановке скорость обнуляется, а смещение берётся как при постоянном торможении.
+        Следующий подшаг заново решает «прилипание/скольжение» уже в новой зоне или из покоя.
+        Не более max_events_per_step событий за шаг; result - силы последнего подшага.
+        """
+        state = self.state
+        dt = self.dt
+        boundary_of = getattr(self.profile, 'next_friction_boundary', None)
+        remaining = dt
+        try:
+            for _ in range(self.max_events_per_step):
+                x0, vx0 = state.x, state.vx
+                self.dt = remaining
+                forces = step(result)
+                a = self._last_acceleration
+
+                # Остановка: скорость дошла бы до нуля внутри подшага
+                tau = remaining
+                stop = False
+                if vx0 != 0 and a * vx0 < 0 and -vx0 / a < remaining:
+                    tau = -vx0 / a
+                    stop = True
+                # Граница зоны трения между начальным и пробным положением
+                boundary = boundary_of(x0, state.x) if boundary_of is not None else None
+                if boundary is not None:
+                    # Положение на подшаге - парабола через x0 и пробное x1 с наклоном vx0
+                    q = ((state.x - x0) / remaining - vx0) / remaining
+                    t_cross = _first_root(q, vx0, boundary - x0, remaining)
+                    if t_cross is not None and t_cross < tau:
+                        tau = t_cross
+                        stop = False
+                    else:
+                        boundary = None
+                if tau >= remaining or tau <= remaining * 1e-12:
+                    return forces
+
+                state.x, state.vx = x0, vx0
+                self.dt = tau
+                forces = step(result)
+                if boundary is not None:
+                    state.x = boundary
+                elif stop:
+                    state.vx = 0.0
+                    state.x = x0 + 0.5 * vx0 * tau
+                    self._apply_position_bounds()
+                remaining -= tau
+            self.dt = remaining
+            return step(result)
+        finally:
+            self.dt = dt
+
+    def _standard_step(self, result=None):
+        """Шаг в стандартном режиме (без Impedance Control)"""
+        F_haptic, local_friction = self._calculate_profile_force_and_friction()
+
+        external = self._calculate_external_force()
+
+        # --- УСЛОВНОЕ ВКЛЮЧЕНИЕ УПРАВЛЕНИЯ ---
+        F_target = self._calculate_target_force() if self.use_target_control else 0.0
+        F_speed = self._calculate_speed_control_force() if self.use_speed_control else 0.0
+        # -------------------------------------
+
+        F_move = F_haptic + external
+        F_control = F_target + F_speed
+
+        # --- Применение (локального) трения к движущей силе ---
+        F_move_and_frict = self._calculate_moving_force_with_friction(F_move, result, local_friction)
+        
+        # Суммируем движущую и управляющую силы (и силу упругих стенок)
+        F_wall = self._calculate_wall_force() if self.wall_stiffness is not None else 0.0
+        F_total = F_move_and_frict + F_control + F_wall
+
+        a = self._calculate_acceleration(F_total)
+
+        # Интегрирование с ограничением смены знака скорости
+        a_stop = self._integrate(a, F_move, F_move_and_frict, F_speed)
+        if a_stop is not None:
+            # Обновляем F_total, чтобы оно соответствовало ускорению остановки
+            F_total = a_stop * self.mass  # Используем self.mass, т.к. вызываем _calculate_acceleration
+
+        # Применяем ограничения
+        self._apply_velocity_threshold()
+        self._apply_position_bounds()
+
+        if result is not None:
+            result.F_haptic = F_haptic
+            result.F_external = external
+            result.F_target = F_target
+            result.F_speed = F_speed
+            result.F_wall = F_wall
+            result.F_total = F_total
+
+        return F_haptic, external  # <-- Возвращаем только силу профиля и внешнюю
@@ -0,0 +1,158 @@
+# ensemble.py
+# -------------------------------------------------
+# АНСАМБЛЬ: N независимых HapticSimulation в массивах numpy.
+# Один вызов step() продвигает все экземпляры сразу.
+# -------------------------------------------------
+import numpy as np
+
+from core import HapticSimulation
+
+
+class HapticEnsemble:
+    """
+    Состояние и параметры N симуляций в массивах. Физика step() повторяет
+    HapticSimulation.step() и _impedance_step(): трение покоя, порог скорости,
+    ограничение смены знака скорости и границы положения.
+
+    Любой параметр из PARAMS можно задать числом (общим для всех) или массивом длины N.
+    Профиль общий для всего ансамбля.
+    Отсутствующие значения (cursor_x, target_x, target_speed_x = None в HapticSimulation) — NaN.
+    """
+    PARAMS = (
+        'x_min', 'x_max', 'mass', 'damping', 'dt', 'drag_spring_k',
+        'static_friction_force', 'kinetic_friction_force',
+        'force_threshold', 'f_max', 'vx_threshold',
+        'target_spring_k', 'target_damping', 'target_max_force',
+        'target_max_speed', 'target_zone_width',
+        'impedance_mass', 'impedance_damping', 'impedance_stiffness',
+    )
+    FLAGS = ('use_impedance_control', 'use_target_control', 'use_speed_control')
+
+    def __init__(self, n, profile=None, **params):
+        self.n = int(n)
+        defaults = HapticSimulation()
+        self.profile = profile if profile is not None else defaults.profile
+
+        for name in self.PARAMS:
+            self._set_array(name, params.pop(name, getattr(defaults, name)), float)
+        for name in self.FLAGS:
+            self._set_array(name, params.pop(name, getattr(defaults, name)), bool)
+
+        # --- состояние ---
+        self._set_array('x', params.pop('x', 0.0), float)
+        self._set_array('vx', params.pop('vx', 0.0), float)
+        self._set_array('dragging', params.pop('dragging', False), bool)
+        self._set_array('cursor_x', params.pop('cursor_x', np.nan), float)
+        self._set_array('target_x', params.pop('target_x', np.nan), float)
+        self._set_array('target_speed_x', params.pop('target_speed_x', np.nan), float)
+
+        if params:
+            raise TypeError(f"Неизвестные параметры ансамбля: {', '.join(sorted(params))}")
+
+    def _set_array(self, name, value, dtype):
+        arr = np.array(np.broadcast_to(np.asarray(value, dtype=dtype), (self.n,)))
+        setattr(self, name, arr)
+
+    @classmethod
+    def from_simulations(cls, sims):
+        """Собирает ансамбль из готовых HapticSimulation (профиль у всех должен быть один и тот же)"""
+        sims = list(sims)
+        if not sims:
+            raise ValueError("Нужна хотя бы одна симуляция")
+        profile = sims[0].profile
+        if any(sim.profile is not profile for sim in sims):
+            raise ValueError("Все симуляции ансамбля должны использовать один профиль")
+        if any(sim.integrator != 'semi_implicit' for sim in sims):
+            raise ValueError("Ансамбль поддерживает только интегратор semi_implicit")
+        if any(sim.event_splitting for sim in sims):
+            raise ValueError("Ансамбль не поддерживает разбиение шага по событиям")
+        if any(sim.wall_stiffness is not None for sim in sims):
+            raise ValueError("Ансамбль поддерживает только жёсткие границы (wall_stiffness=None)")
+
+        def none_to_nan(v):
+            return np.nan if v is None else v
+
+        params = {name: [getattr(sim, name) for sim in sims] for name in cls.PARAMS + cls.FLAGS}
+        params['x'] = [sim.state.x for sim in sims]
+        params['vx'] = [sim.state.vx for sim in sims]
+        params['dragging'] = [sim.state.dragging for sim in sims]
+        params['cursor_x'] = [none_to_nan(sim.cursor_x) for sim in sims]
+        params['target_x'] = [none_to_nan(sim.target_x) for sim in sims]
+        params['target_speed_x'] = [none_to_nan(sim.target_speed_x) for sim in sims]
+        return cls(len(sims), profile, **params)
+
+    # --- силы (векторные аналоги методов HapticSimulation) ---
+    def _calculate_external_force(self):
+        active = self.dragging & ~np.isnan(self.cursor_x)
+        raw_force = self.drag_spring_k * (self.cursor_x - self.x)
+        external = np.clip(raw_force, -self.f_max, self.f_max)
+        return np.where(active & (np.abs(raw_force) >= self.force_threshold), external, 0.0)
+
+    def _calculate_target_force(self):
+        active = self.use_target_control & ~np.isnan(self.target_x)
+        raw_force = self.target_spring_k * (self.target_x - self.x) - self.target_damping * self.vx
+        target_force = np.clip(raw_force, -self.target_max_force, self.target_max_force)
+        return np.where(active, target_force, 0.0)
+
+    def _calculate_speed_control_force(self):
+        active = self.use_speed_control & ~np.isnan(self.target_speed_x)
+        dist_to_target = self.target_speed_x - self.x
+        direction = np.where(dist_to_target > 0, 1.0, -1.0)
+        in_zone = np.abs(dist_to_target) < self.target_zone_width
+        desired_speed = np.where(in_zone,
+                                 np.abs(dist_to_target) / self.target_zone_width * self.target_max_speed,
+                                 self.target_max_speed) * direction
+        speed_force = np.clip((desired_speed - self.vx) * HapticSimulation.SPEED_CONTROL_GAIN,
+                              -self.target_max_force, self.target_max_force)
+        return np.where(active, speed_force, 0.0)
+
+    def _calculate_moving_force_with_friction(self, F_move):
+        local_static, local_kinetic = self.profile.get_local_friction_array(self.x)
+        f_static = np.where(np.isnan(local_static), self.static_friction_force, local_static)
+        f_kinetic = np.where(np.isnan(local_kinetic), self.kinetic_friction_force, local_kinetic)
+
+        stopped = np.abs(self.vx) < self.vx_threshold
+        # Направление кинетического трения: против скорости, а при vx == 0 — против F_move
+        direction = np.where(self.vx != 0, np.sign(self.vx), np.sign(F_move))
+        moving_friction = np.where(self.vx > 0, -f_kinetic, f_kinetic)
+        friction_force = np.where(stopped, -f_kinetic * direction, moving_friction)
+        stuck = stopped & (np.abs(F_move) < f_static)
+        return np.where(stuck, 0.0, F_move + friction_force)
+
+    def step(self):
+        """Один шаг всех симуляций. Возвращает массивы (F_haptic, F_external)"""
+        F_haptic = self.profile.force_array(self.x)
+        external = self._calculate_external_force()
+        F_control = self._calculate_target_force() + self._calculate_speed_control_force()
+
+        F_total = self._calculate_moving_force_with_friction(F_haptic + external) + F_control
+
+        # Стандартный режим и Impedance Control различаются только ускорением
+        a_standard = F_total / self.mass - self.damping * self.vx / self.mass
+        x_desired = np.where(np.isnan(self.target_x), self.x, self.target_x)
+        F_impedance = -self.impedance_damping * self.vx - self.impedance_stiffness * (self.x - x_desired)
+        a_impedance = (F_total + F_impedance) / self.impedance_mass
+        a = np.where(self.use_impedance_control, a_impedance, a_standard)
+
+        # Не даём ускорению сменить направление скорости за один шаг
+        vx = self.vx
+        new_vx = vx + a * self.dt
+        required_a_to_stop = -vx / self.dt
+        braking = (vx != 0) & (new_vx * vx < 0) & (a * vx < 0)
+        clamp = braking & (((a < required_a_to_stop) & (vx > 0)) | ((a > required_a_to_stop) & (vx < 0)))
+        a = np.where(clamp, required_a_to_stop, a)
+
+        self.vx = vx + a * self.dt
+        self.x = self.x + self.vx * self.dt
+
+        # Порог скорости и границы
+        self.vx[np.abs(self.vx) < self.vx_threshold] = 0.0
+        out_of_bounds = (self.x < self.x_min) | (self.x > self.x_max)
+        self.x = np.clip(self.x, self.x_min, self.x_max)
+        self.vx[out_of_bounds] = 0.0
+
+        return F_haptic, external
+
+    def run(self, n_steps):
+        for _ in range(n_steps):
+            self.step()
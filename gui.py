@@ -8,356 +8,263 @@ try:
 except ImportError:
     raise ImportError("Требуется tkinter для запуска GUI")
 
+import contextlib
+
+import numpy as np
+
+from core import StepResult
+from runner import PhysicsRunner, RealtimeStepper
+from telemetry import RingBuffer
+
 
 class ProfileGraph:
+    """
+    Элементы canvas (кривая профиля, объект, «резинка», текст) создаются один раз
+    и на каждом кадре только перемещаются через coords()/itemconfigure().
+    """
     def __init__(self, canvas, x_min_view, x_max_view, y_center=250, y_scale=80):
         self.canvas = canvas
         self.x_min_view = x_min_view
         self.x_max_view = x_max_view
         self.y_center = y_center
         self.y_scale = y_scale
-
-    def draw(self, sim: 'HapticSimulation', cursor_pos=None):
+        self._items = None
+        self._text = None
+        self._rubber_visible = False
+        # Кэш кривой профиля: сбрасывается при смене профиля (set_profile),
+        # его изменении (add_function меняет profile.version) или области просмотра
+        self._cached_profile = None
+        self._cache_key = None
+        self._u_range = (0.0, 1.0)
+
+    def set_view(self, x_min_view, x_max_view):
+        self.x_min_view = x_min_view
+        self.x_max_view = x_max_view
         c = self.canvas
-        c.delete("all")
+        if self._items is not None:
+            c.coords(self._items['center'], x_min_view, self.y_center, x_max_view, self.y_center)
 
-        # --- 1. Рисуем профиль U(x) ---
+    def _update_profile_curve(self, profile):
         steps = 300
-        dx = (self.x_max_view - self.x_min_view) / steps
-        xs = []
-        us = []
-        for i in range(steps + 1):
-            x = self.x_min_view + i * dx
-            u = sim.profile.potential(x)
-            xs.append(x)
-            us.append(u)
-
-        u_min, u_max = (min(us), max(us)) if us else (0, 1)
+        xs = np.linspace(self.x_min_view, self.x_max_view, steps + 1)
+        us = profile.potential_array(xs)
+
+        u_min, u_max = float(us.min()), float(us.max())
         if u_max == u_min:
             u_max = u_min + 1
+        self._u_range = (u_min, u_max)
 
         # Преобразуем U в пиксели по Y (инвертируем: большее U → выше на экране)
-        points = []
-        for i in range(len(xs)):
-            x = xs[i]
-            u = us[i]
-            # y = y_center - scale * (u_normalized)
-            y = self.y_center - self.y_scale * (u - u_min) / (u_max - u_min)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="lightgray", width=2)
+        ys = self.y_center - self.y_scale * (us - u_min) / (u_max - u_min)
+        self.canvas.coords(self._items['profile'], np.column_stack((xs, ys)).ravel().tolist())
 
-        # Горизонтальная линия для ориентира (не обязательно)
-        c.create_line(self.x_min_view, self.y_center, self.x_max_view, self.y_center,
-                    fill="gray", dash=(2, 2))
+    def _create_items(self):
+        c = self.canvas
+        self._items = {
+            'profile': c.create_line(0, 0, 0, 0, fill="lightgray", width=2),
+            # Горизонтальная линия для ориентира (не обязательно)
+            'center': c.create_line(self.x_min_view, self.y_center, self.x_max_view, self.y_center,
+                                    fill="gray", dash=(2, 2)),
+            'rubber': c.create_line(0, 0, 0, 0, fill="orange", width=2, dash=(4, 2), state="hidden"),
+            'cursor': c.create_oval(0, 0, 0, 0, outline="orange", width=1, state="hidden"),
+            'object': c.create_oval(0, 0, 0, 0, fill="red"),
+            'text': c.create_text(300, 20, text="", font=("Arial", 12)),
+        }
+
+    def draw(self, sim: 'HapticSimulation', cursor_pos=None, snapshot=None):
+        c = self.canvas
+        if self._items is None:
+            self._create_items()
+        items = self._items
+
+        # --- 1. Профиль U(x): пересчитываем только при смене профиля или области просмотра ---
+        profile = sim.profile
+        key = (getattr(profile, 'version', None), self.x_min_view, self.x_max_view, self.y_center, self.y_scale)
+        if profile is not self._cached_profile or key != self._cache_key:
+            self._update_profile_curve(profile)
+            self._cached_profile = profile
+            self._cache_key = key
+        u_min, u_max = self._u_range
 
         # --- 2. ОБЪЕКТ: рисуем НА ПОВЕРХНОСТИ U(x) ---
-        obj_x = sim.state.x
+        obj_x = snapshot.x if snapshot is not None else sim.state.x
         u_obj = sim.profile.potential(obj_x)
         obj_y = self.y_center - self.y_scale * (u_obj - u_min) / (u_max - u_min)
-
-        c.create_oval(obj_x - 6, obj_y - 6, obj_x + 6, obj_y + 6, fill="red")
+        c.coords(items['object'], obj_x - 6, obj_y - 6, obj_x + 6, obj_y + 6)
 
         # --- 3. "Резинка" к курсору ---
-        if cursor_pos is not None and sim.state.dragging:
+        dragging = snapshot.dragging if snapshot is not None else sim.state.dragging
+        show_rubber = cursor_pos is not None and dragging
+        if show_rubber:
             cx, cy = cursor_pos
-            c.create_line(obj_x, obj_y, cx, cy,
-                        fill="orange", width=2, dash=(4, 2))
-            c.create_oval(cx - 4, cy - 4, cx + 4, cy + 4, outline="orange", width=1)
-
-        # --- 4. Текст ---
-        F = sim.get_current_force()
+            c.coords(items['rubber'], obj_x, obj_y, cx, cy)
+            c.coords(items['cursor'], cx - 4, cy - 4, cx + 4, cy + 4)
+        if show_rubber != self._rubber_visible:
+            state = "normal" if show_rubber else "hidden"
+            c.itemconfigure(items['rubber'], state=state)
+            c.itemconfigure(items['cursor'], state=state)
+            self._rubber_visible = show_rubber
+
+        # --- 4. Текст (переписываем только при изменении) ---
+        F = snapshot.F_haptic if snapshot is not None else sim.get_current_force()
         mode = "Impedance" if sim.use_impedance_control else "Standard"
         control_mode = "Tgt" if sim.use_target_control else ("Spd" if sim.use_speed_control else "None")
-        c.create_text(300, 20, text=f"Mode: {mode} | Ctrl: {control_mode} | x={obj_x:.1f} | F={F:+.1f}",
-                    font=("Arial", 12))
-
-
-class ForceHistoryGraph:
-    def __init__(self, canvas, max_points=300):
+        text = f"Mode: {mode} | Ctrl: {control_mode} | x={obj_x:.1f} | F={F:+.1f}"
+        if text != self._text:
+            c.itemconfigure(items['text'], text=text)
+            self._text = text
+
+
+class HistoryGraph:
+    """
+    Базовый график истории значений (одного или нескольких каналов).
+    Линии, ось и подписи создаются один раз; draw() только обновляет координаты,
+    а текст подписи переписывается, лишь когда он изменился.
+
+    channels - кортеж (цвет линии, цвет подписи, формат подписи) на каждый канал.
+    Значения хранятся в кольцевом буфере RingBuffer на max_points отсчётов. Несколько графиков
+    могут делить один многоканальный буфер (buffer): график рисует каналы, начиная с first_channel,
+    а значения добавляет владелец буфера - одним append() на кадр для всех графиков.
+    """
+    channels = (("blue", "black", "F = {:+.1f}"),)
+    footer = None  # подпись в правом нижнем углу
+
+    def __init__(self, canvas, max_points=300, buffer=None, first_channel=0):
         self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
-
-    def add(self, F):
-        self.history.append(F)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
-
-    def draw(self):
+        if buffer is None:
+            buffer = RingBuffer(len(self.channels), max_points)
+        self.max_points = buffer.capacity
+        self.buffer = buffer
+        self._channel_numbers = range(first_channel, first_channel + len(self.channels))
+        self._lines = None
+        self._texts = None
+        self._text_values = [None] * len(self.channels)
+        self._size = None
+
+    @property
+    def histories(self):
+        return [self.buffer.channel(ch) for ch in self._channel_numbers]
+
+    def add(self, *values):
+        """Добавляет значения в собственный буфер графика (общий буфер пополняет его владелец)"""
+        self.buffer.append(*values)
+
+    def _create_items(self):
         c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
-
-        w = c.winfo_width()
-        h = c.winfo_height()
-        F_max_abs = max(max(abs(f) for f in self.history), 0.1)
-        y0 = h / 2
-
-        points = []
-        N = len(self.history)
-        for i, F in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="blue", width=2)
-
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"F = {self.history[-1]:+.1f}", anchor="w", font=("Arial", 10))
-
-
-class DualForceGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history_haptic = []
-        self.history_external = []
-
-    def add(self, F_haptic, F_external):
-        self.history_haptic.append(F_haptic)
-        self.history_external.append(F_external)
-        if len(self.history_haptic) > self.max_points:
-            self.history_haptic.pop(0)
-            self.history_external.pop(0)
+        self._lines = [c.create_line(0, 0, 0, 0, fill=color, width=2) for color, _, _ in self.channels]
+        self._axis = c.create_line(0, 0, 0, 0, fill="black", dash=(2, 2))
+        self._texts = [c.create_text(50, 20 + 20 * i, text="", anchor="w", fill=text_color, font=("Arial", 10))
+                       for i, (_, text_color, _) in enumerate(self.channels)]
+        self._footer = c.create_text(0, 0, text=self.footer, anchor="e", font=("Arial", 9)) if self.footer else None
 
     def draw(self):
         c = self.canvas
-        c.delete("all")
-        
-        if not self.history_haptic:
+        buffer = self.buffer
+        N = len(buffer)
+        if not N:
             return
+        if self._lines is None:
+            self._create_items()
 
         w = c.winfo_width()
         h = c.winfo_height()
-        
-        # Общий масштаб по Y: используем общий диапазон обеих сил
-        all_forces = self.history_haptic + self.history_external
-        F_max_abs = max(max(abs(f) for f in all_forces), 0.1)
         y0 = h / 2
+        if (w, h) != self._size:
+            self._size = (w, h)
+            c.coords(self._axis, 0, y0, w, y0)
+            if self._footer is not None:
+                c.coords(self._footer, w - 50, h - 10)
 
-        # Рисуем гаптическую силу (синяя)
-        points_haptic = []
-        N = len(self.history_haptic)
-        for i, F in enumerate(self.history_haptic):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points_haptic.extend([x, y])
-        if len(points_haptic) >= 4:
-            c.create_line(points_haptic, fill="blue", width=2)
-
-        # Рисуем внешнюю силу (красная)
-        points_external = []
-        for i, F in enumerate(self.history_external):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points_external.extend([x, y])
-        if len(points_external) >= 4:
-            c.create_line(points_external, fill="red", width=2)
-
-        # Линия F = 0
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-
-        # Легенда
-        c.create_text(50, 20, text=f"F_haptic = {self.history_haptic[-1]:+.1f}", anchor="w", fill="blue", font=("Arial", 10))
-        c.create_text(50, 40, text=f"F_mouse   = {self.history_external[-1]:+.1f}", anchor="w", fill="red", font=("Arial", 10))
-        c.create_text(w - 50, h - 10, text="время →", anchor="e", font=("Arial", 9))
-
-
-class VelocityGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
+        # Общий масштаб по Y для всех каналов графика (скользящий максимум буфера, O(1))
+        F_max_abs = max(max(buffer.abs_max(ch) for ch in self._channel_numbers), 0.1)
+        for ch, line in zip(self._channel_numbers, self._lines):
+            # Больше точек, чем пикселей по ширине, рисовать бессмысленно
+            idx, values = buffer.decimated(ch, max(int(w), 2))
+            if len(idx) < 2:
+                c.coords(line, 0, y0, 0, y0)
+                continue
+            xs = idx * (w / N)
+            ys = y0 - (values / F_max_abs) * (h / 2)
+            c.coords(line, np.column_stack((xs, ys)).ravel().tolist())
 
-    def add(self, vx):
-        self.history.append(vx)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
+        for i, (ch, (_, _, fmt)) in enumerate(zip(self._channel_numbers, self.channels)):
+            text = fmt.format(buffer.last(ch))
+            if text != self._text_values[i]:
+                c.itemconfigure(self._texts[i], text=text)
+                self._text_values[i] = text
 
-    def draw(self):
-        c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
 
-        w = c.winfo_width()
-        h = c.winfo_height()
-        vx_max_abs = max(max(abs(v) for v in self.history), 0.1)
-        y0 = h / 2
+class ForceHistoryGraph(HistoryGraph):
+    channels = (("blue", "black", "F = {:+.1f}"),)
 
-        points = []
-        N = len(self.history)
-        for i, vx in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (vx / vx_max_abs) * (h / 2)
-            points.extend([x, y])
+    @property
+    def history(self):
+        return self.histories[0]
 
-        if len(points) >= 4:
-            c.create_line(points, fill="green", width=2)
 
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"V = {self.history[-1]:+.2f}", anchor="w", font=("Arial", 10), fill="green")
+class DualForceGraph(HistoryGraph):
+    channels = (
+        ("blue", "blue", "F_haptic = {:+.1f}"),
+        ("red", "red", "F_mouse   = {:+.1f}"),
+    )
+    footer = "время →"
 
+    @property
+    def history_haptic(self):
+        return self.histories[0]
 
-# --- график для силы привода ---
-class TargetForceGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
+    @property
+    def history_external(self):
+        return self.histories[1]
 
-    def add(self, F_target):
-        self.history.append(F_target)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
 
-    def draw(self):
-        c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
+class VelocityGraph(ForceHistoryGraph):
+    channels = (("green", "green", "V = {:+.2f}"),)
 
-        w = c.winfo_width()
-        h = c.winfo_height()
-        F_max_abs = max(max(abs(f) for f in self.history), 0.1)
-        y0 = h / 2
 
-        points = []
-        N = len(self.history)
-        for i, F in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="purple", width=2)  # Цвет для силы привода
-
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"F_target = {self.history[-1]:+.1f}", anchor="w", fill="purple", font=("Arial", 10))
+# --- график для силы привода ---
+class TargetForceGraph(ForceHistoryGraph):
+    channels = (("purple", "purple", "F_target = {:+.1f}"),)
 # ------------------------------------
 
 
 # --- график для силы затухания ---
-class DecelerationForceGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
-
-    def add(self, F_decel):
-        self.history.append(F_decel)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
-
-    def draw(self):
-        c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
-
-        w = c.winfo_width()
-        h = c.winfo_height()
-        F_max_abs = max(max(abs(f) for f in self.history), 0.1)
-        y0 = h / 2
-
-        points = []
-        N = len(self.history)
-        for i, F in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="orange", width=2)  # Цвет для силы затухания
-
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"F_decel = {self.history[-1]:+.1f}", anchor="w", fill="orange", font=("Arial", 10))
+class DecelerationForceGraph(ForceHistoryGraph):
+    channels = (("orange", "orange", "F_decel = {:+.1f}"),)
 # ------------------------------------
 
 
 # --- НОВОЕ: график для статического трения ---
-class StaticFrictionForceGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
-
-    def add(self, F_static):
-        self.history.append(F_static)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
-
-    def draw(self):
-        c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
-
-        w = c.winfo_width()
-        h = c.winfo_height()
-        F_max_abs = max(max(abs(f) for f in self.history), 0.1)
-        y0 = h / 2
-
-        points = []
-        N = len(self.history)
-        for i, F in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="brown", width=2)  # Цвет для статического трения
-
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"F_static = {self.history[-1]:+.1f}", anchor="w", fill="brown", font=("Arial", 10))
+class StaticFrictionForceGraph(ForceHistoryGraph):
+    channels = (("brown", "brown", "F_static = {:+.1f}"),)
 # ------------------------------------
 
 
 # --- НОВОЕ: график для кинетического трения ---
-class KineticFrictionForceGraph:
-    def __init__(self, canvas, max_points=300):
-        self.canvas = canvas
-        self.max_points = max_points
-        self.history = []
-
-    def add(self, F_kinetic):
-        self.history.append(F_kinetic)
-        if len(self.history) > self.max_points:
-            self.history.pop(0)
-
-    def draw(self):
-        c = self.canvas
-        c.delete("all")
-        if not self.history:
-            return
-
-        w = c.winfo_width()
-        h = c.winfo_height()
-        F_max_abs = max(max(abs(f) for f in self.history), 0.1)
-        y0 = h / 2
-
-        points = []
-        N = len(self.history)
-        for i, F in enumerate(self.history):
-            x = i * (w / N)
-            y = y0 - (F / F_max_abs) * (h / 2)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            c.create_line(points, fill="blue", width=2)  # Цвет для кинетического трения
-
-        c.create_line(0, y0, w, y0, fill="black", dash=(2, 2))
-        c.create_text(50, 20, text=f"F_kinetic = {self.history[-1]:+.1f}", anchor="w", fill="blue", font=("Arial", 10))
+class KineticFrictionForceGraph(ForceHistoryGraph):
+    channels = (("blue", "blue", "F_kinetic = {:+.1f}"),)
 # ------------------------------------
 
 
 class HapticGUI:
-    def __init__(self, sim: 'HapticSimulation'):
+    """
+    physics_rate=None - физика шагает в цикле Tk, один шаг на кадр (как раньше).
+    physics_rate=None, realtime=True - на каждом кадре (frame_rate) делается столько шагов,
+    сколько нужно, чтобы модельное время шло вровень с реальным (RealtimeStepper).
+    physics_rate=N - физика работает в отдельном потоке (PhysicsRunner) с частотой N Гц,
+    а GUI перерисовывается с частотой frame_rate по снимкам состояния.
+    """
+    def __init__(self, sim: 'HapticSimulation', physics_rate=None, frame_rate=60, realtime=False, max_substeps=50):
         self.sim = sim
+        self.frame_rate = frame_rate
+        self.stepper = RealtimeStepper(sim, max_substeps) if realtime and physics_rate is None else None
+        self._step_result = StepResult()
+        if physics_rate is not None:
+            self.runner = PhysicsRunner(sim, physics_rate)
+            self.sim_lock = self.runner.lock
+        else:
+            self.runner = None
+            self.sim_lock = contextlib.nullcontext()
         self.root = tk.Tk()
         self.root.title("Гаптическая симуляция — с 'резинкой'")
 
@@ -397,6 +304,9 @@ class HapticGUI:
         self.cursor_pos = None  # (x, y) — только для отрисовки
 
         # --- ГРАФИКИ (левая часть) ---
+        # Один буфер телеметрии на все графики истории: F_haptic, F_external, V, F_target,
+        # F_decel, F_static, F_kinetic - по каналу на величину, одно добавление на кадр
+        self.telemetry = RingBuffer(channels=7, capacity=300)
         self.profile_canvas = tk.Canvas(self.graphs_frame, width=600, height=300, bg="white")
         self.profile_canvas.pack()
         self.profile_graph = ProfileGraph(
@@ -407,34 +317,35 @@ class HapticGUI:
 
         self.force_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f0f0f0")
         self.force_canvas.pack()
-        self.force_graph = DualForceGraph(self.force_canvas)
+        self.force_graph = DualForceGraph(self.force_canvas, buffer=self.telemetry, first_channel=0)
 
         self.velocity_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f5f5f5")
         self.velocity_canvas.pack()
-        self.velocity_graph = VelocityGraph(self.velocity_canvas)
+        self.velocity_graph = VelocityGraph(self.velocity_canvas, buffer=self.telemetry, first_channel=2)
 
         # --- график для силы привода ---
         self.target_force_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f9f9f9")
         self.target_force_canvas.pack()
-        self.target_force_graph = TargetForceGraph(self.target_force_canvas)
+        self.target_force_graph = TargetForceGraph(self.target_force_canvas, buffer=self.telemetry, first_channel=3)
         # ------------------------------------
 
         # --- график для силы затухания ---
         self.decel_force_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f9f9f9")
         self.decel_force_canvas.pack()
-        self.decel_force_graph = DecelerationForceGraph(self.decel_force_canvas)
+        self.decel_force_graph = DecelerationForceGraph(self.decel_force_canvas, buffer=self.telemetry, first_channel=4)
         # ------------------------------------
 
         # --- НОВОЕ: график для статического трения ---
         self.static_friction_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f9f9f9")
         self.static_friction_canvas.pack()
-        self.static_friction_graph = StaticFrictionForceGraph(self.static_friction_canvas)
+        self.static_friction_graph = StaticFrictionForceGraph(self.static_friction_canvas, buffer=self.telemetry, first_channel=5)
         # ------------------------------------
 
         # --- НОВОЕ: график для кинетического трения ---
         self.kinetic_friction_canvas = tk.Canvas(self.graphs_frame, width=600, height=150, bg="#f9f9f9")
         self.kinetic_friction_canvas.pack()
-        self.kinetic_friction_graph = KineticFrictionForceGraph(self.kinetic_friction_canvas)
+        self.kinetic_friction_graph = KineticFrictionForceGraph(self.kinetic_friction_canvas, buffer=self.telemetry,
+                                                               first_channel=6)
         # ------------------------------------
 
         # --- ЭЛЕМЕНТЫ УПРАВЛЕНИЯ (правая часть) ---
@@ -540,35 +451,41 @@ class HapticGUI:
         self.profile_canvas.bind("<Button-1>", self.on_mouse_down)
         self.profile_canvas.bind("<B1-Motion>", self.on_mouse_move)
         self.profile_canvas.bind("<ButtonRelease-1>", self.on_mouse_up)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.animate()
 
     def toggle_mode(self):
-        self.sim.toggle_impedance_control()
+        with self.sim_lock:
+            self.sim.toggle_impedance_control()
         mode = "Impedance" if self.sim.use_impedance_control else "Standard"
         print(f"Режим изменён на: {mode}")
 
     def toggle_target_control(self):
-        self.sim.toggle_target_control()
+        with self.sim_lock:
+            self.sim.toggle_target_control()
         mode = "ON" if self.sim.use_target_control else "OFF"
         print(f"Target Control изменён на: {mode}")
 
     def toggle_speed_control(self):
-        self.sim.toggle_speed_control()
+        with self.sim_lock:
+            self.sim.toggle_speed_control()
         mode = "ON" if self.sim.use_speed_control else "OFF"
         print(f"Speed Control изменён на: {mode}")
 
     def set_target_position(self):
         try:
             target_x = float(self.target_entry.get())
-            self.sim.set_target_position(target_x)
+            with self.sim_lock:
+                self.sim.set_target_position(target_x)
         except ValueError:
             print("Некорректное значение для целевой позиции")
 
     def set_damping(self):
         try:
             damping = float(self.damping_entry.get())
-            self.sim.target_damping = damping
+            with self.sim_lock:
+                self.sim.target_damping = damping
         except ValueError:
             print("Некорректное значение для демпфирования")
 
@@ -577,7 +494,8 @@ class HapticGUI:
             x = float(self.target_speed_entry.get())
             max_speed = float(self.max_speed_entry.get())
             zone_width = float(self.zone_width_entry.get())
-            self.sim.set_target_position_speed_control(x, max_speed, zone_width)
+            with self.sim_lock:
+                self.sim.set_target_position_speed_control(x, max_speed, zone_width)
         except ValueError:
             print("Некорректное значение для скоростного управления")
 
@@ -586,7 +504,8 @@ class HapticGUI:
         try:
             static_force = float(self.static_friction_entry.get())
             kinetic_force = float(self.kinetic_friction_entry.get())
-            self.sim.set_friction_forces(static_force, kinetic_force)
+            with self.sim_lock:
+                self.sim.set_friction_forces(static_force, kinetic_force)
         except ValueError:
             print("Некорректное значение для трения")
     # ------------------------------------
@@ -595,93 +514,79 @@ class HapticGUI:
     def set_damping_std(self):
         try:
             damping = float(self.damping_std_entry.get())
-            self.sim.damping = damping
+            with self.sim_lock:
+                self.sim.damping = damping
         except ValueError:
             print("Некорректное значение для damping (std)")
 
     def set_damping_imp(self):
         try:
             damping = float(self.damping_imp_entry.get())
-            self.sim.impedance_damping = damping
+            with self.sim_lock:
+                self.sim.impedance_damping = damping
         except ValueError:
             print("Некорректное значение для damping (imp)")
     # ------------------------------------
 
     def on_mouse_down(self, event):
-        if abs(event.x - self.sim.state.x) <= 10:
-            self.sim.state.dragging = True
-            self.cursor_pos = (event.x, event.y)
-            self.sim.cursor_x = float(event.x)
+        with self.sim_lock:
+            if abs(event.x - self.sim.state.x) <= 10:
+                self.sim.state.dragging = True
+                self.cursor_pos = (event.x, event.y)
+                self.sim.cursor_x = float(event.x)
 
     def on_mouse_move(self, event):
-        if self.sim.state.dragging:
-            self.cursor_pos = (event.x, event.y)
-            self.sim.cursor_x = float(event.x)  # ✅ правильно: cursor_x
+        with self.sim_lock:
+            if self.sim.state.dragging:
+                self.cursor_pos = (event.x, event.y)
+                self.sim.cursor_x = float(event.x)  # ✅ правильно: cursor_x
 
     def on_mouse_up(self, event):
-        self.sim.state.dragging = False
-        self.cursor_pos = None
-        self.sim.cursor_x = None  # ✅ правильно: cursor_x
+        with self.sim_lock:
+            self.sim.state.dragging = False
+            self.cursor_pos = None
+            self.sim.cursor_x = None  # ✅ правильно: cursor_x
 
     def animate(self):
-        F_haptic, F_ext = self.sim.step()
-        # --- получаем и добавляем силу привода ---
-        F_target = self.sim._calculate_target_force() if self.sim.use_target_control else 0.0
-        F_speed = self.sim._calculate_speed_control_force() if self.sim.use_speed_control else 0.0
-        self.target_force_graph.add(F_target + F_speed)
-        # -----------------------------------------------
-
-        # --- ИЗМЕНЕНО: сила затухания теперь это сила трения, зависящая от скорости ---
-        friction_force = self.sim._calculate_friction_force()
-        self.decel_force_graph.add(friction_force)
-        # -------------------------------------------------
-
-        # --- НОВОЕ: вычисляем и добавляем статическое и кинетическое трение ---
-        # Т.к. теперь в core логика трения уточнена, мы можем определить, какое трение "действует" в текущий момент.
-        # Это не всегда F_static и F_kinetic отдельно. В `_calculate_friction_force` возвращается результирующая.
-        # Для графиков трения будем отслеживать, движется ли объект.
-        if abs(self.sim.state.vx) < self.sim.vx_threshold:
-            # Объект "стоит". Статическое трение "поглощает" движущую силу.
-            # В `_calculate_friction_force` возвращается 0, но для графиков мы можем отобразить потенциальную силу.
-            # Т.к. в `_calculate_friction_force` мы не знаем F_move, то отображаем 0 для статического, если объект стоит.
-            # Но мы можем отслеживать, если сила профиля + внешняя < static_friction, то считаем, что действует статическое.
-            F_move = F_haptic + F_ext
-            if abs(F_move) < self.sim.static_friction_force:
-                F_static_display = -F_move  # Противодействует F_move
-                F_kinetic_display = 0.0
-            else:
-                # Если F_move > static_friction, то объект "пытается" или уже движется.
-                # В `_calculate_friction_force` будет кинетическое.
-                # Но для графика мы можем отобразить кинетическое как +/- kinetic_friction_force.
-                if self.sim.state.vx > 0:
-                    F_kinetic_display = -self.sim.kinetic_friction_force
-                elif self.sim.state.vx < 0:
-                    F_kinetic_display = self.sim.kinetic_friction_force
-                else: # vx == 0, но F_move > static
-                    # Это переходное состояние. Пусть будет 0, если vx == 0.
-                    F_kinetic_display = 0.0
-                F_static_display = 0.0
-        else: # Объект движется
-            if self.sim.state.vx > 0:
-                F_kinetic_display = -self.sim.kinetic_friction_force
-            else: # vx < 0
-                F_kinetic_display = self.sim.kinetic_friction_force
-            F_static_display = 0.0
-
-        self.static_friction_graph.add(F_static_display)
-        self.kinetic_friction_graph.add(F_kinetic_display)
-        # -------------------------------------------------
-
-        self.velocity_graph.add(self.sim.state.vx)
-        self.force_graph.add(F_haptic, F_ext)
-        self.profile_graph.draw(self.sim, self.cursor_pos)
+        # Разбивку сил заполняет сам шаг симуляции — ничего не пересчитываем
+        forces = self._step_result
+        snapshot = None
+        if self.runner is not None:
+            # Физика работает в своём потоке — берём только снимок
+            snapshot = self.runner.snapshot(forces)
+            vx = snapshot.vx
+            delay = int(1000 / self.frame_rate)
+        elif self.stepper is not None:
+            self.stepper.advance()
+            self.stepper.result.copy_to(forces)
+            vx = self.sim.state.vx
+            delay = int(1000 / self.frame_rate)
+        else:
+            self.sim.step(forces)
+            vx = self.sim.state.vx
+            delay = int(self.sim.dt * 1000)
+
+        # Все графики истории читают общий буфер: сила привода, суммарная сила трения на шаге,
+        # статическое и кинетическое трение (с учётом локальных зон трения профиля)
+        self.telemetry.append(forces.F_haptic, forces.F_external, vx, forces.F_control,
+                              forces.F_friction, forces.F_static, forces.F_kinetic)
+        self.profile_graph.draw(self.sim, self.cursor_pos, snapshot)
         self.force_graph.draw()
         self.velocity_graph.draw()
         self.target_force_graph.draw()
         self.decel_force_graph.draw()
         self.static_friction_graph.draw()  # <-- НОВОЕ: отрисовка
         self.kinetic_friction_graph.draw()  # <-- НОВОЕ: отрисовка
-        self.root.after(int(self.sim.dt * 1000), self.animate)
+        self.root.after(delay, self.animate)
+
+    def on_close(self):
+        if self.runner is not None:
+            self.runner.stop()
+        self.root.destroy()
 
     def run(self):
+        if self.runner is not None:
+            self.runner.start()
+        if self.stepper is not None:
+            self.stepper.reset()
         self.root.mainloop()
\ No newline at end of file
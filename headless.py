@@ -0,0 +1,91 @@
+# headless.py
+# -------------------------------------------------
+# ПАКЕТНЫЙ ЗАПУСК БЕЗ GUI: simulate() прогоняет HapticSimulation заданное число шагов
+# по заранее заданным траекториям и возвращает массивы numpy.
+# -------------------------------------------------
+import math
+
+import numpy as np
+
+from core import StepResult
+
+# Каналы результата simulate(): состояние после шага и разбивка сил шага (StepResult)
+CHANNELS = ('x', 'vx', 'F_haptic', 'F_external', 'F_target', 'F_speed',
+            'F_static', 'F_kinetic', 'F_wall', 'F_total')
+
+
+def _schedule(values, n_steps, name):
+    """Траектория как список float длины n_steps (NaN означает None) или None, если не задана"""
+    if values is None:
+        return None
+    try:
+        values = np.broadcast_to(np.asarray(values, dtype=float), (n_steps,))
+    except ValueError:
+        raise ValueError(f"{name}: ожидается число или массив длины {n_steps}") from None
+    return values.tolist()
+
+
+def simulate(sim, n_steps, cursor_x=None, dragging=None, target_x=None, target_speed_x=None):
+    """
+    Делает n_steps шагов sim.step() без GUI.
+
+    cursor_x, target_x, target_speed_x - необязательные траектории длины n_steps (или одно число);
+    NaN соответствует None. Значение i-го элемента выставляется перед i-м шагом.
+    dragging - траектория флага перетаскивания; если не задана, а cursor_x задан,
+    объект «захвачен» там, где cursor_x не NaN.
+
+    Возвращает dict массивов длины n_steps: 't' (время после шага), каналы CHANNELS и 'stuck'.
+    Массивы выделяются заранее; на шаге не создаётся промежуточных объектов (StepResult один на прогон).
+    """
+    n_steps = int(n_steps)
+    cursor = _schedule(cursor_x, n_steps, 'cursor_x')
+    targets = _schedule(target_x, n_steps, 'target_x')
+    speed_targets = _schedule(target_speed_x, n_steps, 'target_speed_x')
+    if dragging is not None:
+        drag = np.broadcast_to(np.asarray(dragging, dtype=bool), (n_steps,)).tolist()
+    elif cursor is not None:
+        drag = [not math.isnan(c) for c in cursor]
+    else:
+        drag = None
+
+    out = {name: np.empty(n_steps) for name in CHANNELS}
+    out['stuck'] = np.empty(n_steps, dtype=bool)
+    x_out, vx_out = out['x'], out['vx']
+    F_haptic, F_external = out['F_haptic'], out['F_external']
+    F_target, F_speed = out['F_target'], out['F_speed']
+    F_static, F_kinetic = out['F_static'], out['F_kinetic']
+    F_wall = out['F_wall']
+    F_total, stuck = out['F_total'], out['stuck']
+
+    state = sim.state
+    step = sim.step
+    r = StepResult()
+    for i in range(n_steps):
+        if cursor is not None:
+            c = cursor[i]
+            sim.cursor_x = None if c != c else c
+        if drag is not None:
+            state.dragging = drag[i]
+        if targets is not None:
+            c = targets[i]
+            sim.target_x = None if c != c else c
+        if speed_targets is not None:
+            c = speed_targets[i]
+            sim.target_speed_x = None if c != c else c
+
+        step(r)
+
+        x_out[i] = state.x
+        vx_out[i] = state.vx
+        F_haptic[i] = r.F_haptic
+        F_external[i] = r.F_external
+        F_target[i] = r.F_target
+        F_speed[i] = r.F_speed
+        F_static[i] = r.F_static
+        F_kinetic[i] = r.F_kinetic
+        F_wall[i] = r.F_wall
+        F_total[i] = r.F_total
+        stuck[i] = r.stuck
+
+    out['t'] = np.arange(1, n_steps + 1) * sim.dt
+    return out
@@ -1,26 +1,11 @@
 #main.py
 
 from core import HapticSimulation, PiecewiseProfile, constant, linear, trapezoid, semicircle, sine_wave_sum
-from gui import HapticGUI
 import math
 
 
-# -------------------------------------------------
-# MAIN
-# -------------------------------------------------
-if __name__ == "__main__":
-    # Создаём чистую модель
-    sim = HapticSimulation(
-        x_min=50.0,
-        x_max=550.0,
-        mass=5.0,
-        damping=2.0
-    )
-
-    # Установим постоянную силу (например, сопротивление движению)
-    sim.set_kinetic_friction_force(5)
-    sim.set_static_friction_force(7)
-
+def make_profile():
+    """Эталонный профиль демо (используется также бенчмарками)"""
     #Создаем профиль 
     profile = PiecewiseProfile()
     # Пример: добавим трапецию и синусоиду
@@ -38,10 +23,36 @@ if __name__ == "__main__":
     #    {'amplitude': 5.0, 'frequency': 0.2, 'phase': 0},
     #    {'amplitude': 2.0, 'frequency': 0.5, 'phase': math.pi / 4}
     #])
+    return profile
+
+
+def make_simulation():
+    """Симуляция демо с эталонными параметрами"""
+    # Создаём чистую модель
+    sim = HapticSimulation(
+        x_min=50.0,
+        x_max=550.0,
+        mass=5.0,
+        damping=2.0
+    )
+
+    # Установим постоянную силу (например, сопротивление движению)
+    sim.set_kinetic_friction_force(5)
+    sim.set_static_friction_force(7)
+
+    sim.set_profile(make_profile())
+    return sim
+
+
+# -------------------------------------------------
+# MAIN
+# -------------------------------------------------
+if __name__ == "__main__":
+    from gui import HapticGUI
+
+    sim = make_simulation()
 
-    # Применяем профиль
-    sim.set_profile(profile)
     sim.toggle_impedance_control() 
-    # Запускаем GUI
-    app = HapticGUI(sim)
+    # Запускаем GUI: физика в отдельном потоке с частотой 1 кГц
+    app = HapticGUI(sim, physics_rate=1000)
     app.run()
\ No newline at end of file
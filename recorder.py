@@ -0,0 +1,190 @@
+# recorder.py
+# -------------------------------------------------
+# ЗАПИСЬ ТРАЕКТОРИЙ: компактный бинарный формат с записями фиксированного размера,
+# чтение через memory-map (без загрузки в память) и повторный прогон записи.
+# -------------------------------------------------
+import json
+import struct
+
+import numpy as np
+
+from headless import simulate
+
+MAGIC = b'HAPTREC1'
+HEADER_ALIGN = 64
+
+# Одна запись = один шаг. Состояние - после шага, силы - шага, входы (курсор, цели) - перед шагом.
+RECORD_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('x', '<f8'),
+    ('vx', '<f8'),
+    ('F_haptic', '<f8'),
+    ('F_external', '<f8'),
+    ('F_total', '<f8'),
+    ('cursor_x', '<f8'),       # NaN = None
+    ('target_x', '<f8'),       # NaN = None
+    ('target_speed_x', '<f8'), # NaN = None
+    ('flags', 'u1'),
+])
+
+# Биты поля flags
+FLAG_DRAGGING = 1
+FLAG_IMPEDANCE = 2
+FLAG_TARGET = 4
+FLAG_SPEED = 8
+FLAG_STUCK = 16
+MODE_FLAGS = FLAG_IMPEDANCE | FLAG_TARGET | FLAG_SPEED
+
+NAN = float('nan')
+
+
+class TrajectoryRecorder:
+    """
+    Пишет каждый шаг HapticSimulation в файл. Записи копятся в предвыделенном
+    блоке из chunk_size записей и сбрасываются на диск целым блоком,
+    поэтому в цикле управления нет системных вызовов на каждом шаге.
+
+        with TrajectoryRecorder("session.hrec").attach(sim):
+            ...  # sim.step() как обычно
+    """
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.chunk_size = int(chunk_size)
+        self._chunk = np.zeros(self.chunk_size, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._file = None
+        self._sim = None
+        self._step = 0
+        self.records_written = 0
+
+    def attach(self, sim):
+        if self._sim is not None:
+            raise RuntimeError("Рекордер уже подключён к симуляции")
+        header = json.dumps({
+            'dtype': RECORD_DTYPE.descr,
+            'dt': sim.dt,
+            'x0': sim.state.x,
+            'vx0': sim.state.vx,
+        }).encode()
+        size = len(MAGIC) + 4 + len(header)
+        padding = -size % HEADER_ALIGN
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header) + padding) + header + b' ' * padding)
+        self._sim = sim
+        self._step = 0
+        sim.step_listeners.append(self)
+        return self
+
+    def __call__(self, sim, result):
+        flags = ((FLAG_DRAGGING if sim.state.dragging else 0) |
+                 (FLAG_IMPEDANCE if sim.use_impedance_control else 0) |
+                 (FLAG_TARGET if sim.use_target_control else 0) |
+                 (FLAG_SPEED if sim.use_speed_control else 0) |
+                 (FLAG_STUCK if result.stuck else 0))
+        self._step += 1
+        cursor_x, target_x, target_speed_x = sim.cursor_x, sim.target_x, sim.target_speed_x
+        self._chunk[self._n] = (
+            self._step * sim.dt, sim.state.x, sim.state.vx,
+            result.F_haptic, result.F_external, result.F_total,
+            NAN if cursor_x is None else cursor_x,
+            NAN if target_x is None else target_x,
+            NAN if target_speed_x is None else target_speed_x,
+            flags,
+        )
+        self._n += 1
+        if self._n == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._n and self._file is not None:
+            self._file.write(self._chunk[:self._n].tobytes())
+            self.records_written += self._n
+            self._n = 0
+
+    def close(self):
+        if self._sim is not None:
+            self._sim.step_listeners.remove(self)
+            self._sim = None
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TrajectoryReader:
+    """
+    Читает файл TrajectoryRecorder через np.memmap: срезы и поля - это представления файла
+    без копирования, поэтому многогигабайтные сессии не загружаются в память целиком.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path}: это не файл траектории")
+            (header_len,) = struct.unpack('<I', f.read(4))
+            self.header = json.loads(f.read(header_len))
+            offset = f.tell()
+            f.seek(0, 2)
+            size = f.tell()
+        self.path = path
+        self.dtype = np.dtype([tuple(field) for field in self.header['dtype']])
+        self.dt = self.header['dt']
+        count = (size - offset) // self.dtype.itemsize  # недописанная запись в конце отбрасывается
+        if count:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, key):
+        return self.records[key]
+
+    def initial_state(self, start=0):
+        """Состояние (x, vx) перед записью с номером start"""
+        if start == 0:
+            return self.header['x0'], self.header['vx0']
+        rec = self.records[start - 1]
+        return float(rec['x']), float(rec['vx'])
+
+
+def replay(reader, sim, start=0, stop=None, chunk_size=1 << 20):
+    """
+    Повторяет запись через sim.step() без GUI: шаг dt, курсор, захват, цели и режимы управления
+    берутся из записи, начальное состояние - из записи перед start.
+    Работает блоками по chunk_size шагов (и отдельно на каждом участке с неизменными режимами),
+    выдавая (номер первой записи блока, результат headless.simulate()).
+    """
+    stop = len(reader) if stop is None else min(stop, len(reader))
+    sim.dt = reader.dt
+    sim.state.x, sim.state.vx = reader.initial_state(start)
+
+    i = start
+    while i < stop:
+        end = min(i + chunk_size, stop)
+        block = reader.records[i:end]
+        flags = np.asarray(block['flags'])
+        # Участок с неизменными режимами управления
+        mode = flags & MODE_FLAGS
+        changes = np.flatnonzero(mode != mode[0])
+        if changes.size:
+            end = i + int(changes[0])
+            block = block[:end - i]
+            flags = flags[:end - i]
+
+        mode = int(flags[0])
+        sim.use_impedance_control = bool(mode & FLAG_IMPEDANCE)
+        sim.use_target_control = bool(mode & FLAG_TARGET)
+        sim.use_speed_control = bool(mode & FLAG_SPEED)
+        yield i, simulate(sim, end - i,
+                          cursor_x=block['cursor_x'],
+                          dragging=(flags & FLAG_DRAGGING) != 0,
+                          target_x=block['target_x'],
+                          target_speed_x=block['target_speed_x'])
+        i = end
@@ -0,0 +1,157 @@
+# runner.py
+# -------------------------------------------------
+# ЗАПУСК ФИЗИКИ В РЕАЛЬНОМ ВРЕМЕНИ:
+# RealtimeStepper - догоняет реальное время подшагами внутри цикла Tk,
+# PhysicsRunner - шагает HapticSimulation в отдельном потоке с фиксированной частотой.
+# -------------------------------------------------
+import threading
+import time
+
+from core import StepResult
+
+
+class RealtimeStepper:
+    """
+    Синхронизация модельного времени с реальным без отдельного потока.
+    advance() вызывается на каждом кадре: он измеряет прошедшее реальное время и делает
+    столько шагов sim.step(), сколько нужно, чтобы догнать его (но не больше max_substeps за вызов).
+    То, что не удалось догнать, отбрасывается и накапливается в dropped_time (секунды).
+    """
+    def __init__(self, sim, max_substeps=50, clock=time.perf_counter):
+        self.sim = sim
+        self.max_substeps = max_substeps
+        self.clock = clock
+        self.dropped_time = 0.0
+        self.steps = 0
+        self.last_forces = (0.0, 0.0)
+        self.result = StepResult()  # разбивка сил последнего шага
+        self.reset()
+
+    def reset(self):
+        """Начинает отсчёт заново (например, после паузы), не считая паузу отставанием"""
+        self._last_time = self.clock()
+        self._debt = 0.0
+
+    def advance(self):
+        """Догоняет реальное время. Возвращает число сделанных шагов"""
+        now = self.clock()
+        self._debt += now - self._last_time
+        self._last_time = now
+
+        dt = self.sim.dt
+        n = int(self._debt / dt)
+        if n > self.max_substeps:
+            dropped = (n - self.max_substeps) * dt
+            self.dropped_time += dropped
+            self._debt -= dropped
+            n = self.max_substeps
+        self._debt -= n * dt
+
+        step = self.sim.step
+        result = self.result
+        for _ in range(n):
+            self.last_forces = step(result)
+        self.steps += n
+        return n
+
+
+class PhysicsSnapshot:
+    """Согласованный снимок состояния симуляции для отрисовки; forces - копия StepResult последнего шага"""
+    __slots__ = ('x', 'vx', 'dragging', 'forces', 'time', 'steps', 'missed_deadlines')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, values[name])
+
+    @property
+    def F_haptic(self):
+        return self.forces.F_haptic
+
+    @property
+    def F_external(self):
+        return self.forces.F_external
+
+
+class PhysicsRunner:
+    """
+    Запускает sim.step() в отдельном потоке с частотой rate_hz.
+    Расписание строится по монотонным часам от дедлайнов (а не «sleep(dt) после шага»),
+    поэтому время работы шага не накапливается в дрейф частоты.
+    Шаг симуляции sim.dt приводится к периоду 1 / rate_hz, чтобы модельное время шло вровень с реальным.
+
+    Все изменения sim из других потоков нужно делать под `with runner.lock:`.
+    Если поток отстал больше чем на max_lag секунд, пропущенные дедлайны отбрасываются
+    (считаются в missed_deadlines), а не нагоняются пачкой шагов.
+    """
+    def __init__(self, sim, rate_hz=1000.0, max_lag=0.05):
+        if rate_hz <= 0:
+            raise ValueError("rate_hz должна быть положительной")
+        self.sim = sim
+        self.rate_hz = float(rate_hz)
+        self.period = 1.0 / self.rate_hz
+        self.max_lag = max_lag
+        self.sim.dt = self.period
+
+        self.lock = threading.Lock()
+        self.steps = 0
+        self.missed_deadlines = 0
+        self._result = StepResult()
+        self._thread = None
+        self._running = threading.Event()
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self):
+        if self.running:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._loop, name="PhysicsRunner", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        sim = self.sim
+        lock = self.lock
+        result = self._result
+        clock = time.perf_counter
+        deadline = clock()
+        while self._running.is_set():
+            with lock:
+                sim.step(result)
+                self.steps += 1
+
+            deadline += self.period
+            delay = deadline - clock()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > self.max_lag:
+                # Сильно отстали (например, ОС не давала процессор) — начинаем расписание заново
+                self.missed_deadlines += int(-delay / self.period)
+                deadline = clock()
+
+    def snapshot(self, forces=None):
+        """
+        Снимок состояния, снятый под блокировкой (не блокирует поток дольше одного шага).
+        forces - необязательный StepResult, в который копируется разбивка сил (без новых объектов).
+        """
+        sim = self.sim
+        if forces is None:
+            forces = StepResult()
+        with self.lock:
+            self._result.copy_to(forces)
+            return PhysicsSnapshot(
+                x=sim.state.x,
+                vx=sim.state.vx,
+                dragging=sim.state.dragging,
+                forces=forces,
+                time=self.steps * self.period,
+                steps=self.steps,
+                missed_deadlines=self.missed_deadlines,
+            )
@@ -0,0 +1,294 @@
+# sweep.py
+# -------------------------------------------------
+# ПЕРЕБОР ПАРАМЕТРОВ: набор конфигураций HapticSimulation прогоняется без GUI
+# в пуле процессов блоками (chunk), по каждой считаются сводные метрики
+# (время установления, перерегулирование, пиковая сила, залипания).
+# Каждый готовый блок сразу пишется в свой .npz - прерванный перебор продолжается с места остановки.
+#
+#   python sweep.py --out sweep_dir mass=1,2,5 damping=0.1,0.5 target_spring_k=1,4 \
+#                   use_target_control=1 target_x=400 x0=100
+# -------------------------------------------------
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+from core import HapticSimulation
+from headless import simulate
+
+# Сводные метрики одного прогона
+METRICS = ('settling_time', 'overshoot', 'peak_force', 'peak_haptic_force', 'stick_events', 'final_x')
+
+MANIFEST = 'sweep.json'
+RESULTS = 'results.npz'
+
+
+def grid(**axes):
+    """
+    Все сочетания значений по осям: grid(mass=[1, 2], damping=[0.1, 0.5]) -> 4 точки.
+    Скаляр вместо списка - ось из одного значения.
+    """
+    names = list(axes)
+    values = [list(v) if isinstance(v, (list, tuple, np.ndarray)) else [v] for v in axes.values()]
+    return [dict(zip(names, combo)) for combo in itertools.product(*values)]
+
+
+def _plain(value):
+    """Скаляры numpy -> числа Python (для json и pickle без numpy-типов)"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _default_simulation():
+    from main import make_simulation
+    return make_simulation()
+
+
+def configure(sim, point, profiles=None):
+    """
+    Применяет точку перебора к симуляции: атрибуты HapticSimulation (mass, damping, drag_spring_k,
+    static_friction_force, target_spring_k, use_target_control, target_x, cursor_x, integrator, ...),
+    'profile' - имя профиля в profiles, 'x0'/'vx0' - начальное состояние.
+    Заданный cursor_x означает, что пользователь держит объект весь прогон.
+    """
+    for name, value in point.items():
+        if name == 'profile':
+            if not profiles or value not in profiles:
+                raise KeyError(f"Профиль {value!r} не передан в profiles")
+            sim.set_profile(profiles[value])
+        elif name == 'x0':
+            sim.state.x = float(value)
+        elif name == 'vx0':
+            sim.state.vx = float(value)
+        elif name.startswith('_') or not hasattr(sim, name) or callable(getattr(sim, name)):
+            raise TypeError(f"Неизвестный параметр перебора: {name}")
+        else:
+            setattr(sim, name, value)
+    sim.state.dragging = sim.cursor_x is not None
+    return sim
+
+
+def setpoint(sim):
+    """Куда объект должен прийти: цель привода, цель управления по скорости или курсор (None - некуда)"""
+    if sim.use_target_control and sim.target_x is not None:
+        return sim.target_x
+    if sim.use_speed_control and sim.target_speed_x is not None:
+        return sim.target_speed_x
+    return sim.cursor_x
+
+
+def summarize(out, x0, goal, tolerance):
+    """
+    Метрики прогона по результату headless.simulate():
+      settling_time - время, с которого |x - goal| <= tolerance до конца прогона (NaN - не установился),
+      overshoot - наибольший выход за goal в сторону движения (0 - без перерегулирования),
+      peak_force / peak_haptic_force - наибольшие |F_total| и |F_haptic|,
+      stick_events - сколько раз движущийся объект залипал (переходы в stuck),
+      final_x - положение в конце.
+    Без цели (goal=None) settling_time и overshoot - NaN.
+    """
+    x = out['x']
+    stuck = out['stuck']
+    metrics = {
+        'peak_force': float(np.abs(out['F_total']).max()),
+        'peak_haptic_force': float(np.abs(out['F_haptic']).max()),
+        'stick_events': int(np.count_nonzero(stuck[1:] & ~stuck[:-1])),
+        'final_x': float(x[-1]),
+        'settling_time': float('nan'),
+        'overshoot': float('nan'),
+    }
+    if goal is not None:
+        outside = np.flatnonzero(np.abs(x - goal) > tolerance)
+        if outside.size == 0:
+            metrics['settling_time'] = 0.0
+        elif outside[-1] < len(x) - 1:
+            metrics['settling_time'] = float(out['t'][outside[-1] + 1])
+        direction = 1.0 if goal >= x0 else -1.0
+        metrics['overshoot'] = max(0.0, float(((x - goal) * direction).max()))
+    return metrics
+
+
+# --- Рабочий процесс: профили и фабрика симуляции передаются один раз при старте ---
+_worker = {}
+
+
+def _init_worker(profiles, make_simulation, n_steps, tolerance):
+    _worker.update(profiles=profiles, make_simulation=make_simulation, n_steps=n_steps, tolerance=tolerance)
+
+
+def _run_chunk(chunk_id, indices, points):
+    """Прогоняет блок точек; возвращает (chunk_id, столбцы метрик)"""
+    columns = {name: np.empty(len(points)) for name in METRICS}
+    columns['stick_events'] = np.empty(len(points), dtype=np.int64)
+    make_simulation = _worker['make_simulation'] or _default_simulation
+    for row, point in enumerate(points):
+        sim = configure(make_simulation(), point, _worker['profiles'])
+        x0 = sim.state.x
+        out = simulate(sim, _worker['n_steps'])
+        for name, value in summarize(out, x0, setpoint(sim), _worker['tolerance']).items():
+            columns[name][row] = value
+    columns['index'] = np.asarray(indices, dtype=np.int64)
+    return chunk_id, columns
+
+
+def _chunk_path(out_dir, chunk_id):
+    return os.path.join(out_dir, f'chunk_{chunk_id:05d}.npz')
+
+
+def _save_npz(path, columns):
+    """Запись через временный файл и os.replace: оборванная запись не выглядит готовым блоком"""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp, path)
+
+
+def _parameter_column(values):
+    """Столбец параметра: строки (профиль, интегратор) - массив str, остальное - float (NaN - не задан)"""
+    if all(v is None or isinstance(v, str) for v in values):
+        return np.array(['' if v is None else v for v in values])
+    return np.array([np.nan if v is None else float(v) for v in values])
+
+
+def run_sweep(points, out_dir, profiles=None, make_simulation=None, duration=5.0, dt=None,
+              chunk_size=16, workers=None, tolerance=1.0, progress=None):
+    """
+    Прогоняет точки перебора (список dict, например из grid()) в пуле из workers процессов
+    (None - по числу ядер, 0 - в текущем процессе) блоками по chunk_size точек.
+
+    make_simulation - функция уровня модуля, создающая базовую симуляцию (по умолчанию main.make_simulation);
+    profiles - dict имя -> PiecewiseProfile для ключа 'profile' точек. И то и другое передаётся
+    в процессы через pickle, поэтому пользовательские функции профиля тоже должны быть уровня модуля.
+    Длительность duration (с модели) переводится в шаги по dt (None - dt базовой симуляции).
+
+    В out_dir пишутся sweep.json (описание перебора), chunk_NNNNN.npz по мере готовности блоков
+    и в конце results.npz: столбцы параметров, 'index' и метрики METRICS. Повторный вызов с тем же
+    перебором пропускает готовые блоки. progress(done, total) вызывается после каждого блока.
+    Возвращает столбцы results.npz (dict массивов).
+    """
+    points = [{name: _plain(value) for name, value in point.items()} for point in points]
+    if dt is not None:
+        for point in points:
+            point.setdefault('dt', dt)
+    base = (make_simulation or _default_simulation)()
+    sim_dt = {point.get('dt', base.dt) for point in points}
+    if len(sim_dt) > 1:
+        raise ValueError("Шаг dt должен быть общим для всех точек перебора")
+    n_steps = int(round(duration / (sim_dt.pop() if sim_dt else base.dt)))
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        'points': points,
+        'chunk_size': int(chunk_size),
+        'n_steps': n_steps,
+        'tolerance': tolerance,
+        'profiles': sorted(profiles or ()),
+    }
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) != json.loads(json.dumps(manifest)):
+                raise ValueError(f"{out_dir}: в каталоге уже есть другой перебор")
+    else:
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+    chunks = [list(range(i, min(i + chunk_size, len(points)))) for i in range(0, len(points), chunk_size)]
+    pending = [c for c in range(len(chunks)) if not os.path.exists(_chunk_path(out_dir, c))]
+    done = len(chunks) - len(pending)
+    initargs = (profiles, make_simulation, n_steps, tolerance)
+
+    def finish(chunk_id, columns):
+        nonlocal done
+        _save_npz(_chunk_path(out_dir, chunk_id), columns)
+        done += 1
+        if progress is not None:
+            progress(done, len(chunks))
+
+    if workers == 0:
+        _init_worker(*initargs)
+        for c in pending:
+            finish(*_run_chunk(c, chunks[c], [points[i] for i in chunks[c]]))
+    elif pending:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=initargs) as pool:
+            futures = [pool.submit(_run_chunk, c, chunks[c], [points[i] for i in chunks[c]]) for c in pending]
+            for future in concurrent.futures.as_completed(futures):
+                finish(*future.result())
+
+    results = load_chunks(out_dir, len(chunks))
+    for name in sorted({key for point in points for key in point}):
+        results[name] = _parameter_column([point.get(name) for point in points])
+    _save_npz(os.path.join(out_dir, RESULTS), results)
+    return results
+
+
+def load_chunks(out_dir, n_chunks):
+    """Склеивает chunk_NNNNN.npz в столбцы, упорядоченные по 'index'"""
+    parts = []
+    for c in range(n_chunks):
+        with np.load(_chunk_path(out_dir, c)) as data:
+            parts.append({name: data[name] for name in data.files})
+    if not parts:
+        return {name: np.empty(0) for name in ('index',) + METRICS}
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.argsort(columns['index'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+
+def load_results(out_dir):
+    """Столбцы results.npz готового перебора"""
+    with np.load(os.path.join(out_dir, RESULTS)) as data:
+        return {name: data[name] for name in data.files}
+
+
+def _parse_axis(text):
+    """'mass=1,2,5' -> ('mass', [1.0, 2.0, 5.0]); нечисловые значения остаются строками"""
+    name, sep, values = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"ожидается имя=значение[,значение...]: {text!r}")
+
+    def parse(value):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return name, [parse(v) for v in values.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Перебор параметров HapticSimulation в пуле процессов")
+    parser.add_argument('axes', nargs='+', type=_parse_axis, metavar='имя=v1,v2,...',
+                        help="оси сетки: атрибуты HapticSimulation, x0, vx0")
+    parser.add_argument('--out', required=True, help="каталог результатов (повторный запуск продолжает перебор)")
+    parser.add_argument('--duration', type=float, default=5.0, help="длительность прогона, с модели")
+    parser.add_argument('--dt', type=float, help="шаг симуляции (по умолчанию - из main.make_simulation)")
+    parser.add_argument('--chunk-size', type=int, default=16, help="точек в одном задании пула")
+    parser.add_argument('--workers', type=int, help="число процессов (по умолчанию - по числу ядер)")
+    parser.add_argument('--tolerance', type=float, default=1.0, help="допуск установления |x - цель|")
+    args = parser.parse_args(argv)
+
+    # Флаги (use_target_control=1, event_splitting=0, ...) - bool, а не float
+    defaults = HapticSimulation()
+    axes = {name: [bool(v) for v in values] if isinstance(getattr(defaults, name, None), bool) else values
+            for name, values in args.axes}
+    points = grid(**axes)
+
+    def progress(done, total):
+        print(f"\rблоков: {done}/{total}", end='', file=sys.stderr, flush=True)
+
+    results = run_sweep(points, args.out, duration=args.duration, dt=args.dt, chunk_size=args.chunk_size,
+                        workers=args.workers, tolerance=args.tolerance, progress=progress)
+    print(file=sys.stderr)
+    for name in METRICS:
+        values = results[name]
+        print(f"{name:<18} min={np.nanmin(values):10.4g} max={np.nanmax(values):10.4g}"
+              if np.isfinite(values).any() else f"{name:<18} -")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+# telemetry.py
+# -------------------------------------------------
+# ХРАНИЛИЩЕ ТЕЛЕМЕТРИИ: кольцевой буфер на несколько каналов
+# с O(1) добавлением и скользящими min/max для автомасштаба графиков.
+# -------------------------------------------------
+from collections import deque
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Предвыделенный кольцевой буфер: channels каналов по capacity значений.
+    append() работает за O(1) и не сдвигает данные (в отличие от list.pop(0)).
+    Минимум и максимум по окну поддерживаются монотонными очередями
+    (амортизированно O(1) на добавление, O(1) на запрос).
+    Для прореживания (decimated) отсчёты группируются в корзины по bucket_size, и минимум
+    с максимумом каждой корзины обновляются при добавлении: кадр отрисовки обходит
+    не больше ~DECIMATION_BUCKETS корзин, а не всё окно.
+    """
+    DECIMATION_BUCKETS = 1024  # число корзин на окно при bucket_size по умолчанию
+
+    def __init__(self, channels=1, capacity=300, bucket_size=None):
+        if capacity < 1:
+            raise ValueError("capacity должна быть >= 1")
+        self.channels = channels
+        self.capacity = capacity
+        self._data = np.zeros((channels, capacity))
+        self._count = 0  # всего добавлено значений (не только хранимых)
+        # Для каждого канала: очереди (номер отсчёта, значение) — убывающая для max, возрастающая для min
+        self._max_queues = [deque() for _ in range(channels)]
+        self._min_queues = [deque() for _ in range(channels)]
+        # Корзина b содержит отсчёты [b * bucket_size, (b + 1) * bucket_size) и хранится в ячейке
+        # b % len; для каждого канала - [min, номер отсчёта min, max, номер отсчёта max] по ячейкам
+        if bucket_size is None:
+            bucket_size = max(1, capacity // self.DECIMATION_BUCKETS)
+        self.bucket_size = bucket_size
+        slots = capacity // bucket_size + 2
+        self._buckets = [[[0.0] * slots, [0] * slots, [0.0] * slots, [0] * slots] for _ in range(channels)]
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def clear(self):
+        self._count = 0
+        for q in self._max_queues + self._min_queues:
+            q.clear()
+
+    def append(self, *values):
+        t = self._count
+        pos = t % self.capacity
+        oldest = t - self.capacity  # этот отсчёт выпадает из окна
+        data = self._data
+        size = self.bucket_size
+        slot = (t // size) % len(self._buckets[0][0])
+        new_bucket = t % size == 0
+        for ch, value in enumerate(values):
+            data[ch, pos] = value
+
+            lo, i_lo, hi, i_hi = self._buckets[ch]
+            if new_bucket or value < lo[slot]:
+                lo[slot] = value
+                i_lo[slot] = t
+            if new_bucket or value > hi[slot]:
+                hi[slot] = value
+                i_hi[slot] = t
+
+            q = self._max_queues[ch]
+            while q and q[-1][1] <= value:
+                q.pop()
+            q.append((t, value))
+            if q[0][0] <= oldest:
+                q.popleft()
+
+            q = self._min_queues[ch]
+            while q and q[-1][1] >= value:
+                q.pop()
+            q.append((t, value))
+            if q[0][0] <= oldest:
+                q.popleft()
+        self._count = t + 1
+
+    def last(self, channel=0):
+        return self._data[channel, (self._count - 1) % self.capacity]
+
+    def max(self, channel=0):
+        return self._max_queues[channel][0][1]
+
+    def min(self, channel=0):
+        return self._min_queues[channel][0][1]
+
+    def abs_max(self, channel=None):
+        """Максимум |значения| по окну для канала или (channel=None) по всем каналам"""
+        channels = range(self.channels) if channel is None else (channel,)
+        return max(max(self.max(ch), -self.min(ch)) for ch in channels)
+
+    def channel(self, channel=0):
+        """Значения канала в хронологическом порядке (без копии, если буфер ещё не заполнен по кругу)"""
+        n = len(self)
+        row = self._data[channel]
+        if self._count <= self.capacity:
+            return row[:n]
+        start = self._count % self.capacity
+        return np.concatenate((row[start:], row[:start]))
+
+    def decimated(self, channel=0, max_points=1000):
+        """
+        Не более max_points значений канала для отрисовки длинных историй: окно делится на
+        не более max_points // 2 групп корзин, и от каждой берутся минимум и максимум в порядке времени.
+        В отличие от прореживания с шагом, короткие пики (всплески силы) не теряются.
+        Возвращает (номера отсчётов в окне, значения).
+        """
+        n = len(self)
+        if n <= max_points:
+            return np.arange(n), self.channel(channel)
+        size = self.bucket_size
+        first = self._count - n  # номер первого отсчёта окна
+        b_first = -(-first // size)  # первая корзина, целиком лежащая в окне
+        b_last = (self._count - 1) // size
+        slots = np.arange(b_first, b_last + 1) % len(self._buckets[0][0])
+        lo, i_lo, hi, i_hi = (np.take(column, slots) for column in self._buckets[channel])
+
+        head = b_first * size - first  # отсчёты окна из корзины, частично выпавшей из окна
+        if head:
+            head_values = self._data[channel, np.arange(first, first + head) % self.capacity]
+            k_lo, k_hi = head_values.argmin(), head_values.argmax()
+            lo = np.concatenate(([head_values[k_lo]], lo))
+            i_lo = np.concatenate(([first + k_lo], i_lo))
+            hi = np.concatenate(([head_values[k_hi]], hi))
+            i_hi = np.concatenate(([first + k_hi], i_hi))
+
+        # Соседние корзины объединяются в группы по group; хвост дополняется последней корзиной:
+        # argmin/argmax берут первое вхождение, поэтому дополнение не выбирается
+        m = len(lo)
+        group = -(-m // max(1, max_points // 2))
+        pad = -m % group
+
+        def extreme(values, numbers, pick):
+            values = np.concatenate((values, np.full(pad, values[-1]))).reshape(-1, group)
+            k = np.arange(len(values)) * group + pick(values, axis=1)
+            return numbers[np.minimum(k, m - 1)]
+
+        numbers = np.unique(np.concatenate((extreme(lo, i_lo, np.argmin), extreme(hi, i_hi, np.argmax))))
+        return numbers - first, self._data[channel, numbers % self.capacity]
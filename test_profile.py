@@ -1,5 +1,11 @@
+import math
+import timeit
 import unittest
-from core import PiecewiseProfile, semicircle, trapezoid, constant
+
+import numpy as np
+
+from core import (PiecewiseProfile, semicircle, trapezoid, constant, linear, sine_wave_sum,
+                  ProfileElement, ConstantElement, TrapezoidElement, SineWaveSumElement, FunctionElement, SampledElement, _strictly_increasing)
 
 # ---  функция для построения графика ---
 def plot_profile(profile, x_min, x_max, steps=500):
@@ -9,14 +15,8 @@ def plot_profile(profile, x_min, x_max, steps=500):
     fig, ax = plt.subplots(figsize=(10, 6))
     plt.subplots_adjust(bottom=0.2)
 
-    xs = []
-    us = []
-    dx = (x_max - x_min) / steps
-    for i in range(steps + 1):
-        x = x_min + i * dx
-        u = profile.potential(x)
-        xs.append(x)
-        us.append(u)
+    xs = np.linspace(x_min, x_max, steps + 1)
+    us = profile.potential_array(xs)
 
     ax.plot(xs, us, label='Potential U(x)', color='blue')
     ax.set_title('Профиль потенциала U(x)')
@@ -30,8 +30,8 @@ def plot_profile(profile, x_min, x_max, steps=500):
     # ------------------------------------
 
     # --- Устанавливаем фиксированный ylim ---
-    y_max = max(us) if us else 1
-    y_min = min(us) if us else 0
+    y_max = us.max() if us.size else 1
+    y_min = us.min() if us.size else 0
     ax.set_ylim(y_min - 200, y_max + 200)  # добавим немного отступа
     # ---------------------------------------
 
@@ -169,6 +169,353 @@ class TestPiecewiseProfile(unittest.TestCase):
 
     # ---------------------------------------------
 
+    def test_analytic_force(self):
+        """Аналитическая сила совпадает с центральной разностью на гладких участках"""
+        profile = PiecewiseProfile()
+        profile.add_function(linear, a=-2, b=160.0, x_start=0, x_end=80)
+        profile.add_function(semicircle, x0=100, radius=20, is_pit=True)
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 3.0, 'frequency': 0.2, 'phase': 1}])
+
+        for x in (10.0, 95.0, 110.0, 260.0, 330.0, 500.0):
+            self.assertAlmostEqual(profile.force(x), profile._numeric_force(x, dx=1e-5), places=4)
+        # Яма-полуокружность: U = -sqrt(r^2 - (x - x0)^2), в x = 112 dU/dx = 12 / 16
+        self.assertAlmostEqual(profile.force(112), -(0.75 + 0.6 * math.cos(0.2 * 112 + 1)), places=9)
+
+    def test_force_fallback_for_custom_function(self):
+        """Для функции без производной используется центральная разность"""
+        profile = PiecewiseProfile()
+        profile.add_function(lambda x, k=1.0: k * x * x, k=0.5)
+        self.assertAlmostEqual(profile.force(3.0), -3.0, places=6)
+
+    def test_local_friction_index(self):
+        """Индекс трения: приоритет последней функции, плоская часть трапеции, перестройка после add_function"""
+        profile = PiecewiseProfile()
+        profile.add_function(constant, b=0.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100,
+                             f_stat=0.01, f_din=0.02, f_stat_base=50, f_din_base=45)
+        profile.add_function(semicircle, x0=100, radius=10)  # без трения - не создаёт зону
+
+        self.assertEqual(profile.get_local_friction(100), (None, None))
+        self.assertEqual(profile.get_local_friction(150), (15, 13))
+        self.assertEqual(profile.get_local_friction(220), (0.01, 0.02))  # склон перекрывает constant
+        self.assertEqual(profile.get_local_friction(250), (50, 45))  # граница плоской части
+        self.assertEqual(profile.get_local_friction(350.5), (0.01, 0.02))
+        self.assertEqual(profile.get_local_friction(400), (0.01, 0.02))
+        self.assertEqual(profile.get_local_friction(400.1), (None, None))
+
+        profile.add_function(constant, b=0.0, x_start=0, x_end=1000, f_stat=1, f_din=2)
+        self.assertEqual(profile.get_local_friction(300), (1, 2))
+
+    def test_profile_elements(self):
+        """add_function создаёт типизированные элементы; носитель и зоны трения объявлены элементами"""
+        profile = PiecewiseProfile()
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100, f_stat=1, f_din=2)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 1.0, 'frequency': 0.2}],
+                             x_start=500, x_end=600, f_stat=3, f_din=4)
+        profile.add_function(lambda x, **params: 0.0, x_start=700, x_end=800, f_stat=5, f_din=6)
+        trap, sine, func = profile.elements
+        self.assertIsInstance(trap, TrapezoidElement)
+        self.assertIsInstance(sine, SineWaveSumElement)
+        self.assertIsInstance(func, FunctionElement)
+        self.assertEqual(trap.support(), (200, 400))
+        self.assertEqual(sine.support(), (-math.inf, math.inf))
+
+        # Трение синусоиды и пользовательской функции больше не игнорируется
+        self.assertEqual(profile.get_local_friction(550), (3, 4))
+        self.assertEqual(profile.get_local_friction(750), (5, 6))
+        self.assertEqual(profile.get_local_friction(650), (None, None))
+
+        # Собственный элемент с аналитической производной
+        class Parabola(ProfileElement):
+            __slots__ = ('k',)
+
+            def __init__(self, k, override=False):
+                self.k = k
+                self.override = override
+
+            def value(self, x):
+                return self.k * x * x
+
+            def derivative(self, x):
+                return 2 * self.k * x
+
+        profile = PiecewiseProfile()
+        profile.add_element(Parabola(0.5))
+        self.assertEqual(profile.force(3.0), -3.0)
+        self.assertEqual(profile.codegen().force(3.0), -3.0)
+        self.assertEqual(profile.force_array(np.array([3.0])).tolist(), [-3.0])
+
+        # Элемент без derivative() не создаётся
+        class NoDerivative(ProfileElement):
+            __slots__ = ()
+
+            def value(self, x):
+                return 0.0
+
+        with self.assertRaises(TypeError):
+            NoDerivative()
+
+        # Прежний формат: PiecewiseProfile(functions=[{'func', 'params', 'override'}])
+        legacy = PiecewiseProfile(functions=[
+            {'func': constant, 'params': {'b': 2.0, 'x_start': 0, 'x_end': 10}},
+            {'func': semicircle, 'params': {'x0': 5, 'radius': 1}, 'override': True},
+        ])
+        self.assertEqual(legacy.functions, tuple(legacy.elements))
+        with self.assertRaises(AttributeError):
+            legacy.functions.append(ConstantElement())  # изменение - только через add_element()
+        self.assertEqual(legacy.potential(2.0), 2.0)
+        self.assertEqual(legacy.potential(5.0), 1.0)
+        with self.assertRaises(TypeError):
+            PiecewiseProfile(functions=[constant])
+
+    def test_support_culling(self):
+        """Отбор по носителям: в x вычисляются только покрывающие его элементы, результат не меняется"""
+        profile = PiecewiseProfile()
+        profile.add_function(constant, b=1.5)  # неограниченный
+        for i in range(200):
+            x0 = 10.0 * i
+            profile.add_function(trapezoid, x0=x0, height=2.0, base_a=2.0, base_b=3.0, is_pit=i % 2 == 1)
+            profile.add_function(semicircle, x0=x0 + 5.0, radius=1.7, override=i % 3 == 0)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 0.3, 'frequency': 1.3, 'phase': 0.1}])
+
+        at = profile.elements_at(5.5)
+        self.assertEqual(len(at), 3)  # constant, полуокружность у x=5 и синусоида
+        self.assertIs(at[0], profile.elements[0])
+        self.assertEqual(profile.elements_at(-100.0), (profile.elements[0], profile.elements[-1]))
+
+        def full_potential(x):
+            total = 0.0
+            for e in profile.elements:
+                val = e.value(x)
+                if e.override:
+                    if val != 0:
+                        return val
+                else:
+                    total += val
+            return total
+
+        for x in np.linspace(-20, 2020, 4001).tolist() + [3.3, 5.0 - 1.7, 5.0 + 1.7, 1985.0]:
+            self.assertEqual(profile.potential(x), full_potential(x))
+        self.assertEqual(profile.force(1001.0), profile.codegen().force(1001.0))
+
+    def test_potential_array_matches_scalar(self):
+        """Векторизованные potential_array/force_array совпадают со скалярными, включая override"""
+        profile = PiecewiseProfile()
+        profile.add_function(linear, a=-2, b=160.0, x_start=0, x_end=80)
+        profile.add_function(semicircle, x0=100, radius=10, is_pit=False, override=True)
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100)
+        profile.add_function(trapezoid, x0=450, height=3, base_a=10, base_b=0, override=True)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 1.0, 'frequency': 0.2, 'phase': 0}])
+        profile.add_function(lambda x, k=1.0: k * x, k=0.5)  # пользовательская функция
+
+        xs = np.linspace(-10, 600, 2001)
+        us = profile.potential_array(xs)
+        fs = profile.force_array(xs)
+        for x, u, f in zip(xs.tolist(), us.tolist(), fs.tolist()):
+            self.assertAlmostEqual(u, profile.potential(x), places=9)
+            self.assertAlmostEqual(f, profile.force(x), places=6)
+
+    def test_compiled_profile(self):
+        """Табличный профиль совпадает с исходным в пределах заявленной ошибки"""
+        profile = PiecewiseProfile()
+        profile.add_function(constant, b=0.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+        profile.add_function(semicircle, x0=100, radius=20, is_pit=False)
+        profile.add_function(trapezoid, x0=300, height=2, base_a=10, base_b=50, is_pit=False)
+        compiled = profile.compile(0, 400, resolution=4000)
+
+        for x in (0.0, 37.3, 100.0, 185.5, 300.0, 321.7, 400.0):
+            self.assertAlmostEqual(compiled.potential(x), profile.potential(x), delta=1e-3)
+        # Наибольшая ошибка в серединах ячеек - у краёв полуокружности, где U'' не ограничена
+        self.assertLess(compiled.midpoint_potential_error, 1.0)
+        self.assertGreater(compiled.midpoint_potential_error, 0.0)
+        self.assertAlmostEqual(compiled.force(300), profile.force(300), delta=1e-6)
+        self.assertEqual(compiled.get_local_friction(200), (15, 13))
+        self.assertEqual(compiled.get_local_friction(50), (None, None))
+        # Вне сетки - вычисление по исходному профилю
+        self.assertEqual(compiled.potential(500), profile.potential(500))
+
+        # Изменение исходного профиля не влияет на скомпилированный
+        profile.add_function(constant, b=7.0)
+        self.assertAlmostEqual(compiled.potential(200), 0.0, places=6)
+
+    def test_polynomial_profile(self):
+        """Кусочно-полиномиальная компиляция: совпадает с исходным профилем, трение и override разрешены заранее"""
+        profile = PiecewiseProfile()
+        profile.add_function(linear, a=-2, b=160.0, x_start=0, x_end=80, f_stat=0.01, f_din=0.01)
+        profile.add_function(constant, b=3.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+        profile.add_function(linear, a=0.5, b=-60.0, x_start=100, x_end=140, override=True)  # нуль в x = 120
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100,
+                             f_stat=0.01, f_din=0.01, f_stat_base=50, f_din_base=45)
+        profile.add_function(trapezoid, x0=450, height=3, base_a=10, base_b=0, is_pit=True, override=True)
+        compiled = profile.compile_polynomial()
+        self.assertEqual(compiled.source_segments, 0)
+
+        def assert_matches(x):
+            if 200 < x < 250 or 350 < x < 400:
+                # Склоны трапеции: smoothstep в полиномиальной записи - совпадение до округления
+                self.assertAlmostEqual(compiled.potential(x), profile.potential(x), places=9)
+                self.assertAlmostEqual(compiled.force(x), profile.force(x), places=9)
+            else:
+                self.assertEqual(compiled.potential(x), profile.potential(x))
+                self.assertEqual(compiled.force(x), profile.force(x))
+
+        for x in np.linspace(-10, 600, 2441).tolist() + [80.0, 120.0, 200.0, 250.0, 445.0, 455.0]:
+            assert_matches(x)
+            self.assertEqual(compiled.get_local_friction(x), profile.get_local_friction(x))
+        self.assertEqual(compiled.potential(120.0), 0.0)  # override неактивен - сумма остальных
+
+        # Неполиномиальные элементы прибавляются при вычислении - без таблиц, точно и на длинных отрезках
+        profile.add_function(semicircle, x0=520, radius=10)
+        profile.add_function(constant, b=1.0, x_start=0, x_end=20000)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 2.0, 'frequency': 0.3, 'phase': 0.5}])
+        compiled = profile.compile_polynomial()
+        self.assertEqual(compiled.source_segments, 0)
+        for x in np.linspace(-10, 20010, 4003).tolist() + [515.0, 529.99]:
+            assert_matches(x)
+            self.assertEqual(compiled.force_and_friction(x), (compiled.force(x), profile.get_local_friction(x)))
+
+        # Активный неполиномиальный override - отрезок по исходному профилю
+        profile.add_function(semicircle, x0=700, radius=5, override=True)
+        compiled = profile.compile_polynomial()
+        self.assertEqual(compiled.source_segments, 1)
+        self.assertEqual(compiled.potential(701.0), profile.potential(701.0))
+        self.assertEqual(compiled.force(701.0), profile.force(701.0))
+
+        # Пользовательская функция: сила отрезка, как и в исходном профиле, - центральная разность
+        profile.add_function(lambda x, k=1.0: k * x, k=0.5)
+        compiled = profile.compile_polynomial()
+        for x in (10.0, 160.0, 700.5, 5000.0):
+            self.assertEqual(compiled.potential(x), profile.potential(x))
+            self.assertEqual(compiled.force(x), profile.force(x))
+
+    def test_generated_profile(self):
+        """Сгенерированный код даёт те же значения, что и исходный профиль (override, трение, пользовательские функции)"""
+        profile = PiecewiseProfile()
+        profile.add_function(linear, a=-2, b=160.0, x_start=0, x_end=80, f_stat=0.01, f_din=0.01)
+        profile.add_function(constant, b=0.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+        profile.add_function(semicircle, x0=100, radius=10, is_pit=False, override=True)
+        profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100,
+                             f_stat=0.01, f_din=0.01, f_stat_base=50, f_din_base=45)
+        profile.add_function(trapezoid, x0=450, height=3, base_a=10, base_b=0, is_pit=True, override=True)
+        profile.add_function(sine_wave_sum, components=[{'amplitude': 1.0, 'frequency': 0.2, 'phase': 0}])
+        generated = profile.codegen()
+
+        for x in np.linspace(-10, 600, 1201).tolist() + [80.0, 90.0, 110.0, 250.0, 445.0]:
+            self.assertEqual(generated.potential(x), profile.potential(x))
+            self.assertEqual(generated.force(x), profile.force(x))
+            self.assertEqual(generated.force_and_friction(x), (profile.force(x), profile.get_local_friction(x)))
+
+        # Пользовательская функция: вызов как есть и сила центральной разностью
+        profile.add_function(lambda x, k=1.0: k * x * x, k=0.5)
+        generated = profile.codegen()
+        for x in (3.0, 120.0, 460.0):
+            self.assertEqual(generated.potential(x), profile.potential(x))
+            self.assertAlmostEqual(generated.force(x), profile.force(x), places=9)
+
+    def test_generated_profile_dispatch(self):
+        """Сгенерированный код вызывает только элементы интервала: на тысяче элементов не медленнее отбора по носителям"""
+        profile = PiecewiseProfile()
+        for i in range(1000):
+            x0 = 10.0 * i
+            profile.add_function(trapezoid, x0=x0, height=2.0, base_a=2.0, base_b=3.0, is_pit=i % 2 == 1)
+            profile.add_function(semicircle, x0=x0 + 5.0, radius=1.7, override=i % 3 == 0)
+        generated = profile.codegen()
+
+        xs = np.linspace(-20, 10020, 2001).tolist()
+        for x in xs[::10] + [5.0 - 1.7, 5.0 + 1.7, 9990.0]:
+            self.assertEqual(generated.force(x), profile.force(x))
+        generated_time = min(timeit.repeat(lambda: [generated.force(x) for x in xs], number=1, repeat=5))
+        source_time = min(timeit.repeat(lambda: [profile.force(x) for x in xs], number=1, repeat=5))
+        self.assertLess(generated_time, 1.5 * source_time)
+
+    def test_packed_sine_wave_sum(self):
+        """Упакованные массивы компонент: те же значения, аналитическая производная, codegen для сотен гармоник"""
+        rng = np.random.default_rng(3)
+        amplitudes, frequencies, phases = rng.random(200), rng.random(200) * 2, rng.random(200) * 6
+        packed = SineWaveSumElement(amplitudes=amplitudes, frequencies=frequencies, phases=phases)
+        small = SineWaveSumElement(components=[{'amplitude': a, 'frequency': f, 'phase': p}
+                                               for a, f, p in zip(amplitudes[:5], frequencies[:5], phases[:5])])
+        self.assertEqual(len(packed.components), 200)
+        self.assertEqual(small.components[0], (amplitudes[0], frequencies[0], phases[0]))
+
+        xs = np.linspace(-30.0, 30.0, 61)
+        for element, n in ((packed, 200), (small, 5)):
+            expected = sum(amplitudes[k] * np.sin(frequencies[k] * xs + phases[k]) for k in range(n))
+            np.testing.assert_allclose(element.value_array(xs), expected, atol=1e-10)
+            np.testing.assert_allclose([element.value(x) for x in xs.tolist()], expected, atol=1e-10)
+            for x in (-7.3, 0.0, 12.5):
+                numeric = (element.value(x + 1e-6) - element.value(x - 1e-6)) / 2e-6
+                self.assertAlmostEqual(element.derivative(x), numeric, places=5)
+                self.assertAlmostEqual(element.derivative_array(np.array([x]))[0], element.derivative(x), places=10)
+
+        self.assertAlmostEqual(sine_wave_sum(1.5, amplitudes=amplitudes, frequencies=frequencies, phases=phases),
+                               packed.value(1.5), places=12)
+        with self.assertRaises(ValueError):
+            SineWaveSumElement(amplitudes=[1.0, 2.0], frequencies=[1.0, 2.0, 3.0])
+
+        profile = PiecewiseProfile()
+        profile.add_function(sine_wave_sum, amplitudes=amplitudes, frequencies=frequencies, phases=phases)
+        generated = profile.codegen()
+        for x in (-7.3, 0.0, 12.5):
+            self.assertEqual(generated.potential(x), profile.potential(x))
+            self.assertEqual(generated.force(x), profile.force(x))
+
+    def test_sampled_element(self):
+        """Профиль по отсчётам: интерполяция U и F, memmap, наложение поверх аналитических элементов"""
+        import os
+        import tempfile
+
+        xs = np.linspace(0.0, 10.0, 401)
+        for method in ('cubic', 'monotone'):
+            by_potential = SampledElement(np.sin(xs), dx=0.025, method=method)
+            by_force = SampledElement(-np.cos(xs), xs=xs, quantity='force', method=method)
+            for x in (0.0, 1.2345, 5.0, 9.99, 10.0):
+                self.assertAlmostEqual(by_potential.value(x), math.sin(x), places=4)
+                self.assertAlmostEqual(by_potential.derivative(x), math.cos(x), places=2)
+                self.assertAlmostEqual(by_force.value(x), math.sin(x), places=5)
+                self.assertAlmostEqual(by_force.derivative(x), math.cos(x), places=4)
+            self.assertEqual(by_potential.value(-0.1), 0.0)
+            self.assertEqual(by_force.derivative(10.1), 0.0)
+            points = np.linspace(-1.0, 11.0, 97)
+            np.testing.assert_allclose(by_force.value_array(points), [by_force.value(x) for x in points], atol=1e-12)
+            np.testing.assert_allclose(by_potential.derivative_array(points),
+                                       [by_potential.derivative(x) for x in points], atol=1e-12)
+
+        # Монотонная интерполяция не выходит за пределы ступеньки
+        step = SampledElement(np.array([0.0, 0.0, 1.0, 1.0]), dx=1.0, method='monotone')
+        values = step.value_array(np.linspace(0.0, 3.0, 301))
+        self.assertGreaterEqual(values.min(), 0.0)
+        self.assertLessEqual(values.max(), 1.0)
+
+        # Запись в .npy читается через memory-map и накладывается поверх профиля с override
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'u.npy')
+            np.save(path, 5.0 * np.ones(101))
+            sampled = SampledElement.load(path, x0=100.0, dx=1.0, f_stat=3.0, f_din=2.0, override=True)
+            self.assertIsInstance(sampled.values, np.memmap)
+            profile = PiecewiseProfile()
+            profile.add_function(linear, a=1.0, b=0.0, x_start=0, x_end=300)
+            profile.add_element(sampled)
+            self.assertAlmostEqual(profile.potential(150.0), 5.0)
+            self.assertAlmostEqual(profile.force(150.0), 0.0)
+            self.assertAlmostEqual(profile.potential(250.0), 250.0)
+            self.assertEqual(profile.get_local_friction(150.0), (3.0, 2.0))
+            generated = profile.codegen()
+            self.assertEqual(generated.potential(150.0), profile.potential(150.0))
+            del sampled, profile, generated
+
+            # Узлы должны строго возрастать - и в массивах, и в memmap (он проверяется блоками)
+            xs_path = os.path.join(tmp, 'x.npy')
+            np.save(xs_path, np.concatenate((np.arange(60.0), np.arange(59.0, 100.0))))
+            with self.assertRaises(ValueError):
+                SampledElement.load(os.path.join(tmp, 'u.npy'), xs_path)
+        for xs in ([0.0, 1.0, 1.0], [0.0, 2.0, 1.0], [0.0, float('nan'), 2.0]):
+            with self.assertRaises(ValueError):
+                SampledElement([1.0, 2.0, 3.0], xs)
+        self.assertFalse(_strictly_increasing(np.array([0.0, 1.0, 2.0, 3.0, 3.0, 4.0]), chunk_size=4))
+        self.assertTrue(_strictly_increasing(np.arange(10.0), chunk_size=3))
+
 if __name__ == '__main__':
     # Запуск тестов
     unittest.main(exit=False)  # Не завершаем после тестов
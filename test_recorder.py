@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from core import HapticSimulation, PiecewiseProfile, constant, trapezoid, semicircle
+from recorder import TrajectoryRecorder, TrajectoryReader, replay, FLAG_DRAGGING, FLAG_TARGET
+
+
+def make_simulation():
+    profile = PiecewiseProfile()
+    profile.add_function(constant, b=0.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+    profile.add_function(semicircle, x0=100, radius=10, override=True)
+    profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100, f_stat_base=50, f_din_base=45,
+                         f_stat=0.01, f_din=0.01)
+    sim = HapticSimulation(x_min=50.0, x_max=550.0, mass=5.0, damping=2.0)
+    sim.set_friction_forces(7, 5)
+    sim.set_profile(profile)
+    sim.state.x = 80.0
+    return sim
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.hrec')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_record_and_replay(self):
+        """Записанная сессия читается через memmap и воспроизводится шаг в шаг"""
+        sim = make_simulation()
+        with TrajectoryRecorder(self.path, chunk_size=64).attach(sim) as recorder:
+            for i in range(1000):
+                if i == 100:
+                    sim.state.dragging = True
+                if 100 <= i < 600:
+                    sim.cursor_x = 80.0 + i * 0.6
+                if i == 600:
+                    sim.state.dragging = False
+                    sim.cursor_x = None
+                if i == 700:
+                    sim.toggle_target_control()
+                    sim.set_target_position(200.0)
+                sim.step()
+        self.assertEqual(sim.step_listeners, [])
+        self.assertEqual(recorder.records_written, 1000)
+
+        reader = TrajectoryReader(self.path)
+        self.assertEqual(len(reader), 1000)
+        self.assertIsInstance(reader.records, np.memmap)
+        self.assertEqual(reader[-1]['x'], sim.state.x)
+        self.assertTrue(reader[150]['flags'] & FLAG_DRAGGING)
+        self.assertTrue(np.isnan(reader['cursor_x'][50]))
+        self.assertTrue(reader[800]['flags'] & FLAG_TARGET)
+
+        fresh = make_simulation()
+        xs = np.concatenate([log['x'] for _, log in replay(reader, fresh, chunk_size=300)])
+        np.testing.assert_array_equal(xs, reader['x'])
+
+        # Воспроизведение с середины
+        fresh = make_simulation()
+        (start, log), *_ = replay(reader, fresh, start=650, stop=700)
+        self.assertEqual(start, 650)
+        np.testing.assert_array_equal(log['x'], reader['x'][650:700])
+
+    def test_replay_uses_recorded_dt(self):
+        """Воспроизведение берёт шаг из записи, а не из переданной симуляции"""
+        sim = make_simulation()
+        sim.dt = 0.005
+        sim.state.vx = 40.0
+        with TrajectoryRecorder(self.path).attach(sim):
+            for _ in range(200):
+                sim.step()
+
+        reader = TrajectoryReader(self.path)
+        self.assertEqual(reader.dt, 0.005)
+        fresh = make_simulation()
+        fresh.state.vx = 40.0
+        self.assertNotEqual(fresh.dt, reader.dt)
+        (_, log), = replay(reader, fresh)
+        self.assertEqual(fresh.dt, reader.dt)
+        np.testing.assert_array_equal(log['x'], reader['x'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,422 @@
+import math
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from core import HapticSimulation, StepResult, PhaseTimers, PiecewiseProfile, constant, linear, trapezoid, semicircle
+from ensemble import HapticEnsemble
+import benchmark
+from headless import simulate
+from runner import PhysicsRunner, RealtimeStepper
+
+
+def make_reference_profile():
+    """Профиль из main.py"""
+    profile = PiecewiseProfile()
+    profile.add_function(linear, a=-2, b=160.0, x_start=0, x_end=80, f_stat=0.01, f_din=0.01)
+    profile.add_function(constant, b=0.0, x_start=150, x_end=250, f_stat=15, f_din=13)
+    profile.add_function(semicircle, x0=100, radius=10, is_pit=False, override=True)
+    profile.add_function(trapezoid, x0=300, height=200, base_a=100, base_b=100, is_pit=False,
+                         f_stat=0.01, f_din=0.01, f_stat_base=50, f_din_base=45)
+    return profile
+
+
+def make_simulations(profile, n=24):
+    """Набор симуляций со всеми комбинациями режимов управления"""
+    sims = []
+    for i in range(n):
+        sim = HapticSimulation(x_min=50.0, x_max=550.0, mass=1.0 + i % 5, damping=0.5 * (i % 4))
+        sim.set_friction_forces(7 - i % 3, 5 - i % 2)
+        sim.set_profile(profile)
+        sim.state.x = 60.0 + 20.0 * i
+        if i % 2:
+            sim.toggle_impedance_control()
+        if i % 3 == 0:
+            sim.toggle_target_control()
+            sim.set_target_position(500.0 - 15.0 * i)
+        if i % 4 == 0:
+            sim.toggle_speed_control()
+            sim.set_target_position_speed_control(100.0 + 10.0 * i)
+        if i % 5 == 0:
+            sim.state.dragging = True
+            sim.cursor_x = 300.0
+        sims.append(sim)
+    return sims
+
+
+class TestStepResult(unittest.TestCase):
+
+    def test_breakdown_uses_local_friction(self):
+        """Разбивка сил учитывает локальное трение зоны, а не глобальные параметры"""
+        sim = HapticSimulation(x_min=50.0, x_max=550.0, mass=5.0, damping=2.0)
+        sim.set_friction_forces(7, 5)
+        sim.set_profile(make_reference_profile())
+        sim.state.x = 300.0  # плоская часть трапеции: f_stat=50, f_din=45
+        sim.state.dragging = True
+        result = StepResult()
+
+        sim.cursor_x = 300.0 + 200.0  # 20 < 50 - объект стоит
+        self.assertEqual(sim.step(result), (result.F_haptic, result.F_external))
+        self.assertTrue(result.stuck)
+        self.assertAlmostEqual(result.F_external, 20.0)
+        self.assertAlmostEqual(result.F_static, -(result.F_haptic + result.F_external))
+        self.assertEqual(result.F_kinetic, 0.0)
+        self.assertEqual(sim.state.x, 300.0)
+
+        sim.cursor_x = 300.0 + 1000.0  # 100 > 50 - страгиваем
+        sim.step(result)
+        self.assertFalse(result.stuck)
+        self.assertEqual(result.F_static, 0.0)
+        self.assertEqual(result.F_kinetic, -45)
+        self.assertAlmostEqual(result.F_total, result.F_haptic + result.F_external + result.F_kinetic)
+        self.assertGreater(sim.state.vx, 0.0)
+
+
+class TestSimulate(unittest.TestCase):
+
+    def test_matches_manual_loop(self):
+        """simulate() с траекторией курсора совпадает с ручным циклом step()"""
+        n = 400
+        cursor = np.where(np.arange(n) < 300, 120.0 + 0.5 * np.arange(n), np.nan)
+
+        sim = HapticSimulation(x_min=50.0, x_max=550.0, mass=5.0, damping=2.0)
+        sim.set_profile(make_reference_profile())
+        sim.state.x = 120.0
+        log = simulate(sim, n, cursor_x=cursor, target_x=400.0)
+
+        ref = HapticSimulation(x_min=50.0, x_max=550.0, mass=5.0, damping=2.0)
+        ref.set_profile(make_reference_profile())
+        ref.state.x = 120.0
+        for i in range(n):
+            c = cursor[i]
+            ref.cursor_x = None if math.isnan(c) else float(c)
+            ref.state.dragging = ref.cursor_x is not None
+            ref.target_x = 400.0
+            F_haptic, F_external = ref.step()
+            self.assertEqual(log['x'][i], ref.state.x)
+            self.assertEqual(log['F_haptic'][i], F_haptic)
+            self.assertEqual(log['F_external'][i], F_external)
+        self.assertEqual(log['t'].shape, (n,))
+        self.assertFalse(sim.state.dragging)
+        self.assertGreater(log['x'][299], 120.0)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_phase_timers(self):
+        """Таймеры считают вызовы фаз, не меняют результат и полностью снимаются"""
+        sims = make_simulations(make_reference_profile(), n=2)
+        plain, timed = sims[0], make_simulations(make_reference_profile(), n=2)[0]
+        self.assertIsNone(timed.instrumentation_snapshot())
+        timed.enable_instrumentation()
+        for _ in range(200):
+            plain.step()
+            timed.step()
+        self.assertEqual(plain.state.x, timed.state.x)
+
+        report = timed.instrumentation_snapshot()
+        self.assertEqual(report['step']['calls'], 200)
+        self.assertEqual(report['profile_force']['calls'], 200)
+        self.assertEqual(report['friction']['calls'], 400)  # поиск зоны трения и сила трения
+        self.assertEqual(report['clamping']['calls'], 400)
+        self.assertGreater(report['step']['total_s'], report['profile_force']['total_s'])
+        self.assertIn('_calculate_profile_force_and_friction', vars(timed))
+
+        # Именованные аргументы проходят через обёртку таймера
+        result = StepResult()
+        timed.step(result=result)
+        self.assertEqual(report['step']['calls'], 200)
+        self.assertEqual(timed.instrumentation_snapshot()['step']['calls'], 201)
+        self.assertNotEqual(result.F_total, 0.0)
+
+        timed.reset_instrumentation()
+        self.assertEqual(timed.instrumentation_snapshot()['step']['calls'], 0)
+        timed.disable_instrumentation()
+        self.assertNotIn('step', vars(timed))
+        self.assertIsNone(timed.instrumentation_snapshot())
+
+    def test_phase_timers_not_nested(self):
+        """Силы на стадиях интегратора засчитываются только фазе integration"""
+        reports = {}
+        for integrator in ('euler', 'rk4'):
+            sim = make_simulations(make_reference_profile(), n=2)[0]
+            sim.integrator = integrator
+            sim.use_target_control = True
+            sim.set_target_position(300.0)
+            sim.enable_instrumentation()
+            for _ in range(100):
+                sim.step()
+            reports[integrator] = report = sim.instrumentation_snapshot()
+        for phase in ('integration', 'profile_force', 'external_force', 'control_forces'):
+            self.assertEqual(report[phase]['calls'], reports['euler'][phase]['calls'])
+        self.assertEqual(report['integration']['calls'], 100)
+        phases = sum(report[phase]['total_s'] for phase in PhaseTimers.PHASES if phase != 'step')
+        self.assertLessEqual(phases, report['step']['total_s'])
+
+
+    def test_implicit_speed_control_counted_once(self):
+        """Неявный Эйлер не пересчитывает силу управления по скорости"""
+        sim = HapticSimulation(x_min=0.0, x_max=600.0, mass=2.0)
+        sim.integrator = 'implicit'
+        sim.use_speed_control = True
+        sim.set_target_position_speed_control(300.0)
+        sim.enable_instrumentation()
+        for _ in range(50):
+            sim.step()
+        self.assertEqual(sim.instrumentation_snapshot()['control_forces']['calls'], 50)
+
+
+class TestIntegrators(unittest.TestCase):
+
+    def test_higher_order_converges_faster(self):
+        """Без трения на гладком профиле ошибка RK4 и Verlet при крупном шаге меньше, чем у Эйлера"""
+        profile = PiecewiseProfile()
+        profile.add_function(trapezoid, x0=0.0, height=50.0, base_a=40.0, base_b=120.0)
+
+        def final_x(integrator, dt, duration=4.0):
+            sim = HapticSimulation(x_min=-500.0, x_max=500.0, mass=2.0, damping=0.5)
+            sim.set_profile(profile)
+            sim.integrator = integrator
+            sim.dt = dt
+            sim.vx_threshold = 1e-9
+            sim.state.x = -45.0
+            for _ in range(int(round(duration / dt))):
+                sim.step()
+            return sim.state.x
+
+        reference = final_x('rk4', 0.0005)
+        errors = {name: abs(final_x(name, 0.02) - reference) for name in HapticSimulation.INTEGRATORS}
+        self.assertLess(errors['rk4'], errors['semi_implicit'])
+        self.assertLess(errors['verlet'], errors['euler'])
+        self.assertLess(errors['rk4'], 1e-3)
+
+    def test_implicit_stiff_springs(self):
+        """Жёсткий импеданс и упругая стенка при dt=0.01: явная схема расходится, неявная - нет"""
+        def impedance(integrator):
+            sim = HapticSimulation(mass=1.0, damping=0.1)
+            sim.integrator = integrator
+            sim.use_impedance_control = True
+            sim.impedance_stiffness = 1e5
+            sim.impedance_damping = 10.0
+            sim.target_x = 50.0
+            for _ in range(500):
+                sim.step()
+            return sim.state.x
+
+        self.assertNotAlmostEqual(impedance('semi_implicit'), 50.0)
+        self.assertAlmostEqual(impedance('implicit'), 50.0, places=6)
+
+        sim = HapticSimulation(x_min=-100.0, x_max=100.0, mass=1.0, damping=0.1)
+        sim.integrator = 'implicit'
+        sim.wall_stiffness = 1e5
+        sim.wall_damping = 50.0
+        sim.state.x = 90.0
+        sim.state.dragging = True
+        sim.cursor_x = 500.0
+        result = StepResult()
+        peak = sim.state.x
+        for _ in range(500):
+            sim.step(result)
+            peak = max(peak, sim.state.x)
+        # Объект прижат к стенке: небольшое проникновение, сила стенки уравновешивает пружину курсора
+        self.assertLess(peak - sim.x_max, 0.5)
+        self.assertGreater(sim.state.x, sim.x_max)
+        self.assertAlmostEqual(result.F_wall, -result.F_external, places=6)
+
+    def test_event_splitting(self):
+        """
+        Вход в зону сильного трения и остановка внутри шага: с разбиением шага по событиям
+        Verlet даёт точную точку остановки (трение постоянно между событиями) даже при dt=0.1
+        """
+        profile = PiecewiseProfile()
+        profile.add_function(constant, b=0.0, x_start=20.0, x_end=40.0, f_stat=30.0, f_din=25.0)
+
+        def stop_x(dt, event_splitting):
+            sim = HapticSimulation(x_min=-100.0, x_max=200.0, mass=2.0, damping=0.0)
+            sim.set_friction_forces(2.0, 1.0)
+            sim.set_profile(profile)
+            sim.integrator = 'verlet'
+            sim.vx_threshold = 1e-9
+            sim.dt = dt
+            sim.event_splitting = event_splitting
+            sim.state.vx = 15.0
+            for _ in range(int(round(4.0 / dt))):
+                sim.step()
+            self.assertEqual(sim.state.vx, 0.0)
+            self.assertEqual(sim.dt, dt)
+            return sim.state.x
+
+        # v² = 15² - 2 * 0.5 * 20 на входе в зону, затем торможение 12.5
+        exact = 20.0 + (15.0 ** 2 - 20.0) / 25.0
+        self.assertAlmostEqual(stop_x(0.1, True), exact, places=9)
+        self.assertAlmostEqual(stop_x(0.3, True), exact, places=9)
+        self.assertGreater(abs(stop_x(0.1, False) - exact), 0.1)
+
+    def impedance_drag_positions(self, integrators):
+        """Impedance без цели, жёсткая impedance_stiffness: объект тянут к курсору 200 шагов"""
+        positions = {}
+        for integrator in integrators:
+            sim = HapticSimulation(x_min=0.0, x_max=600.0, mass=1.0)
+            sim.use_impedance_control = True
+            sim.impedance_stiffness = 1000.0
+            sim.integrator = integrator
+            sim.state.dragging = True
+            sim.cursor_x = 500.0
+            for _ in range(200):
+                sim.step()
+            positions[integrator] = sim.state.x
+        return positions
+
+    def test_impedance_without_target_has_no_spring(self):
+        """Без target_x пружина импеданса не действует и на промежуточных стадиях интегратора"""
+        positions = self.impedance_drag_positions(('semi_implicit', 'euler', 'verlet', 'rk4'))
+        self.assertGreater(positions['semi_implicit'], 90.0)
+        for integrator, x in positions.items():
+            self.assertAlmostEqual(x, positions['semi_implicit'], delta=1.0, msg=integrator)
+
+    def test_implicit_impedance_without_target(self):
+        """Неявный Эйлер не добавляет жёсткость импеданса, если target_x не задана"""
+        positions = self.impedance_drag_positions(('semi_implicit', 'implicit'))
+        self.assertAlmostEqual(positions['implicit'], positions['semi_implicit'], delta=1.0)
+
+    def test_unknown_integrator(self):
+        sim = make_simulations(make_reference_profile(), n=1)[0]
+        with self.assertRaises(ValueError):
+            sim.integrator = 'leapfrog'
+        self.assertEqual(sim.integrator, 'semi_implicit')
+
+    def test_total_force_independent_of_integrator(self):
+        """F_total - сила шага в начальном состоянии, а не среднее ускорение интегратора"""
+        profile = PiecewiseProfile()
+        profile.add_function(linear, a=-10.0, b=0.0)
+        totals = {}
+        for integrator in HapticSimulation.INTEGRATORS:
+            sim = HapticSimulation(x_min=-1000.0, x_max=1000.0, mass=5.0, damping=2.0)
+            sim.set_profile(profile)
+            sim.integrator = integrator
+            out = simulate(sim, 5)
+            np.testing.assert_array_equal(out['F_haptic'], 10.0)
+            totals[integrator] = out['F_total']
+        for integrator, F_total in totals.items():
+            np.testing.assert_array_equal(F_total, totals['semi_implicit'], err_msg=integrator)
+        np.testing.assert_array_equal(totals['semi_implicit'], 10.0)
+
+        # Если ограничение смены знака скорости сработало, F_total - сила остановки
+        sim = HapticSimulation(mass=5.0, damping=0.0)
+        sim.set_profile(profile)
+        sim.integrator = 'rk4'
+        sim.state.vx = -0.01
+        result = StepResult()
+        sim.step(result)
+        self.assertEqual(sim.state.vx, 0.0)
+        self.assertAlmostEqual(result.F_total, 5.0 * 0.01 / sim.dt)
+
+
+class TestHapticEnsemble(unittest.TestCase):
+
+    def test_matches_individual_simulations(self):
+        """Ансамбль даёт те же траектории, что и отдельные HapticSimulation"""
+        sims = make_simulations(make_reference_profile())
+        ensemble = HapticEnsemble.from_simulations(sims)
+        for _ in range(500):
+            ensemble.step()
+            for sim in sims:
+                sim.step()
+        for i, sim in enumerate(sims):
+            self.assertAlmostEqual(ensemble.x[i], sim.state.x, places=9)
+            self.assertAlmostEqual(ensemble.vx[i], sim.state.vx, places=9)
+
+    def test_speed_control_gain_shared(self):
+        """Ансамбль берёт коэффициент управления по скорости из HapticSimulation.SPEED_CONTROL_GAIN"""
+        with mock.patch.object(HapticSimulation, 'SPEED_CONTROL_GAIN', 2.0):
+            sims = [sim for sim in make_simulations(make_reference_profile()) if sim.use_speed_control]
+            ensemble = HapticEnsemble.from_simulations(sims)
+            for _ in range(200):
+                ensemble.step()
+                for sim in sims:
+                    sim.step()
+        for i, sim in enumerate(sims):
+            self.assertAlmostEqual(ensemble.x[i], sim.state.x, places=9)
+
+    def test_per_instance_parameters(self):
+        """Параметры задаются числом или массивом"""
+        ensemble = HapticEnsemble(3, mass=[1.0, 2.0, 4.0], x=10.0, target_x=[0.0, 0.0, 0.0],
+                                  use_target_control=True)
+        ensemble.step()
+        self.assertTrue(ensemble.vx[0] < ensemble.vx[1] < ensemble.vx[2] < 0)
+        with self.assertRaises(TypeError):
+            HapticEnsemble(2, massa=1.0)
+
+
+class TestPhysicsRunner(unittest.TestCase):
+
+    def test_runs_in_background_thread(self):
+        """Поток шагает симуляцию, снимок согласован с состоянием"""
+        sim = HapticSimulation(x_min=0.0, x_max=100.0)
+        sim.state.x = 10.0
+        sim.toggle_target_control()
+        sim.set_target_position(90.0)
+        runner = PhysicsRunner(sim, rate_hz=2000)
+        self.assertEqual(sim.dt, 1 / 2000)
+        runner.start()
+        try:
+            time.sleep(0.1)
+        finally:
+            runner.stop()
+        self.assertFalse(runner.running)
+        snapshot = runner.snapshot()
+        self.assertGreater(snapshot.steps, 10)
+        self.assertGreater(snapshot.x, 10.0)
+        self.assertEqual(snapshot.x, sim.state.x)
+
+
+class TestRealtimeStepper(unittest.TestCase):
+
+    def test_substeps_follow_wall_clock(self):
+        """Число шагов соответствует прошедшему времени, избыток отбрасывается"""
+        now = [0.0]
+        sim = HapticSimulation()
+        stepper = RealtimeStepper(sim, max_substeps=10, clock=lambda: now[0])
+
+        now[0] = 0.035  # 3.5 шага по dt = 0.01
+        self.assertEqual(stepper.advance(), 3)
+        now[0] = 0.05  # остаток 0.005 + 0.015
+        self.assertEqual(stepper.advance(), 2)
+        self.assertEqual(stepper.dropped_time, 0.0)
+
+        now[0] = 0.25  # 20 шагов при лимите 10
+        self.assertEqual(stepper.advance(), 10)
+        self.assertAlmostEqual(stepper.dropped_time, 0.1)
+        self.assertEqual(stepper.steps, 15)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run_and_compare(self):
+        """Короткий прогон покрывает все режимы, сравнение с baseline находит замедление"""
+        results = benchmark.run_benchmarks(sizes=(1, 3), budget=0.0)
+        self.assertEqual(len(results), 2 * (4 + len(benchmark.MODES)))
+        self.assertIn('impedance_step/target=1/speed=1/n=3', results)
+        self.assertGreater(results['profile/force/n=1']['calls_per_sec'], 0)
+
+        baseline = {'results': {'step/target=0/speed=0/n=1': {'steps_per_sec': 1000.0},
+                                'profile/force/n=1': {'calls_per_sec': 10.0}}}
+        current = {'step/target=0/speed=0/n=1': {'steps_per_sec': 700.0},
+                   'profile/force/n=1': {'calls_per_sec': 9.0}}
+        self.assertEqual(benchmark.compare(current, baseline, threshold=0.25),
+                         [('step/target=0/speed=0/n=1', 1000.0, 700.0)])
+
+    def test_integrator_report_orders(self):
+        """На гладком сценарии отчёта ошибка убывает с шагом с порядком интегратора"""
+        rows = benchmark.run_integrator_report(dts=(0.01, 0.025), duration=2.0, reference_dt=0.001)
+        orders = {row['integrator']: row['order'] for row in rows if row['order'] is not None}
+        self.assertAlmostEqual(orders['euler'], 1.0, delta=0.1)
+        self.assertAlmostEqual(orders['implicit'], 1.0, delta=0.1)
+        self.assertAlmostEqual(orders['verlet'], 2.0, delta=0.1)
+        self.assertAlmostEqual(orders['rk4'], 4.0, delta=0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
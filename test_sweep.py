@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from core import HapticSimulation, PiecewiseProfile, constant, trapezoid
+from headless import simulate
+from sweep import grid, configure, run_sweep, load_results, setpoint, summarize
+
+
+def make_simulation():
+    sim = HapticSimulation(x_min=0.0, x_max=600.0, mass=2.0, damping=1.0)
+    sim.set_friction_forces(3, 2)
+    sim.state.x = 100.0
+    sim.use_target_control = True
+    sim.target_x = 400.0
+    sim.target_damping = 2.0
+    return sim
+
+
+def make_profiles():
+    flat = PiecewiseProfile()
+    bumpy = PiecewiseProfile()
+    bumpy.add_function(trapezoid, x0=250, height=30, base_a=20, base_b=40, f_stat_base=6, f_din_base=4)
+    bumpy.add_function(constant, b=0.0, x_start=300, x_end=350, f_stat=8, f_din=6)
+    return {'flat': flat, 'bumpy': bumpy}
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.out_dir)
+
+    def test_pool_matches_inline_and_resumes(self):
+        """Пул процессов и прогон в текущем процессе дают одно и то же; готовые блоки не пересчитываются"""
+        points = grid(mass=[1.0, 4.0], target_spring_k=[0.5, 2.0], profile=['flat', 'bumpy'])
+        self.assertEqual(len(points), 8)
+        kwargs = dict(profiles=make_profiles(), make_simulation=make_simulation, duration=10.0, chunk_size=3,
+                      tolerance=2.0)
+
+        inline_dir = os.path.join(self.out_dir, 'inline')
+        inline = run_sweep(points, inline_dir, workers=0, **kwargs)
+        pooled = run_sweep(points, os.path.join(self.out_dir, 'pool'), workers=2, **kwargs)
+        for name in ('settling_time', 'overshoot', 'peak_force', 'stick_events', 'final_x', 'mass', 'profile'):
+            np.testing.assert_array_equal(inline[name], pooled[name])
+        np.testing.assert_array_equal(inline['index'], np.arange(8))
+        self.assertEqual(list(inline['profile'][:2]), ['flat', 'bumpy'])
+
+        # Метрики первой точки совпадают с ручным прогоном
+        sim = configure(make_simulation(), points[0], make_profiles())
+        expected = summarize(simulate(sim, 1000), 100.0, setpoint(sim), 2.0)
+        for name, value in expected.items():
+            np.testing.assert_array_equal(inline[name][0], value)
+        self.assertTrue(np.isfinite(inline['settling_time']).any())
+        self.assertTrue((inline['overshoot'] > 0).any())
+        self.assertTrue((inline['stick_events'] > 0).any())
+
+        # Продолжение: пересчитывается только удалённый блок, остальные файлы не трогаются
+        os.remove(os.path.join(inline_dir, 'chunk_00001.npz'))
+        mtime = os.path.getmtime(os.path.join(inline_dir, 'chunk_00000.npz'))
+        done = []
+        resumed = run_sweep(points, inline_dir, workers=0, progress=lambda d, n: done.append((d, n)), **kwargs)
+        self.assertEqual(done, [(3, 3)])
+        self.assertEqual(os.path.getmtime(os.path.join(inline_dir, 'chunk_00000.npz')), mtime)
+        np.testing.assert_array_equal(resumed['final_x'], inline['final_x'])
+        np.testing.assert_array_equal(load_results(inline_dir)['overshoot'], inline['overshoot'])
+
+        # Другой перебор в том же каталоге - ошибка
+        with self.assertRaises(ValueError):
+            run_sweep(points[:4], inline_dir, workers=0, **kwargs)
+
+    def test_summary_metrics(self):
+        """Время установления, перерегулирование и залипания на заданной траектории"""
+        t = np.arange(1, 11) * 0.1
+        out = {
+            't': t,
+            'x': np.array([0.0, 5.0, 11.0, 12.0, 10.5, 9.6, 10.2, 10.1, 10.0, 10.0]),
+            'F_total': np.array([1.0, -3.0, 2.0, 0, 0, 0, 0, 0, 0, 0]),
+            'F_haptic': np.zeros(10),
+            'stuck': np.array([1, 0, 0, 1, 1, 0, 1, 0, 1, 1], dtype=bool),
+        }
+        metrics = summarize(out, 0.0, 10.0, 0.5)
+        self.assertAlmostEqual(metrics['settling_time'], 0.5)
+        self.assertAlmostEqual(metrics['overshoot'], 2.0)
+        self.assertEqual(metrics['peak_force'], 3.0)
+        self.assertEqual(metrics['stick_events'], 3)
+        self.assertTrue(np.isnan(summarize(out, 0.0, None, 0.5)['settling_time']))
+
+    def test_unknown_parameter(self):
+        with self.assertRaises(TypeError):
+            configure(make_simulation(), {'masss': 1.0})
+        with self.assertRaises(TypeError):
+            configure(make_simulation(), {'step': 1.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
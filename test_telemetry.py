@@ -0,0 +1,72 @@
+import random
+import unittest
+
+import numpy as np
+
+from telemetry import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_window_and_running_extremes(self):
+        """Окно последних capacity значений и скользящие min/max совпадают с прямым расчётом"""
+        random.seed(3)
+        buffer = RingBuffer(channels=2, capacity=50)
+        reference = ([], [])
+        for _ in range(1000):
+            a, b = random.uniform(-10, 10), random.uniform(-100, 5)
+            buffer.append(a, b)
+            reference[0].append(a)
+            reference[1].append(b)
+            for ch in (0, 1):
+                window = reference[ch][-50:]
+                self.assertEqual(buffer.max(ch), max(window))
+                self.assertEqual(buffer.min(ch), min(window))
+        self.assertEqual(len(buffer), 50)
+        self.assertEqual(buffer.channel(1).tolist(), reference[1][-50:])
+        self.assertEqual(buffer.last(0), reference[0][-1])
+        self.assertEqual(buffer.abs_max(), max(abs(v) for r in reference for v in r[-50:]))
+
+    def test_decimated(self):
+        """Прореживание возвращает значения из хронологического окна"""
+        buffer = RingBuffer(capacity=100)
+        for i in range(250):
+            buffer.append(float(i))
+        idx, values = buffer.decimated(0, max_points=10)
+        self.assertEqual(len(values), 10)
+        self.assertEqual(values[0], 150.0)
+        self.assertEqual(values[-1], 249.0)
+        self.assertEqual((values - 150.0).tolist(), idx.tolist())
+
+    def test_decimated_keeps_peaks(self):
+        """Одиночный пик переживает прореживание: от каждой корзины берутся min и max"""
+        buffer = RingBuffer(capacity=1000)
+        for i in range(1500):
+            buffer.append(50.0 if i == 1234 else (-30.0 if i == 1301 else 0.0))
+        idx, values = buffer.decimated(0, max_points=20)
+        self.assertLessEqual(len(values), 20)
+        self.assertEqual(values.max(), 50.0)
+        self.assertEqual(values.min(), -30.0)
+        self.assertIn(734, idx.tolist())
+        self.assertEqual(idx.tolist(), sorted(idx.tolist()))
+        self.assertEqual(buffer.channel(0)[idx].tolist(), values.tolist())
+
+    def test_decimated_buckets_follow_window(self):
+        """Корзины min/max обновляются при добавлении и дают те же пики, что и прямой расчёт по окну"""
+        random.seed(5)
+        buffer = RingBuffer(channels=2, capacity=500, bucket_size=7)
+        for i in range(1800):
+            buffer.append(random.gauss(0, 1), random.uniform(-1, 1))
+            if i % 53 == 0 or i > 1790:
+                for max_points in (2, 25, 120):
+                    window = buffer.channel(0)
+                    idx, values = buffer.decimated(0, max_points)
+                    self.assertLessEqual(len(values), max_points)
+                    self.assertEqual(window[idx].tolist(), values.tolist())
+                    self.assertTrue((np.diff(idx) > 0).all())
+                    self.assertEqual(values.max(), window.max())
+                    self.assertEqual(values.min(), window.min())
+
+
+if __name__ == '__main__':
+    unittest.main()